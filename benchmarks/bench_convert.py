@@ -0,0 +1,115 @@
+"""
+Benchmark convert-transactions on a large synthetic export: the previous
+whole-file conversion vs the chunked engine. Each mode runs in its own
+subprocess so peak RSS is measured independently.
+
+Usage: python benchmarks/bench_convert.py [--rows 5000000] [--chunksize 100000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+
+def generate(path, rows):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    chunk = 1000000
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        days = rng.integers(0, 5 * 365, n)
+        pd.DataFrame({
+            'bank_name': rng.choice(['Bank A', 'Bank B', 'Bank C'], n),
+            'account_iban': rng.choice([f'IT{i:022d}' for i in range(40)], n),
+            'transaction_id': np.arange(start, start + n).astype(str),
+            'booking_date': (np.datetime64('2020-01-01') + days).astype(str),
+            'amount': np.round(rng.normal(0, 200, n), 2),
+            'currency': 'EUR',
+            'description': rng.choice([f'PAYMENT {i}' for i in range(5000)], n),
+        }).to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def run_legacy(input_file, output):
+    # The conversion as it was before the chunked engine
+    import pandas as pd
+
+    df = pd.read_csv(input_file)
+    converted_df = pd.DataFrame(columns=[
+        'data', 'mese', 'descrizione', 'importo entrata',
+        'importo uscita', 'categoria', 'conto'
+    ])
+    converted_df['data'] = pd.to_datetime(df['booking_date']).dt.date
+    converted_df['mese'] = pd.to_datetime(df['booking_date']).dt.strftime('%B')
+    converted_df['descrizione'] = df['description']
+    converted_df['conto'] = df['account_iban']
+    converted_df['categoria'] = ''
+    amounts = pd.to_numeric(df['amount'], errors='coerce')
+    converted_df['importo entrata'] = amounts.where(amounts > 0, '')
+    converted_df['importo uscita'] = amounts.abs().where(amounts < 0, '')
+    converted_df.to_csv(output, index=False, encoding='utf-8')
+    return len(converted_df)
+
+
+def run_chunked(input_file, output, chunksize):
+    from gocardless_connector.convert import convert_frames, iter_input_frames
+
+    return convert_frames(iter_input_frames(input_file, chunksize=chunksize), output).count
+
+
+def peak_rss_mb():
+    # VmHWM starts fresh in each exec'd process; ru_maxrss may carry over the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, input_file, output, chunksize):
+    start = time.perf_counter()
+    if mode == 'legacy':
+        rows = run_legacy(input_file, output)
+    else:
+        rows = run_chunked(input_file, output, chunksize)
+    elapsed = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    print(f"{mode:8s} rows={rows} time={elapsed:.1f}s rows/s={rows / elapsed:,.0f} peak_rss={peak_mb:,.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000000)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, input_file, output = args.child
+        child(mode, input_file, output, args.chunksize)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file = os.path.join(tmp, 'transactions.csv')
+        print(f"Generating {args.rows:,} synthetic rows...")
+        generate(input_file, args.rows)
+        print(f"Input size: {os.path.getsize(input_file) / 1e6:,.0f} MB")
+        for mode in ('legacy', 'chunked'):
+            subprocess.run([
+                sys.executable, __file__, '--chunksize', str(args.chunksize),
+                '--child', mode, input_file, os.path.join(tmp, f'{mode}.csv')
+            ], check=True)
+
+
+if __name__ == '__main__':
+    main()
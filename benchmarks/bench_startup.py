@@ -0,0 +1,76 @@
+"""
+Measure CLI startup cost with `python -X importtime` and fail on regressions.
+
+Exits non-zero if importing the CLI takes longer than --threshold-ms (median of
+--runs) or if any of the heavy dependencies are imported at startup.
+
+Usage: python benchmarks/bench_startup.py [--threshold-ms 150] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'nordigen', 'requests']
+
+
+def import_profile():
+    """
+    Return (cumulative import time of the CLI module in ms, set of imported top-level modules).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import gocardless_connector.connector'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = set()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip().split('.')[0])
+        if name.strip() == 'gocardless_connector':
+            total_us = int(cumulative)
+    return total_us / 1000, modules
+
+
+def help_wall_time():
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-c', 'from gocardless_connector.connector import cli; cli()', '--help'],
+        cwd=ROOT, capture_output=True, check=True
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threshold-ms', type=float, default=150.0)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    import_times = []
+    modules = set()
+    for _ in range(args.runs):
+        elapsed, modules = import_profile()
+        import_times.append(elapsed)
+    help_times = [help_wall_time() for _ in range(args.runs)]
+
+    import_ms = statistics.median(import_times)
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+
+    print(f"CLI import time (median of {args.runs}): {import_ms:.1f} ms (threshold {args.threshold_ms:.0f} ms)")
+    print(f"'--help' wall time (median): {statistics.median(help_times):.1f} ms")
+    print(f"Heavy modules imported at startup: {', '.join(heavy) or 'none'}")
+
+    if import_ms > args.threshold_ms or heavy:
+        print("FAIL: startup regression")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Benchmark suite against the local stub API (tests/stub_api.py): token validation,
+get_all_bank_transactions, download-all-transactions and convert-transactions.
+
+The stub runs in its own process so it doesn't compete with the client for the GIL.
+Each scenario runs in a fresh subprocess and working directory, and records its
+throughput and resident memory over time (sampled every --sample-interval seconds).
+The request counts of the convert scenario include the download producing its input.
+
+Usage: python benchmarks/bench_suite.py [--banks 10] [--accounts 3] [--transactions 500]
+           [--latency 0.05] [--throttle-every 0] [--scenario fetch ...] [--output results.json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.request import urlopen
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT)
+
+from tests.stub_api import add_arguments, requisitions
+
+SCENARIOS = ['token', 'fetch', 'download', 'convert']
+
+
+class MemorySampler(threading.Thread):
+    """
+    Records (seconds since start, resident MB) every `interval` seconds.
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.started = time.perf_counter()
+        self.stopped = threading.Event()
+
+    def sample(self):
+        self.samples.append((round(time.perf_counter() - self.started, 3), round(rss_mb(), 1)))
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        # No /proc: fall back to the peak so far
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_csv_rows(path):
+    with open(path, encoding='utf-8') as f:
+        return sum(1 for _ in f) - 1
+
+
+def download(connector, concurrency, output='transactions.csv'):
+    connector.cli([
+        'download-all-transactions', '--output', output, '--concurrency', str(concurrency)
+    ], standalone_mode=False)
+    written = [name for name in os.listdir('.') if name.startswith('transactions_') and name.endswith('.csv')]
+    return max(written, key=os.path.getmtime) if written else None
+
+
+def child(scenario, args):
+    from contextlib import redirect_stdout
+    from gocardless_connector import connector
+    from gocardless_connector.state import StateStore
+    from gocardless_connector.tokens import TokenStore
+
+    StateStore().update('requisitions', requisitions(args.banks))
+    sampler = MemorySampler(args.sample_interval)
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        if scenario == 'convert':
+            # Conversion input comes from a full download; only the conversion is timed
+            input_file = download(connector, args.concurrency)
+
+        sampler.start()
+        start = time.perf_counter()
+        if scenario == 'token':
+            # A margin longer than the token lifetime forces the refresh path every time
+            token_store = TokenStore(margin=10 ** 6)
+            connector.validate_tokens(TokenStore())
+            for _ in range(args.iterations):
+                connector.validate_tokens(token_store)
+            items = args.iterations
+        elif scenario == 'fetch':
+            client = connector.validate_tokens()
+            items = len(connector.get_all_bank_transactions(client, concurrency=args.concurrency))
+        elif scenario == 'download':
+            output = download(connector, args.concurrency)
+            items = count_csv_rows(output) if output else 0
+        else:
+            connector.cli(['convert-transactions', input_file, '--output', 'converted.csv'], standalone_mode=False)
+            items = count_csv_rows('converted.csv')
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+    memory = [mb for _, mb in sampler.samples]
+    return {
+        'scenario': scenario,
+        'items': items,
+        'seconds': round(elapsed, 3),
+        'items_per_second': round(items / elapsed, 1) if elapsed else None,
+        'start_rss_mb': memory[0],
+        'peak_rss_mb': max(memory),
+        'memory_timeline': sampler.samples,
+    }
+
+
+def stub_stats(base_url):
+    with urlopen(f'{base_url}/_stats/') as response:
+        return json.load(response)
+
+
+def reset_stub(base_url):
+    with urlopen(f'{base_url}/_reset/', data=b'') as response:
+        response.read()
+
+
+def run_scenario(scenario, args, base_url):
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, '.env'), 'w') as f:
+            f.write('GOCARDLESS_SECRET_ID=stub\nGOCARDLESS_SECRET_KEY=stub\n')
+        env = {k: v for k, v in os.environ.items() if not k.startswith(('REQUISITION_ID_', 'GOCARDLESS_'))}
+        env['GOCARDLESS_API_URL'] = base_url
+        result_file = os.path.join(tmp, 'result.json')
+
+        # Every scenario starts with fresh per-account quotas
+        reset_stub(base_url)
+        before = stub_stats(base_url)
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__), '--child', scenario, result_file,
+            '--banks', str(args.banks), '--concurrency', str(args.concurrency),
+            '--iterations', str(args.iterations), '--sample-interval', str(args.sample_interval),
+        ], cwd=tmp, env=env, check=True)
+        after = stub_stats(base_url)
+
+        with open(result_file) as f:
+            result = json.load(f)
+    by_endpoint = after['by_endpoint']
+    result['api_requests'] = after['requests'] - before['requests']
+    result['api_rejected'] = sum(
+        by_endpoint.get(key, 0) - before['by_endpoint'].get(key, 0)
+        for key in ('throttled', 'failed', 'quota_exceeded')
+    )
+    return result
+
+
+def start_stub(args):
+    command = [sys.executable, os.path.join(ROOT, 'tests', 'stub_api.py'),
+               '--banks', str(args.banks), '--accounts', str(args.accounts),
+               '--transactions', str(args.transactions), '--days', str(args.days),
+               '--latency', str(args.latency), '--throttle-every', str(args.throttle_every),
+               '--fail-every', str(args.fail_every), '--account-quota', str(args.account_quota)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().split()[-1]
+    return process, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Scenario to run (repeatable, default all)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=200, help='Token validations in the token scenario')
+    parser.add_argument('--sample-interval', type=float, default=0.05, help='Seconds between memory samples')
+    parser.add_argument('--output', help='Write the results, with memory timelines, to this JSON file')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        scenario, result_file = args.child
+        with open(result_file, 'w') as f:
+            json.dump(child(scenario, args), f)
+        return
+
+    process, base_url = start_stub(args)
+    try:
+        results = [run_scenario(scenario, args, base_url) for scenario in args.scenario or SCENARIOS]
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"Banks: {args.banks}, accounts/bank: {args.accounts}, transactions/account: {args.transactions}, "
+          f"latency: {args.latency}s, concurrency: {args.concurrency}")
+    print(f"{'scenario':10s} {'items':>9s} {'seconds':>8s} {'items/s':>10s} {'peak MB':>8s} {'requests':>9s} {'rejected':>9s}")
+    for result in results:
+        print(f"{result['scenario']:10s} {result['items']:9d} {result['seconds']:8.2f} "
+              f"{result['items_per_second']:10,.0f} {result['peak_rss_mb']:8.0f} "
+              f"{result['api_requests']:9d} {result['api_rejected']:9d}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
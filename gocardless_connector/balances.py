@@ -0,0 +1,193 @@
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from .store import DEFAULT_DB_FILE, check_sqlite_version
+
+# Snapshots keyed by small integer IDs for the account and balance type and a Unix
+# timestamp, clustered by that key (WITHOUT ROWID) so each series is one range scan
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS balance_accounts (
+    id           INTEGER PRIMARY KEY,
+    account_iban TEXT NOT NULL UNIQUE,
+    account_id   TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS balance_types (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS balance_snapshots (
+    account        INTEGER NOT NULL,
+    balance_type   INTEGER NOT NULL,
+    taken_at       INTEGER NOT NULL,
+    amount         REAL NOT NULL,
+    currency       TEXT NOT NULL,
+    reference_date TEXT,
+    last_change    INTEGER,
+    PRIMARY KEY (account, balance_type, taken_at)
+) WITHOUT ROWID;
+"""
+
+LATEST = """
+SELECT s.account, s.balance_type, s.amount, s.currency, s.reference_date, s.last_change
+FROM balance_snapshots s
+JOIN (
+    SELECT account, balance_type, MAX(taken_at) AS taken_at
+    FROM balance_snapshots GROUP BY account, balance_type
+) latest USING (account, balance_type, taken_at)
+"""
+
+def parse_timestamp(value):
+    """
+    Unix seconds of an API date-time such as lastChangeDateTime, or None.
+    """
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _unchanged(previous, value):
+    # Banks that send lastChangeDateTime update it with the balance; other balances are
+    # compared by amount, currency and reference date
+    if previous is None:
+        return False
+    if value[3] is not None:
+        return previous[3] == value[3]
+    return previous[:3] == value[:3]
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class BalanceHistory:
+    """
+    Time series of the balances reported for each account, one series per account and
+    balance type. A snapshot is only stored when the balance changed since the last one:
+    by its lastChangeDateTime when the bank sends one, else by amount and reference date.
+    A series therefore reads as a step function: the balance at any moment is the last
+    snapshot taken before it.
+    """
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        check_sqlite_version()
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._accounts = dict(self.conn.execute("SELECT account_iban, id FROM balance_accounts"))
+        self._types = dict(self.conn.execute("SELECT name, id FROM balance_types"))
+        # Last snapshot of each series, to skip unchanged balances without a query
+        self._latest = {
+            (account, balance_type): (amount, currency, reference_date, last_change)
+            for account, balance_type, amount, currency, reference_date, last_change
+            in self.conn.execute(LATEST)
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _id(self, cache, created, table, column, value):
+        # New IDs go to `created` and only reach `cache` once the transaction commits
+        key = cache.get(value, created.get(value))
+        if key is None:
+            cursor = self.conn.execute(f"INSERT INTO {table} ({column}) VALUES (?)", (value,))
+            key = created[value] = cursor.lastrowid
+        return key
+
+    def record(self, account_iban, balances, account_id='', taken_at=None):
+        """
+        Store the changed entries of an API balances list for one account, taken at
+        `taken_at` (Unix seconds, default now). Returns the number of snapshots written.
+        """
+        taken_at = int(taken_at if taken_at is not None else time.time())
+        rows = []
+        accounts, types, latest = {}, {}, {}
+        with self.conn:
+            account = self._id(self._accounts, accounts, 'balance_accounts', 'account_iban', account_iban)
+            if account_id:
+                self.conn.execute("UPDATE balance_accounts SET account_id = ? WHERE id = ?", (account_id, account))
+            for balance in balances:
+                amount_info = balance.get('balanceAmount') or {}
+                amount = _to_float(amount_info.get('amount'))
+                if amount is None or not balance.get('balanceType'):
+                    continue
+                balance_type = self._id(self._types, types, 'balance_types', 'name', balance['balanceType'])
+                value = (
+                    amount, amount_info.get('currency', ''), balance.get('referenceDate'),
+                    parse_timestamp(balance.get('lastChangeDateTime'))
+                )
+                key = (account, balance_type)
+                if _unchanged(latest.get(key, self._latest.get(key)), value):
+                    continue
+                rows.append((account, balance_type, taken_at) + value)
+                latest[key] = value
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO balance_snapshots VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        # A rolled back transaction leaves the caches as they were
+        self._accounts.update(accounts)
+        self._types.update(types)
+        self._latest.update(latest)
+        return len(rows)
+
+    def history(self, account_iban=None, balance_type=None, start=None, end=None, daily=False):
+        """
+        Return snapshots in time order as dicts, optionally for one account and balance
+        type between `start` and `end` (YYYY-MM-DD, inclusive). With `daily`, only the
+        last snapshot of each day is returned per series.
+        """
+        query = """
+            SELECT a.account_iban, t.name, s.taken_at, s.amount, s.currency, s.reference_date, s.last_change
+            FROM balance_snapshots s
+            JOIN balance_accounts a ON a.id = s.account
+            JOIN balance_types t ON t.id = s.balance_type
+            WHERE 1=1
+        """
+        params = []
+        if account_iban:
+            query += " AND a.account_iban = ?"
+            params.append(account_iban)
+        if balance_type:
+            query += " AND t.name = ?"
+            params.append(balance_type)
+        if start:
+            query += " AND s.taken_at >= ?"
+            params.append(parse_timestamp(f"{start}T00:00:00"))
+        if end:
+            query += " AND s.taken_at < ?"
+            params.append(parse_timestamp(f"{end}T00:00:00") + 24 * 3600)
+        if daily:
+            # Last snapshot of each series per (UTC) day
+            query = f"""
+                SELECT account_iban, name, taken_at, amount, currency, reference_date, last_change FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY account_iban, name, date(taken_at, 'unixepoch') ORDER BY taken_at DESC
+                    ) AS position
+                    FROM ({query})
+                ) WHERE position = 1
+            """
+        query += " ORDER BY taken_at, account_iban, name"
+        columns = ['account_iban', 'balance_type', 'taken_at', 'amount', 'currency', 'reference_date', 'last_change']
+        snapshots = []
+        for row in self.conn.execute(query, params):
+            snapshot = dict(zip(columns, row))
+            for key in ('taken_at', 'last_change'):
+                if snapshot[key] is not None:
+                    snapshot[key] = datetime.fromtimestamp(snapshot[key], timezone.utc).isoformat(timespec='seconds')
+            snapshots.append(snapshot)
+        return snapshots
@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .institutions import DEFAULT_CACHE_DIR
+
+# Seconds each kind of API response may be reused for. Linked requisitions can expire
+# or be revoked at any time, so they are only reused briefly; final statuses for longer
+DEFAULT_TTLS = {
+    'requisition': 6 * 3600,
+    'linked_requisition': 15 * 60,
+    'account_details': 7 * 24 * 3600,
+    'agreement': 7 * 24 * 3600,
+}
+# Requisition statuses worth caching: linked, or final (expired, rejected, suspended);
+# the others are steps of a link still in progress
+CACHED_REQUISITION_STATUSES = {'LN', 'EX', 'RJ', 'SU'}
+# Account API errors meaning the requisition no longer grants access (expired, revoked,
+# suspended), so a cached linked requisition can't be trusted any more
+REFUSED_STATUSES = {401, 403, 409}
+
+class MetadataCache:
+    """
+    Persistent cache of rarely-changing API responses (requisitions, account details),
+    one JSON file per kind, with a TTL per kind and explicit invalidation.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttls=None):
+        self.cache_dir = cache_dir
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path(self, kind):
+        return os.path.join(self.cache_dir, f"{kind}.json")
+
+    def _load(self, kind):
+        if kind not in self._entries:
+            try:
+                with open(self._path(kind), encoding='utf-8') as f:
+                    self._entries[kind] = json.load(f)
+            except (OSError, ValueError):
+                self._entries[kind] = {}
+        return self._entries[kind]
+
+    def _save(self, kind):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(kind)
+        # A temporary file of its own for each write, so concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{kind}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._entries[kind], f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, kind, key, ttl=None):
+        """
+        Return the cached value, or None if missing or older than `ttl` (default: the kind's TTL).
+        """
+        with self._lock:
+            entry = self._load(kind).get(key)
+        if ttl is None:
+            ttl = self.ttls.get(kind, 0)
+        if entry and time.time() - entry['fetched_at'] < ttl:
+            return entry['value']
+        return None
+
+    def set(self, kind, key, value):
+        with self._lock:
+            self._load(kind)[key] = {'fetched_at': time.time(), 'value': value}
+            self._save(kind)
+
+    def invalidate(self, kind, key=None):
+        """
+        Drop one cached entry, or every entry of `kind` when no key is given.
+        """
+        with self._lock:
+            entries = self._load(kind)
+            if key is None:
+                entries.clear()
+            else:
+                entries.pop(key, None)
+            self._save(kind)
+
+    def invalidate_requisition(self, requisition_id):
+        """
+        Forget a requisition and the details of the accounts it linked,
+        e.g. when it expired or was re-created.
+        """
+        requisition = self.get('requisition', requisition_id) or {}
+        for account_id in requisition.get('accounts', []):
+            self.invalidate('account_details', account_id)
+        self.invalidate('requisition', requisition_id)
+
+    def invalidate_refused(self, account_id, error):
+        """
+        Forget the cached requisition that linked `account_id` when an API call for the
+        account failed with one of REFUSED_STATUSES, so the next run checks it again
+        instead of trusting the cache. Returns whether a requisition was forgotten.
+        """
+        if getattr(getattr(error, 'response', None), 'status_code', None) not in REFUSED_STATUSES:
+            return False
+        with self._lock:
+            requisition_ids = [
+                requisition_id for requisition_id, entry in self._load('requisition').items()
+                if account_id in entry['value'].get('accounts', [])
+            ]
+        for requisition_id in requisition_ids:
+            self.invalidate_requisition(requisition_id)
+        return bool(requisition_ids)
+
+    def cached(self, kind, key, fetch):
+        """
+        Return the cached value for `key`, calling `fetch()` and storing its result on a miss.
+        """
+        value = self.get(kind, key)
+        if value is None:
+            value = fetch()
+            self.set(kind, key, value)
+        return value
+
+    def get_requisition(self, client, requisition_id):
+        """
+        Cached client.requisition.get_requisition_by_id; requisitions still being linked
+        are not kept, so their progress is always seen, and linked ones only briefly.
+        """
+        requisition = self.get('requisition', requisition_id)
+        if requisition is not None and requisition.get('status') == 'LN':
+            requisition = self.get('requisition', requisition_id, ttl=self.ttls['linked_requisition'])
+        if requisition is None:
+            requisition = client.requisition.get_requisition_by_id(requisition_id)
+            if requisition.get('status', '') in CACHED_REQUISITION_STATUSES:
+                self.set('requisition', requisition_id, requisition)
+        return requisition
+
+    def get_agreement(self, client, agreement_id):
+        """
+        Cached client.agreement.get_agreement_by_id.
+        """
+        return self.cached('agreement', agreement_id, lambda: client.agreement.get_agreement_by_id(agreement_id))
+
+    def get_account_details(self, account, account_id):
+        """
+        Cached account.get_details().
+        """
+        return self.cached('account_details', account_id, account.get_details)
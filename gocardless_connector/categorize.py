@@ -0,0 +1,399 @@
+import json
+import re
+
+RULE_FIELDS = {
+    'category', 'keywords', 'regex', 'case_sensitive', 'counterparty', 'iban', 'min_amount', 'max_amount'
+}
+# Distinct texts remembered by each matcher before its cache is reset
+DEFAULT_CACHE_SIZE = 500000
+# Inline flags such as (?i), which apply to the whole pattern they start
+INLINE_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+# Tokens of a regex, capturing backreferences (\1, (?P=name)) and conditionals ((?(1)...));
+# octal escapes, other escapes and character classes are skipped as a whole
+REGEX_TOKENS = re.compile(r'\\[0-7]{3}|(\\[1-9][0-9]?)|\\.|\[\^?\]?(?:\\.|[^\]])*\]|(\(\?P=|\(\?\()|.', re.DOTALL)
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+def _to_float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else number  # NaN
+
+def normalize_iban(value):
+    return str(value or '').replace(' ', '').upper()
+
+def scope_flags(pattern, flags=''):
+    """
+    Rewrite inline flags at the start of `pattern`, e.g. '(?s)salary', as a scoped group,
+    '(?s:salary)', so they still only apply to this pattern once it is merged with others.
+    `flags` (e.g. 'i') are added to those the pattern declares.
+    """
+    found = INLINE_FLAGS.match(pattern)
+    while found:
+        flags += found.group(1)
+        pattern = pattern[found.end():]
+        found = INLINE_FLAGS.match(pattern)
+    if not flags:
+        return pattern
+    # A trailing comment in verbose mode would swallow the closing parenthesis
+    return f'(?{flags}:{pattern}\n)' if 'x' in flags else f'(?{flags}:{pattern})'
+
+def group_reference(pattern):
+    """
+    The first backreference or conditional group in `pattern`, or None. Both refer to
+    groups by number or name, which no longer line up once patterns are merged.
+    """
+    for token in REGEX_TOKENS.finditer(pattern):
+        if token.group(1) or token.group(2):
+            return token.group()
+    return None
+
+def trie_pattern(words):
+    """
+    Regex source matching any of `words`, laid out as a prefix tree so that each
+    position only tries the branches allowed by its next character.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Words ending here may be followed by longer ones sharing the prefix
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+class TextMatcher:
+    """
+    Matches a text against the keywords and regexes of every rule with two compiled patterns.
+    Keywords (case-insensitive substrings) are merged into a single prefix-tree regex.
+    Regexes are merged into one pattern of optional lookaheads, each searching the text
+    on its own, so a text costs about one search per regex. Each regex carries its own
+    flags (see scope_flags); the merged pattern adds none. Results are cached per text.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        self.keywords = {}
+        self.regexes = []
+        self.cache = {}
+        self.cache_size = cache_size
+        self._keyword_re = None
+        self._regex_re = None
+        self._regex_groups = []
+
+    def add(self, rule_index, keywords=(), regexes=()):
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if keyword:
+                self.keywords.setdefault(keyword, []).append(rule_index)
+        for pattern in regexes:
+            self.regexes.append((rule_index, pattern))
+
+    def compile(self):
+        if self.keywords:
+            self._keyword_re = re.compile('(?=(%s))' % trie_pattern(self.keywords))
+        if self.regexes:
+            self._regex_groups = [(f'_rule{n}', rule_index) for n, (rule_index, _) in enumerate(self.regexes)]
+            self._regex_re = re.compile(''.join(
+                f'(?:(?=(?s:.*?)(?P<{name}>{pattern})))?'
+                for (name, _), (_, pattern) in zip(self._regex_groups, self.regexes)
+            ))
+        self.cache.clear()
+
+    @property
+    def empty(self):
+        return not self.keywords and not self.regexes
+
+    def match(self, text):
+        """
+        Return the sorted tuple of rule indices whose keywords or regexes occur in `text`.
+        """
+        matched = self.cache.get(text)
+        if matched is not None:
+            return matched
+
+        rules = set()
+        if text:
+            if self._keyword_re is not None:
+                for found in self._keyword_re.findall(text.lower()):
+                    # The longest keyword starting at each position is returned;
+                    # shorter keywords that are prefixes of it match there as well
+                    for end in range(1, len(found) + 1):
+                        rules.update(self.keywords.get(found[:end], ()))
+            if self._regex_re is not None:
+                groups = self._regex_re.match(text).groupdict()
+                rules.update(index for name, index in self._regex_groups if groups[name] is not None)
+
+        matched = tuple(sorted(rules))
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[text] = matched
+        return matched
+
+class CategoryRule:
+    """
+    One categorization rule: every condition it sets must hold for a transaction to match.
+    """
+
+    def __init__(self, category, keywords=(), regexes=(), counterparty=(), ibans=(),
+                 min_amount=None, max_amount=None):
+        self.category = category
+        self.keywords = list(keywords)
+        self.regexes = list(regexes)
+        self.counterparty = list(counterparty)
+        self.ibans = {normalize_iban(iban) for iban in ibans}
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+
+    @property
+    def has_text(self):
+        return bool(self.keywords or self.regexes)
+
+    @classmethod
+    def from_dict(cls, raw, number):
+        """
+        Validate one entry of a rules file; `number` is its 1-based position for error messages.
+        """
+        if not isinstance(raw, dict):
+            raise ValueError(f"Rule {number}: expected an object, got {type(raw).__name__}")
+        unknown = set(raw) - RULE_FIELDS
+        if unknown:
+            raise ValueError(f"Rule {number}: unknown field(s) {', '.join(sorted(unknown))}")
+        if not raw.get('category'):
+            raise ValueError(f"Rule {number}: 'category' is required")
+
+        case_sensitive = raw.get('case_sensitive', False)
+        if not isinstance(case_sensitive, bool):
+            raise ValueError(f"Rule {number}: 'case_sensitive' must be true or false")
+
+        # Regexes are merged into one pattern (see TextMatcher), so each must be self-contained
+        # and carry its flags with it; validating the scoped pattern checks what will run
+        regexes = []
+        for pattern in _as_list(raw.get('regex')):
+            scoped = scope_flags(pattern, '' if case_sensitive else 'i')
+            try:
+                compiled = re.compile(scoped)
+            except re.error as e:
+                raise ValueError(f"Rule {number}: invalid regex {pattern!r}: {e}")
+            if compiled.flags != re.compile('').flags:
+                raise ValueError(f"Rule {number}: regex {pattern!r}: inline flags are only supported at the start")
+            reference = group_reference(pattern)
+            if reference:
+                raise ValueError(f"Rule {number}: regex {pattern!r}: group references such as {reference!r} are not supported")
+            regexes.append(scoped)
+
+        amounts = {}
+        for field in ('min_amount', 'max_amount'):
+            if raw.get(field) is not None:
+                amounts[field] = _to_float(raw[field])
+                if amounts[field] is None:
+                    raise ValueError(f"Rule {number}: '{field}' must be a number")
+
+        rule = cls(
+            raw['category'],
+            keywords=_as_list(raw.get('keywords')),
+            regexes=regexes,
+            counterparty=_as_list(raw.get('counterparty')),
+            ibans=_as_list(raw.get('iban')),
+            **amounts
+        )
+        if not (rule.has_text or rule.counterparty or rule.ibans or amounts):
+            raise ValueError(f"Rule {number}: needs at least one condition")
+        return rule
+
+    def accepts(self, amount, iban):
+        """
+        Check the amount range and account IBAN conditions for one transaction.
+        """
+        if self.ibans and iban not in self.ibans:
+            return False
+        if self.min_amount is not None and (amount is None or amount < self.min_amount):
+            return False
+        if self.max_amount is not None and (amount is None or amount > self.max_amount):
+            return False
+        return True
+
+class Categorizer:
+    """
+    Assigns each transaction the category of the first rule it matches, or ''.
+    Text conditions are evaluated once per distinct description/counterparty; amount
+    and IBAN conditions are then applied to whole columns at a time.
+    """
+
+    def __init__(self, rules, cache_size=DEFAULT_CACHE_SIZE):
+        self.rules = list(rules)
+        self.descriptions = TextMatcher(cache_size)
+        self.counterparties = TextMatcher(cache_size)
+        for index, rule in enumerate(self.rules):
+            self.descriptions.add(index, rule.keywords, rule.regexes)
+            self.counterparties.add(index, rule.counterparty)
+        self.descriptions.compile()
+        self.counterparties.compile()
+
+    def categorize_row(self, row):
+        """
+        Return the category for one export row.
+        """
+        description = row.get('description')
+        description = description if isinstance(description, str) else ''
+        description_hits = self.descriptions.match(description) if not self.descriptions.empty else ()
+        counterparty_hits = ()
+        if not self.counterparties.empty:
+            counterparty = row.get('counterparty')
+            counterparty_hits = self.counterparties.match(
+                counterparty if isinstance(counterparty, str) and counterparty else description
+            )
+        amount = _to_float(row.get('amount'))
+        iban = normalize_iban(row.get('account_iban'))
+
+        for index, rule in enumerate(self.rules):
+            if rule.has_text and index not in description_hits:
+                continue
+            if rule.counterparty and index not in counterparty_hits:
+                continue
+            if rule.accepts(amount, iban):
+                return rule.category
+        return ''
+
+    def categorize_rows(self, rows):
+        """
+        Pass export rows through, setting their 'category'.
+        """
+        for row in rows:
+            row['category'] = self.categorize_row(row)
+            yield row
+
+    def _rule_hits(self, matcher, uniques):
+        # For each rule, the positions in `uniques` of the values it matches;
+        # the matcher runs once per distinct value
+        hits = [[] for _ in self.rules]
+        for position, text in enumerate(uniques):
+            for index in matcher.match(text if isinstance(text, str) else str(text)):
+                hits[index].append(position)
+        return hits
+
+    def categorize(self, df):
+        """
+        Categorize a DataFrame with description, amount and account_iban columns
+        (and optionally counterparty). Returns a Series of categories aligned with `df`.
+        """
+        import numpy as np
+        import pandas as pd
+
+        categories = np.full(len(df), '', dtype=object)
+        if df.empty or not self.rules:
+            return pd.Series(categories, index=df.index)
+
+        descriptions = _FactorizedColumn(df['description'])
+        description_hits = self._rule_hits(self.descriptions, descriptions.uniques)
+        counterparty_hits = None
+        if not self.counterparties.empty:
+            if 'counterparty' in df:
+                # Rows without a counterparty name are matched on their description
+                named = df['counterparty'].fillna('') != ''
+                counterparties = _FactorizedColumn(df['counterparty'].where(named, df['description']))
+            else:
+                counterparties = descriptions
+            counterparty_hits = self._rule_hits(self.counterparties, counterparties.uniques)
+
+        amounts = pd.to_numeric(df['amount'], errors='coerce').to_numpy(dtype=float)
+        ibans = _FactorizedColumn(df['account_iban'])
+        iban_values = [normalize_iban(value) for value in ibans.uniques]
+
+        # Rules are applied in priority order; a text rule only looks at the rows
+        # holding one of the descriptions it matched, so each pass stays small
+        assigned = np.zeros(len(df), dtype=bool)
+        unassigned = len(df)
+        for index, rule in enumerate(self.rules):
+            if not unassigned:
+                break
+            if rule.has_text:
+                rows = descriptions.rows(description_hits[index])
+            elif rule.counterparty:
+                rows = counterparties.rows(counterparty_hits[index])
+            else:
+                rows = np.flatnonzero(~assigned)
+            rows = rows[~assigned[rows]]
+            if rule.has_text and rule.counterparty:
+                rows = rows[counterparties.isin(rows, counterparty_hits[index])]
+            if rule.ibans:
+                allowed = [position for position, value in enumerate(iban_values) if value in rule.ibans]
+                rows = rows[ibans.isin(rows, allowed)]
+            if rule.min_amount is not None:
+                rows = rows[amounts[rows] >= rule.min_amount]
+            if rule.max_amount is not None:
+                rows = rows[amounts[rows] <= rule.max_amount]
+            categories[rows] = rule.category
+            assigned[rows] = True
+            unassigned -= len(rows)
+
+        return pd.Series(categories, index=df.index)
+
+class _FactorizedColumn:
+    """
+    A column's distinct values, with a lazily built index from each value to its rows.
+    """
+
+    def __init__(self, column):
+        import pandas as pd
+
+        self.codes, self.uniques = pd.factorize(column)
+        self._order = None
+        self._starts = None
+
+    def rows(self, positions):
+        """
+        Row numbers holding any of the distinct values at `positions`, in no particular order.
+        """
+        import numpy as np
+
+        if not positions:
+            return np.empty(0, dtype=np.intp)
+        if self._order is None:
+            # Rows sorted by value code: rows of code c are order[starts[c]:starts[c + 1]].
+            # Missing values (code -1) sort first and are never looked up
+            self._order = np.argsort(self.codes, kind='stable')
+            self._starts = np.searchsorted(self.codes[self._order], np.arange(len(self.uniques) + 1))
+        return np.concatenate([
+            self._order[self._starts[position]:self._starts[position + 1]] for position in positions
+        ])
+
+    def isin(self, rows, positions):
+        """
+        Boolean mask over `rows`: True where the row holds one of the values at `positions`.
+        """
+        import numpy as np
+
+        # Extra last slot so missing values (code -1) are never matched
+        allowed = np.zeros(len(self.uniques) + 1, dtype=bool)
+        allowed[list(positions)] = True
+        return allowed[self.codes[rows]]
+
+def load_rules(path):
+    """
+    Load a JSON rules file (a list of rules, or an object with a "rules" list) into a Categorizer.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('rules', [])
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of rules")
+    rules = [CategoryRule.from_dict(raw, number) for number, raw in enumerate(data, 1)]
+    try:
+        # Compiles every rule's keywords and regexes into the merged matchers
+        return Categorizer(rules)
+    except re.error as e:
+        raise ValueError(f"{path}: the rules' regexes can't be combined: {e}")
@@ -1,70 +1,116 @@
 import os
-from dotenv import load_dotenv, set_key
-from nordigen import NordigenClient
+import sys
+import json
+import time
+from contextlib import redirect_stdout
+from dotenv import load_dotenv
 from uuid import uuid4
+from collections import deque
+import signal
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import click
 import csv
-from datetime import datetime
-import pandas as pd
+import functools
+from datetime import date, datetime
+from .balances import BalanceHistory
+from .cache import MetadataCache
+from .categorize import load_rules, normalize_iban
+from .convert import DEFAULT_CHUNKSIZE, convert_frames, iter_input_frames
+from .daemon import (
+    DEFAULT_ACCOUNTS_REFRESH, DEFAULT_DAILY_CALLS, POLL_INTERVAL,
+    AccountScheduler, TokenRefresher
+)
+from .dedup import DedupIndex, open_output_index
+from .export import (
+    EXPORT_FORMATS, FORMAT_EXTENSIONS,
+    TransactionSummary, read_transactions_csv, write_transactions
+)
+from .health import (
+    DEFAULT_EXPIRY_WARNING_DAYS,
+    check_requisition, check_requisitions, report_health
+)
+from .institutions import DEFAULT_INSTITUTIONS_TTL, InstitutionCatalog
+from .journal import DownloadJournal, download_key
+from .metrics import REGISTRY, MetricsRegistry, MetricsWriter
+from .models import Transaction
+from .state import DEFAULT_STATE_FILE, StateStore
+from .store import DEFAULT_DB_FILE, TransactionStore, anchor_balance
+from .tenants import DEFAULT_BATCH_WORKERS, DEFAULT_PARALLEL_TENANTS, load_manifest
+from .tokens import TokenStore
+from .sync import (
+    DEFAULT_OVERLAP_DAYS,
+    apply_cursor, cursor_date_from, number_occurrences
+)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize GoCardless client
-client = NordigenClient(
-    secret_id=os.getenv('GOCARDLESS_SECRET_ID'),
-    secret_key=os.getenv('GOCARDLESS_SECRET_KEY')
-)
+# GoCardless client, created by validate_tokens() in the commands that need it
+client = None
+# Alternative API root, e.g. a local stub server for benchmarks
+API_URL = os.getenv('GOCARDLESS_API_URL')
 
-def generate_new_tokens():
+def create_client(secret_id, secret_key, **options):
+    """
+    Build the API client; `options` (base_url, rate_limiter, metrics, ...) are passed to
+    PooledNordigenClient. The HTTP stack is imported here rather than at module level
+    so commands that never call the API (--help, list-banks, convert) start fast.
+    """
+    from .transport import PooledNordigenClient
+    if API_URL:
+        options.setdefault('base_url', API_URL)
+    return PooledNordigenClient(secret_id=secret_id, secret_key=secret_key, **options)
+
+def client_metrics(client):
+    """
+    The metrics registry `client` records into; the global one for plain clients.
+    """
+    return getattr(client, 'metrics', None) or REGISTRY
+
+def generate_new_tokens(token_store=None, client=None):
     """
     Comprehensive token generation process with detailed error handling and logging.
+    Without a `client`, one is created from the credentials in the token store's .env file.
     """
-    # Try multiple locations for .env file
-    env_locations = [
-        os.path.join(os.getcwd(), '.env'),  # Current working directory
-        os.path.join(os.path.dirname(__file__), '.env'),  # Package directory
-    ]
-    
-    env_loaded = False
-    for env_path in env_locations:
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
-            env_loaded = True
-            break
+    token_store = token_store or TokenStore()
     
-    if not env_loaded:
-        raise ValueError("""
-        ❌ .env file not found!
-        Please create a .env file in your current directory with:
-        GOCARDLESS_SECRET_ID=your_actual_secret_id
-        GOCARDLESS_SECRET_KEY=your_actual_secret_key
-        """)
-
-    # Retrieve secret credentials
-    SECRET_ID = os.getenv('GOCARDLESS_SECRET_ID')
-    SECRET_KEY = os.getenv('GOCARDLESS_SECRET_KEY')
-
-    # Validate credentials
-    if not SECRET_ID or not SECRET_KEY:
-        raise ValueError("""
-        ❌ Missing GoCardless Credentials
-        Please ensure your .env file contains:
-        GOCARDLESS_SECRET_ID=your_actual_secret_id
-        GOCARDLESS_SECRET_KEY=your_actual_secret_key
-        
-        How to obtain these:
-        1. Sign up at GoCardless Bank Account Data API
-        2. Navigate to API credentials section
-        3. Generate new Secret ID and Secret Key
-        """)
+    if client is None:
+        if os.path.exists(token_store.env_path):
+            load_dotenv(token_store.env_path)
+        else:
+            raise ValueError("""
+            ❌ .env file not found!
+            Please create a .env file in your current directory with:
+            GOCARDLESS_SECRET_ID=your_actual_secret_id
+            GOCARDLESS_SECRET_KEY=your_actual_secret_key
+            """)
+
+        # Retrieve secret credentials
+        SECRET_ID = os.getenv('GOCARDLESS_SECRET_ID')
+        SECRET_KEY = os.getenv('GOCARDLESS_SECRET_KEY')
+
+        # Validate credentials
+        if not SECRET_ID or not SECRET_KEY:
+            raise ValueError("""
+            ❌ Missing GoCardless Credentials
+            Please ensure your .env file contains:
+            GOCARDLESS_SECRET_ID=your_actual_secret_id
+            GOCARDLESS_SECRET_KEY=your_actual_secret_key
+        
+            How to obtain these:
+            1. Sign up at GoCardless Bank Account Data API
+            2. Navigate to API credentials section
+            3. Generate new Secret ID and Secret Key
+            """)
 
     try:
         # Initialize GoCardless client
-        client = NordigenClient(
-            secret_id=SECRET_ID,
-            secret_key=SECRET_KEY
-        )
+        if client is None:
+            client = create_client(
+                secret_id=SECRET_ID,
+                secret_key=SECRET_KEY
+            )
 
         # Generate new tokens
         token_data = client.generate_token()
@@ -73,12 +119,8 @@ def generate_new_tokens():
         if not token_data or 'access' not in token_data or 'refresh' not in token_data:
             raise ValueError("Token generation failed. Incomplete token data.")
 
-        # Get path to .env file
-        dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-
-        # Update .env with new tokens
-        set_key(dotenv_path, 'GOCARDLESS_ACCESS_TOKEN', token_data['access'])
-        set_key(dotenv_path, 'GOCARDLESS_REFRESH_TOKEN', token_data['refresh'])
+        # Update .env with new tokens and their expiry
+        token_store.save(token_data)
 
         print("🔑 New Tokens Generated Successfully:")
         print(f"Access Token (first 10 chars): {token_data['access'][:10]}...")
@@ -98,10 +140,11 @@ def generate_new_tokens():
         print("- Contact GoCardless support if issue persists")
         raise
 
-def refresh_access_token(client, refresh_token):
+def refresh_access_token(client, refresh_token, token_store=None):
     """
     Enhanced token refresh with comprehensive error handling and diagnostics.
     """
+    token_store = token_store or TokenStore()
     try:
         # Validate refresh token
         if not refresh_token:
@@ -118,12 +161,7 @@ def refresh_access_token(client, refresh_token):
         client.token = new_token_data['access']
 
         # Update .env file
-        dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-        set_key(dotenv_path, 'GOCARDLESS_ACCESS_TOKEN', new_token_data['access'])
-        
-        # Only update refresh token if a new one was provided
-        if 'refresh' in new_token_data:
-            set_key(dotenv_path, 'GOCARDLESS_REFRESH_TOKEN', new_token_data['refresh'])
+        token_store.save(new_token_data)
 
         print("✅ Access Token Refreshed Successfully")
         return new_token_data
@@ -138,38 +176,54 @@ def refresh_access_token(client, refresh_token):
         # Instead of generating new tokens here, raise the exception
         raise
 
-def validate_tokens():
+def validate_tokens(token_store=None):
     """
-    Validate the access and refresh tokens. If the access token is missing or invalid,
-    generate new tokens or refresh the existing ones.
+    Validate the access and refresh tokens. A stored access token is reused until
+    shortly before it expires; only then is it refreshed, or new tokens generated
+    if the refresh token is missing, expired or rejected.
     Returns the updated client instance.
     """
     global client
+    token_store = token_store or TokenStore()
     
-    # Load environment variables to ensure we have the latest tokens
-    load_dotenv()
+    # Load environment variables to ensure we have the latest credentials
+    load_dotenv(token_store.env_path)
     
-    refresh_token = os.getenv('GOCARDLESS_REFRESH_TOKEN')
-    access_token = os.getenv('GOCARDLESS_ACCESS_TOKEN')
-    secret_id = os.getenv('GOCARDLESS_SECRET_ID')
-    secret_key = os.getenv('GOCARDLESS_SECRET_KEY')
-
     # Reinitialize client with secret credentials
-    client = NordigenClient(
-        secret_id=secret_id,
-        secret_key=secret_key
+    client = create_client(
+        secret_id=os.getenv('GOCARDLESS_SECRET_ID'),
+        secret_key=os.getenv('GOCARDLESS_SECRET_KEY')
     )
+    return authenticate(client, token_store)
 
+def authenticate(client, token_store):
+    """
+    Give `client` a valid access token from `token_store`, refreshing or generating
+    tokens as validate_tokens does, but without touching the module-level client or
+    the environment: each client can have its own credentials and token store.
+    Returns `client`.
+    """
     try:
-        if not access_token:
-            print("❌ No access token found. Generating new tokens...")
-            client, token_data = generate_new_tokens()
-        else:
-            try:
-                token_data = refresh_access_token(client, refresh_token)
-            except Exception as e:
-                print("🔄 Token refresh failed, generating new tokens...")
-                client, token_data = generate_new_tokens()
+        # Other processes may be refreshing at the same time; the lock makes them
+        # wait and then pick up the token that was just stored
+        with client_metrics(client).timer('stage', stage='token'), token_store.locked():
+            values = token_store.load()
+            access_token = token_store.valid_access_token(values)
+            refresh_token = token_store.valid_refresh_token(values)
+            
+            if access_token:
+                client.token = access_token
+                return client
+            
+            if not refresh_token:
+                print("❌ No valid refresh token found. Generating new tokens...")
+                _, token_data = generate_new_tokens(token_store, client)
+            else:
+                try:
+                    token_data = refresh_access_token(client, refresh_token, token_store)
+                except Exception as e:
+                    print("🔄 Token refresh failed, generating new tokens...")
+                    _, token_data = generate_new_tokens(token_store, client)
         
         # Ensure client has the latest token
         client.token = token_data['access']
@@ -179,12 +233,37 @@ def validate_tokens():
         print(f"❌ Token validation error: {e}")
         raise
 
+def renew_client_token(client, token_store=None):
+    """
+    Make sure a long-lived `client` holds a valid access token, refreshing (or regenerating)
+    it when due. Returns the seconds until the token needs checking again.
+    """
+    token_store = token_store or TokenStore()
+    with token_store.locked():
+        tokens = token_store.load()
+        access_token = token_store.valid_access_token(tokens)
+        if not access_token:
+            refresh_token = token_store.valid_refresh_token(tokens)
+            try:
+                if not refresh_token:
+                    raise ValueError("No valid refresh token")
+                access_token = refresh_access_token(client, refresh_token, token_store)['access']
+            except Exception:
+                print("🔄 Token refresh failed, generating new tokens...")
+                _, token_data = generate_new_tokens(token_store, client)
+                access_token = token_data['access']
+            tokens = token_store.load()
+    client.token = access_token
+    expires_at = int(tokens.get('access_expires_at') or 0)
+    return expires_at - token_store.margin - time.time()
+
 def get_bank_transactions(account, start_date=None, end_date=None):
     """
-    Retrieve transactions for a specific account.
+    Retrieve transactions for a specific account, optionally limited to booking dates
+    between `start_date` and `end_date` (YYYY-MM-DD) by the API itself.
     """
     try:
-        transactions = account.get_transactions()
+        transactions = account.get_transactions(date_from=start_date, date_to=end_date)
         if not isinstance(transactions, dict) or 'transactions' not in transactions:
             print("No transaction data available")
             return
@@ -219,6 +298,24 @@ def get_bank_transactions(account, start_date=None, end_date=None):
     except Exception as e:
         print(f"Error retrieving transactions: {e}")
 
+def print_balances(account):
+    """
+    Print the current balances of an account.
+    """
+    balances = account.get_balances()
+    if isinstance(balances, dict) and 'balances' in balances:
+        print("\n💰 Current Balances:")
+        for balance in balances['balances']:
+            balance_type = balance.get('balanceType', 'Unknown')
+            amount = balance.get('balanceAmount', {}).get('amount')
+            currency = balance.get('balanceAmount', {}).get('currency')
+            last_change = balance.get('lastChangeDateTime', 'Unknown')
+            print(f"\nType: {balance_type}")
+            print(f"Amount: {amount} {currency}")
+            print(f"Last Updated: {last_change}")
+    else:
+        print("Balance information not available")
+
 def handle_bank_account_options(account):
     """
     Handle options for a specific bank account.
@@ -232,19 +329,7 @@ def handle_bank_account_options(account):
         choice = input("\nEnter your choice (1-3): ")
         
         if choice == "1":
-            balances = account.get_balances()
-            if isinstance(balances, dict) and 'balances' in balances:
-                print("\n💰 Current Balances:")
-                for balance in balances['balances']:
-                    balance_type = balance.get('balanceType', 'Unknown')
-                    amount = balance.get('balanceAmount', {}).get('amount')
-                    currency = balance.get('balanceAmount', {}).get('currency')
-                    last_change = balance.get('lastChangeDateTime', 'Unknown')
-                    print(f"\nType: {balance_type}")
-                    print(f"Amount: {amount} {currency}")
-                    print(f"Last Updated: {last_change}")
-            else:
-                print("Balance information not available")
+            print_balances(account)
                 
         elif choice == "2":
             get_bank_transactions(account)
@@ -255,9 +340,10 @@ def handle_bank_account_options(account):
         else:
             print("Invalid choice. Please try again.")
 
-def select_institution(institutions):
+def select_institution(index):
     """
     Enhanced institution selection with direct ID input option.
+    Takes an InstitutionIndex, so ID lookups and name searches don't scan the full list.
     """
     while True:
         print("\n🏦 Bank Selection Options:")
@@ -272,7 +358,7 @@ def select_institution(institutions):
         if choice == "4":
             bank_id = input("Enter the bank ID: ")
             # Find bank by ID
-            matching_bank = next((bank for bank in institutions if bank['id'] == bank_id), None)
+            matching_bank = index.get(bank_id)
             if matching_bank:
                 return matching_bank
             else:
@@ -281,27 +367,22 @@ def select_institution(institutions):
         
         elif choice == "1":
             # List All Banks
-            display_institutions(institutions)
+            matching_banks = index.institutions
+            display_institutions(matching_banks)
         
         elif choice == '2':
             # Search by Name
-            search_term = input("\nEnter bank name or partial name: ").lower()
-            matching_banks = [
-                bank for bank in institutions 
-                if search_term in bank['name'].lower()
-            ]
+            search_term = input("\nEnter bank name or partial name: ")
+            matching_banks = index.search(search_term)
             
             display_institutions(matching_banks)
         
         elif choice == '3':
             # Filter by Country
             country = input("Enter country code (e.g., IT for Italy): ").upper()
-            country_banks = [
-                bank for bank in institutions 
-                if country in bank.get('countries', [])  # Changed to check countries array
-            ]
+            matching_banks = index.in_country(country)
             
-            display_institutions(country_banks)
+            display_institutions(matching_banks)
         
         elif choice == '5':
             print("Exiting bank selection.")
@@ -390,36 +471,37 @@ def display_accounts(accounts_info):
         except ValueError:
             print("Please enter a valid number.")
 
-def get_bank_accounts(client, institution):
+def get_bank_accounts(client, institution, metadata=None, interactive=True, state=None):
     """
     Modified to handle account selection and operations with better error handling.
+    With interactive=False the accounts are returned instead of opening the selection menu.
     """
+    metadata = metadata or MetadataCache()
+    state = state or StateStore()
     try:
         # Check for existing requisition ID for this institution
-        load_dotenv()
-        stored_req_id = os.getenv(f'REQUISITION_ID_{institution["id"]}')
+        stored_req_id = get_connected_banks(state).get(institution['id'])
         requisition = None
         
         if stored_req_id:
             print("\n🔄 Found existing authorization, attempting to reuse...")
             try:
-                requisition = client.requisition.get_requisition_by_id(
-                    requisition_id=stored_req_id
-                )
-                if requisition.get('status', '') != 'LN':
-                    print("❌ Existing authorization has expired")
+                requisition = metadata.get_requisition(client, stored_req_id)
+                health = check_requisition(client, institution['id'], stored_req_id, metadata)
+                if not health.healthy:
+                    print(f"❌ Existing authorization can't be used: {health.problem}")
+                    metadata.invalidate_requisition(stored_req_id)
                     stored_req_id = None
-                    # Remove invalid requisition ID from .env
-                    dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-                    set_key(dotenv_path, f'REQUISITION_ID_{institution["id"]}', '')
+                    # Forget the invalid requisition ID
+                    state.set('requisitions', institution['id'], None)
                 else:
                     print("✅ Successfully reused existing authorization")
             except Exception as e:
                 print(f"❌ Error with stored authorization: {e}")
+                metadata.invalidate_requisition(stored_req_id)
                 stored_req_id = None
-                # Remove invalid requisition ID from .env
-                dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-                set_key(dotenv_path, f'REQUISITION_ID_{institution["id"]}', '')
+                # Forget the invalid requisition ID
+                state.set('requisitions', institution['id'], None)
                 
         if not stored_req_id:
             # Initialize new session with the bank
@@ -439,14 +521,11 @@ def get_bank_accounts(client, institution):
             
             input("\nPress Enter after completing the authorization process...")
             
-            requisition = client.requisition.get_requisition_by_id(
-                requisition_id=init.requisition_id
-            )
+            requisition = metadata.get_requisition(client, init.requisition_id)
             
             # Store successful requisition ID
             if requisition.get('status', '') == 'LN':
-                dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-                set_key(dotenv_path, f'REQUISITION_ID_{institution["id"]}', init.requisition_id)
+                state.set('requisitions', institution['id'], init.requisition_id)
             else:
                 print("❌ Authorization failed or incomplete")
                 return None
@@ -459,7 +538,7 @@ def get_bank_accounts(client, institution):
         for account_id in requisition['accounts']:
             try:
                 account = client.account_api(account_id)
-                details = account.get_details()
+                details = metadata.get_account_details(account, account_id)
                 account_info = details.get('account', {})
                 
                 accounts_info.append({
@@ -475,6 +554,9 @@ def get_bank_accounts(client, institution):
                 print(f"Error processing account {account_id}: {str(e)}")
                 continue
         
+        if not interactive:
+            return accounts_info
+        
         while True:
             selected_account = display_accounts(accounts_info)
             if not selected_account:
@@ -485,6 +567,25 @@ def get_bank_accounts(client, institution):
     except Exception as e:
         print(f"\n❌ Error retrieving accounts: {e}")
 
+def get_connected_banks(state=None):
+    """
+    Return the stored requisition IDs keyed by bank ID, in a stable order.
+    REQUISITION_ID_<bank> variables from older .env files are still honoured unless
+    the state store has its own entry for that bank.
+    """
+    state = state or StateStore()
+    requisitions = {
+        key.replace('REQUISITION_ID_', '', 1): value
+        for key, value in os.environ.items()
+        if key.startswith('REQUISITION_ID_')
+    }
+    requisitions.update(state.section('requisitions'))
+    return {
+        bank_id: requisition_id
+        for bank_id, requisition_id in sorted(requisitions.items())
+        if requisition_id
+    }
+
 def list_connected_banks():
     """
     List bank IDs of banks to which the user has connected already.
@@ -492,78 +593,734 @@ def list_connected_banks():
     print("\n📋 Connected Banks:")
     print("-" * 50)
     
-    # Assuming bank IDs are stored in the .env file with a specific prefix
-    connected_banks = {key: value for key, value in os.environ.items() if key.startswith('REQUISITION_ID_')}
+    connected_banks = get_connected_banks()
     
     if not connected_banks:
         print("❌ No connected banks found.")
         return
     
     for bank_id, requisition_id in connected_banks.items():
-        print(f"Bank ID: {bank_id.split('_')[-1]}, Requisition ID: {requisition_id}")
+        print(f"Bank ID: {bank_id}, Requisition ID: {requisition_id}")
+
+def format_transaction(transaction, bank_name, account_iban, status='booked'):
+    """
+    Turn a raw API transaction into a Transaction record. `status` is 'booked' or 'pending'.
+    """
+    return Transaction.from_api(transaction, bank_name, account_iban, status)
+
+def fetch_bank_accounts(client, bank_id, requisition_id, catalog=None, metadata=None, health=None):
+    """
+    Resolve a connected bank into its name and linked account IDs. The requisition is
+    checked first (unless its RequisitionHealth `health` is given), so unusable banks
+    cost no institution lookup. Returns None if the bank cannot be used.
+    """
+    metadata = metadata or MetadataCache()
+    catalog = catalog or InstitutionCatalog(client, metadata.cache_dir)
+    metrics = client_metrics(client)
+    if health is None:
+        with metrics.timer('stage', stage='requisition', bank=bank_id):
+            health = check_requisition(client, bank_id, requisition_id, metadata)
+    if not health.healthy:
+        print(f"❌ {bank_id}: {health.problem}")
+        return None
+    try:
+        with metrics.timer('stage', stage='institution', bank=bank_id):
+            institution = catalog.get_by_id(bank_id)
+        
+        if not institution:
+            print(f"❌ Bank {bank_id} not found")
+            return None
+        
+        return institution['name'], health.accounts
+
+    except Exception as e:
+        print(f"Error processing bank {bank_id}: {str(e)}")
+        return None
+
+def load_account_transactions(client, bank_name, account_id, date_from=None, metadata=None,
+                              date_to=None, ibans=None):
+    """
+    Fetch the transactions of a single account, optionally limited to `date_from`..`date_to`
+    by the API. With `ibans`, accounts whose IBAN is not in the set are skipped without
+    fetching their transactions. API errors are raised to the caller.
+    """
+    metadata = metadata or MetadataCache()
+    metrics = client_metrics(client)
+    rows = []
+    account = client.account_api(account_id)
+    with metrics.timer('stage', stage='account_details', bank=bank_name, account=account_id):
+        details = metadata.get_account_details(account, account_id)
+    account_info = details.get('account', {})
+    account_iban = account_info.get('iban', 'Not available')
+    if ibans and normalize_iban(account_iban) not in ibans:
+        return rows
+    
+    # Get transactions for this account
+    with metrics.timer('stage', stage='transactions', bank=bank_name, account=account_id):
+        transactions_data = account.get_transactions(date_from=date_from, date_to=date_to)
+    if isinstance(transactions_data, dict) and 'transactions' in transactions_data:
+        for trans_type, trans_list in transactions_data['transactions'].items():
+            for transaction in trans_list:
+                rows.append(format_transaction(transaction, bank_name, account_iban, trans_type))
+    number_occurrences(rows)
+    metrics.inc('rows_fetched', len(rows), bank=bank_name, account=account_id)
+    return rows
 
-def get_all_bank_transactions():
+def resolve_connected_accounts(client, executor, connected_banks, catalog=None, metadata=None,
+                               warning_days=DEFAULT_EXPIRY_WARNING_DAYS):
     """
-    Get transactions from all connected banks automatically without user interaction.
+    Resolve connected banks into (bank_id, bank_name, account_id) tuples. All requisitions
+    are health-checked first, in parallel on `executor`: expired, suspended or otherwise
+    unusable ones are reported and skipped, and those expiring within `warning_days` are
+    reported, before any of their accounts is scheduled.
+    """
+    metadata = metadata or MetadataCache()
+    catalog = catalog or InstitutionCatalog(client, metadata.cache_dir)
+    with client_metrics(client).timer('stage', stage='health_check'):
+        results = check_requisitions(client, executor, connected_banks, metadata)
+    report_health(results, warning_days)
+    healthy = [result for result in results if result.healthy]
+    banks = executor.map(
+        lambda result: fetch_bank_accounts(
+            client, result.bank_id, result.requisition_id, catalog=catalog, metadata=metadata, health=result
+        ),
+        healthy
+    )
+    accounts = []
+    for result, bank in zip(healthy, banks):
+        if bank:
+            bank_name, account_ids = bank
+            accounts.extend((result.bank_id, bank_name, account_id) for account_id in account_ids)
+    return accounts
+
+def ordered_map(executor, fn, items, window):
+    """
+    Like executor.map, but keeps at most `window` calls in flight so finished
+    results are consumed before later ones pile up in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def iter_account_transactions(client, concurrency=1, sync_state=None, overlap_days=DEFAULT_OVERLAP_DAYS,
+                              metadata=None, dedup=None, date_from=None, date_to=None,
+                              bank_ids=None, ibans=None, connected_banks=None, executor=None,
+                              skip_accounts=None):
     """
-    transactions = []
-    connected_banks = {key: value for key, value in os.environ.items() if key.startswith('REQUISITION_ID_')}
+    Stream the transactions of all connected banks as one (bank_name, account_id, rows)
+    batch per account, without user interaction. Banks and accounts are fetched on a pool
+    of `concurrency` worker threads; batches are always yielded in connected-bank order,
+    then requisition account order, and only about `concurrency` accounts are held in
+    memory at once. `rows` is None for an account whose fetch failed (already reported).
+
+    Rows already delivered are dropped by `dedup`: the DedupIndex of the output, or the
+    TransactionStore being written to. Without one, only duplicates within this run are.
+    When `sync_state` (the destination's cursors, see DedupIndex.cursors) is given, each
+    account is only fetched from its cursor onward and the cursors in `sync_state` are
+    advanced in place.
+
+    `date_from`/`date_to` (YYYY-MM-DD) are sent with each transactions request, and only
+    the connected banks in `bank_ids` and accounts with an IBAN in `ibans` are fetched.
+    Accounts in `skip_accounts` are not fetched at all.
+
+    `connected_banks` (requisition IDs keyed by bank ID) defaults to get_connected_banks().
+    With an `executor`, the API calls run on that shared pool instead of a new one, still
+    with at most about `concurrency` accounts in flight.
+    """
+    if connected_banks is None:
+        connected_banks = get_connected_banks()
+    if bank_ids:
+        connected_banks = {bank_id: req for bank_id, req in connected_banks.items() if bank_id in bank_ids}
     
     if not connected_banks:
         print("❌ No connected banks found.")
-        return transactions
+        return
 
-    for bank_env_key, requisition_id in connected_banks.items():
+    metadata = metadata or MetadataCache()
+    if dedup is None:
+        with DedupIndex(':memory:') as run_index:
+            yield from iter_account_transactions(
+                client, concurrency, sync_state, overlap_days, metadata, dedup=run_index,
+                date_from=date_from, date_to=date_to, ibans=ibans,
+                connected_banks=connected_banks, executor=executor, skip_accounts=skip_accounts
+            )
+        return
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as own_executor:
+            yield from iter_account_transactions(
+                client, concurrency, sync_state, overlap_days, metadata, dedup,
+                date_from=date_from, date_to=date_to, ibans=ibans,
+                connected_banks=connected_banks, executor=own_executor, skip_accounts=skip_accounts
+            )
+        return
+    ibans = {normalize_iban(iban) for iban in ibans} if ibans else None
+    metrics = client_metrics(client)
+
+    # Resolve every requisition first, then fan out across all accounts
+    accounts = [
+        (bank_name, account_id)
+        for bank_id, bank_name, account_id
+        in resolve_connected_accounts(client, executor, connected_banks, metadata=metadata)
+        if not skip_accounts or account_id not in skip_accounts
+    ]
+    
+    def fetch(item):
+        bank_name, account_id = item
+        start = date_from
+        if sync_state is not None:
+            # ISO dates compare as strings; the later of cursor and date_from wins
+            cursor_from = cursor_date_from(sync_state.get(account_id), overlap_days)
+            start = max(filter(None, (start, cursor_from)), default=None)
         try:
-            bank_id = bank_env_key.replace('REQUISITION_ID_', '')
-            institution = client.institution.get_institution_by_id(bank_id)
-            
-            if not institution:
-                print(f"❌ Bank {bank_id} not found")
+            return load_account_transactions(client, bank_name, account_id, start, metadata, date_to, ibans)
+        except Exception as e:
+            metrics.inc('fetch_failures', bank=bank_name, account=account_id)
+            metadata.invalidate_refused(account_id, e)
+            print(f"Error processing account {account_id}: {str(e)}")
+            return None
+
+    # Results come back in submission order, keeping output deterministic
+    results = ordered_map(executor, fetch, accounts, window=max(1, concurrency))
+    for (bank_name, account_id), rows in zip(accounts, results):
+        if rows is None:
+            yield bank_name, account_id, None
+            continue
+        if sync_state is not None:
+            rows, sync_state[account_id] = apply_cursor(rows, sync_state.get(account_id), dedup)
+        else:
+            rows = dedup.filter(rows)
+        yield bank_name, account_id, rows
+
+def iter_all_bank_transactions(client, concurrency=1, sync_state=None, overlap_days=DEFAULT_OVERLAP_DAYS,
+                               metadata=None, dedup=None, date_from=None, date_to=None,
+                               bank_ids=None, ibans=None, connected_banks=None, executor=None):
+    """
+    Stream transactions from all connected banks automatically without user interaction,
+    as one flat sequence of rows. See iter_account_transactions for the options.
+    """
+    for bank_name, account_id, rows in iter_account_transactions(
+        client, concurrency, sync_state, overlap_days, metadata, dedup,
+        date_from=date_from, date_to=date_to, bank_ids=bank_ids, ibans=ibans,
+        connected_banks=connected_banks, executor=executor
+    ):
+        if rows:
+            yield from rows
+
+def get_all_bank_transactions(client, concurrency=1, sync_state=None, overlap_days=DEFAULT_OVERLAP_DAYS,
+                              metadata=None, dedup=None, date_from=None, date_to=None,
+                              bank_ids=None, ibans=None, connected_banks=None, executor=None):
+    """
+    Get transactions from all connected banks as a list.
+    See iter_all_bank_transactions for the streaming version.
+    """
+    return list(iter_all_bank_transactions(
+        client, concurrency, sync_state, overlap_days, metadata, dedup,
+        date_from=date_from, date_to=date_to, bank_ids=bank_ids, ibans=ibans,
+        connected_banks=connected_banks, executor=executor
+    ))
+
+def timed_call(fn, *args, **kwargs):
+    """
+    Call `fn` and return (result, elapsed milliseconds).
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+def iter_account_records(client, resource, bank_ids=None, concurrency=8, metadata=None):
+    """
+    Fetch `resource` ('balances' or 'transactions') for every account of the connected banks
+    (or only `bank_ids`) in parallel, without any prompts. Yields one JSON-serialisable
+    record per account, in connected-bank order, with the latency of each API call.
+    """
+    connected_banks = get_connected_banks()
+    if bank_ids:
+        connected_banks = {bank_id: req for bank_id, req in connected_banks.items() if bank_id in bank_ids}
+    metadata = metadata or MetadataCache()
+
+    def fetch(item):
+        bank_id, bank_name, account_id = item
+        record = {
+            'bank_id': bank_id,
+            'bank_name': bank_name,
+            'account_id': account_id,
+            'fetched_at': datetime.now().isoformat(timespec='seconds'),
+            'latency_ms': {}
+        }
+        try:
+            account = client.account_api(account_id)
+            details, record['latency_ms']['details'] = timed_call(
+                metadata.get_account_details, account, account_id
+            )
+            record['iban'] = details.get('account', {}).get('iban')
+            if resource == 'balances':
+                data, record['latency_ms']['balances'] = timed_call(account.get_balances)
+                record['balances'] = data.get('balances', [])
+            else:
+                data, record['latency_ms']['transactions'] = timed_call(account.get_transactions)
+                record['transactions'] = data.get('transactions', {})
+        except Exception as e:
+            metadata.invalidate_refused(account_id, e)
+            record['error'] = str(e)
+        return record
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        accounts = resolve_connected_accounts(client, executor, connected_banks, metadata=metadata)
+        yield from ordered_map(executor, fetch, accounts, window=max(1, concurrency))
+
+def emit_records(records, output_format, stream):
+    """
+    Write records as a JSON array or as newline-delimited JSON (one record per line, streamed).
+    """
+    if output_format == 'ndjson':
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+            stream.flush()
+    else:
+        json.dump(list(records), stream, indent=2)
+        stream.write("\n")
+
+def run_headless(resource, all_banks, bank_ids, concurrency, output_format):
+    """
+    Shared body of the `balances` and `transactions` commands.
+    Status messages go to stderr so stdout only carries the JSON output. An account whose
+    API calls failed is reported with an 'error' in its record; a failure before any
+    account could be fetched (authentication, connected banks) as a record holding only
+    the 'error'. Either way the command exits with status 1.
+    """
+    if not all_banks and not bank_ids:
+        raise click.UsageError("Pass --all or at least one --bank-id")
+    
+    stdout = sys.stdout
+    failed = []
+
+    def tracked(records):
+        for record in records:
+            if record.get('error'):
+                failed.append(record)
+            yield record
+
+    with redirect_stdout(sys.stderr):
+        try:
+            client = validate_tokens()
+            records = iter_account_records(client, resource, bank_ids=set(bank_ids), concurrency=concurrency)
+            emit_records(tracked(records), output_format, stdout)
+        except Exception as e:
+            print(f"❌ Error retrieving {resource}: {e}")
+            failed.append({'error': str(e)})
+            emit_records(failed[-1:], output_format, stdout)
+        else:
+            for record in failed:
+                print(f"❌ {record['bank_name']} / {record['account_id']}: {record['error']}")
+    if failed:
+        sys.exit(1)
+
+def record_balances(client, store, history=None, bank_ids=None, concurrency=8):
+    """
+    Fetch the balances of every connected account in parallel and record the one each
+    account's running balance is anchored on in `store`, and every changed balance type
+    in the BalanceHistory `history`. Returns (accounts recorded, snapshots written, failed).
+    """
+    recorded = written = failed = 0
+    for record in iter_account_records(client, 'balances', bank_ids=bank_ids, concurrency=concurrency):
+        balances = record.get('balances', [])
+        balance = None if record.get('error') else anchor_balance(balances)
+        if not balance or not record.get('iban'):
+            print(f"❌ {record['bank_name']} / {record['account_id']}: {record.get('error') or 'no usable balance'}")
+            failed += 1
+            continue
+        store.set_balance(record['iban'], *balance, record['fetched_at'])
+        if history is not None:
+            written += history.record(record['iban'], balances, account_id=record['account_id'])
+        recorded += 1
+    return recorded, written, failed
+
+def account_blocked_until(client, account_id):
+    """
+    When the rate limit on the account's transactions endpoint resets, if the API reported one.
+    """
+    rate_limiter = getattr(client, 'rate_limiter', None)
+    if rate_limiter is None:
+        return None
+    return rate_limiter.blocked_until.get(f'account:{account_id}/transactions')
+
+def run_sync(client, store, scheduler, concurrency=4,
+             overlap_days=DEFAULT_OVERLAP_DAYS, metadata=None, categorizer=None, daemon=False,
+             accounts_refresh=DEFAULT_ACCOUNTS_REFRESH, stop_event=None):
+    """
+    Refresh connected accounts into the transaction store when the scheduler says they are due.
+    Fetches run on a pool of `concurrency` threads; each account's new rows (those not in
+    the store yet) and then its cursor, which the store keeps, are written on this thread.
+
+    Without `daemon` every account is refreshed once. With it, the loop keeps running,
+    re-reading the connected banks every `accounts_refresh` seconds, until `stop_event` is set.
+    Returns the number of new transactions stored.
+    """
+    metadata = metadata or MetadataCache()
+    stop_event = stop_event or threading.Event()
+    catalog = InstitutionCatalog(client, metadata.cache_dir)
+    sync_state = store.cursors()
+    metrics = client_metrics(client)
+    total = 0
+    accounts_loaded = None
+    running = {}
+
+    def fetch(item):
+        bank_id, bank_name, account_id = item
+        date_from = cursor_date_from(sync_state.get(account_id), overlap_days)
+        return load_account_transactions(client, bank_name, account_id, date_from, metadata)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        while not stop_event.is_set():
+            now = time.time()
+            if accounts_loaded is None or (daemon and now - accounts_loaded >= accounts_refresh):
+                accounts = resolve_connected_accounts(
+                    client, executor, get_connected_banks(), catalog=catalog, metadata=metadata
+                )
+                last_synced = {
+                    account_id: cursor.get('synced_at')
+                    for account_id, cursor in sync_state.items() if cursor
+                }
+                # A one-off sync refreshes everything now; the daemon resumes each account's schedule
+                scheduler.set_accounts(accounts, last_synced=last_synced if daemon else None, now=now)
+                accounts_loaded = now
+
+            for item in scheduler.pop_due(now, limit=max(1, concurrency) - len(running)):
+                running[executor.submit(fetch, item)] = item
+
+            if not running:
+                if not daemon and not len(scheduler):
+                    break
+                next_due = scheduler.next_due()
+                wait_time = POLL_INTERVAL if next_due is None else min(POLL_INTERVAL, next_due - now)
+                stop_event.wait(max(0, wait_time))
                 continue
 
-            # Get accounts directly from requisition
-            try:
-                requisition = client.requisition.get_requisition_by_id(requisition_id)
-                if requisition.get('status', '') != 'LN':
-                    print(f"❌ Authorization expired for bank {institution['name']}")
-                    continue
-                
-                for account_id in requisition['accounts']:
-                    try:
-                        account = client.account_api(account_id)
-                        details = account.get_details()
-                        account_info = details.get('account', {})
-                        
-                        # Get transactions for this account
-                        transactions_data = account.get_transactions()
-                        if isinstance(transactions_data, dict) and 'transactions' in transactions_data:
-                            for trans_type, trans_list in transactions_data['transactions'].items():
-                                for transaction in trans_list:
-                                    formatted_transaction = {
-                                        'bank_name': institution['name'],
-                                        'account_iban': account_info.get('iban', 'Not available'),
-                                        'transaction_id': transaction.get('transactionId', ''),
-                                        'booking_date': transaction.get('bookingDate', ''),
-                                        'amount': transaction.get('transactionAmount', {}).get('amount', ''),
-                                        'currency': transaction.get('transactionAmount', {}).get('currency', ''),
-                                        'description': transaction.get('remittanceInformationUnstructured', '')
-                                    }
-                                    transactions.append(formatted_transaction)
-                        
-                    except Exception as e:
-                        print(f"Error processing account {account_id}: {str(e)}")
+            done, _ = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                bank_id, bank_name, account_id = running.pop(future)
+                now = time.time()
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    metrics.inc('sync_failures', bank=bank_name, account=account_id)
+                    metadata.invalidate_refused(account_id, e)
+                    if not daemon:
+                        scheduler.remove(account_id)
+                        print(f"❌ {bank_name} / {account_id}: {e}")
                         continue
-                        
-            except Exception as e:
-                print(f"Error processing bank {institution['name']}: {str(e)}")
+                    due = scheduler.failed(account_id, now, account_blocked_until(client, account_id))
+                    retry = f" (retrying at {datetime.fromtimestamp(due):%Y-%m-%d %H:%M})" if due else ""
+                    print(f"❌ {bank_name} / {account_id}: {e}{retry}")
+                    continue
+
+                labels = {'bank': bank_name, 'account': account_id}
+                with metrics.timer('stage', stage='dedup', **labels):
+                    new_rows, cursor = apply_cursor(rows, sync_state.get(account_id), store)
+                if categorizer:
+                    with metrics.timer('stage', stage='categorize', **labels):
+                        new_rows = list(categorizer.categorize_rows(new_rows))
+                with metrics.timer('stage', stage='store', **labels):
+                    store.upsert_transactions(new_rows)
+                    store.delete_transactions(store.settled)
+                    store.settled.clear()
+                    sync_state[account_id] = dict(cursor, synced_at=int(now))
+                    store.save_cursor(account_id, sync_state[account_id])
+                metrics.inc('rows_stored', len(new_rows), **labels)
+                total += len(new_rows)
+
+                if daemon:
+                    due = scheduler.succeeded(account_id, now)
+                    next_refresh = f" (next refresh at {datetime.fromtimestamp(due):%Y-%m-%d %H:%M})" if due else ""
+                    print(f"🔄 {bank_name} / {account_id}: {len(new_rows)} new transactions{next_refresh}")
+                else:
+                    scheduler.remove(account_id)
+                    print(f"✅ {bank_name} / {account_id}: {len(new_rows)} new transactions")
+    return total
+
+def file_size(path):
+    """
+    Size of `path` in bytes, 0 if it does not exist.
+    """
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+def download_transactions(client, output='transactions.csv', file_format='csv', concurrency=4,
+                          incremental=False, overlap_days=DEFAULT_OVERLAP_DAYS, state_file=DEFAULT_STATE_FILE,
+                          db=None, metadata=None, categorizer=None, dedup_index=None,
+                          date_from=None, date_to=None, bank_ids=None, ibans=None,
+                          connected_banks=None, executor=None, resume=False):
+    """
+    Fetch the transactions of the connected banks and write them out: upserted into the
+    SQLite store `db`, appended to the CSV `output` (`incremental`), or into a new
+    timestamped `output` file. Filters, `connected_banks` and `executor` are passed to
+    iter_account_transactions.
+
+    The run is checkpointed per account: as soon as an account's rows arrive they are
+    written, then its sync cursor and, when appending, the entries of the output's dedup
+    index (`dedup_index`, default '<output>.dedup.db') are committed and the account is
+    recorded in a DownloadJournal kept in `state_file`. The store `db` is de-duplicated
+    against its own contents and keeps its own cursors; an appended file's cursors are
+    kept in its dedup index. New files are
+    built up in '<filename>.partial' and only get their final name once every account is
+    done. With `resume`, an unfinished run with the same options started within the
+    resume window carries on from its checkpoint, skipping the accounts it completed.
+
+    Returns a dict with the run's TransactionSummary ('summary'), the file written
+    ('filename', None with `db` or while incomplete), the store totals ('totals', None
+    without `db`), the accounts whose fetch failed ('failed'; the run stays resumable)
+    and how many accounts were carried over from the resumed run ('resumed').
+    """
+    metrics = client_metrics(client)
+    journal = DownloadJournal(StateStore(state_file), download_key(
+        output=None if db else output, file_format=None if db else file_format, db=db,
+        incremental=incremental, date_from=date_from, date_to=date_to,
+        bank_ids=sorted(bank_ids or ()), ibans=sorted(normalize_iban(iban) for iban in ibans or ())
+    ))
+    previous = journal.previous()
+    run = journal.resume() if resume else None
+    if run and run.get('partial') and file_size(run['partial']) < run.get('size', 0):
+        print("⚠️ The checkpoint file of the unfinished download is incomplete; starting over.")
+        run = None
+    elif resume and run is None:
+        print("💡 No recent unfinished download to resume; starting a new one.")
+    if run is None:
+        if previous and previous.get('partial') and os.path.exists(previous['partial']):
+            # The abandoned run's rows are fetched again from scratch
+            os.remove(previous['partial'])
+        filename = partial = None
+        if incremental:
+            filename = output
+        elif not db:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"{os.path.splitext(output)[0]}_{timestamp}{FORMAT_EXTENSIONS[file_format]}"
+            partial = f"{filename}.partial"
+        run = journal.start(filename=filename, partial=partial, size=0, summary={})
+    else:
+        print(f"🔁 Resuming the download started on {datetime.fromtimestamp(run['started_at']):%Y-%m-%d %H:%M}: "
+              f"{len(journal.completed)} accounts already done")
+    filename, partial = run.get('filename'), run.get('partial')
+    if partial and os.path.exists(partial):
+        # Drop anything written after the last checkpoint; those accounts are fetched again
+        with open(partial, 'r+b') as f:
+            f.truncate(run['size'])
+
+    summary = TransactionSummary.from_dict(run.get('summary', {}))
+    resumed = len(journal.completed)
+    totals = None
+    failed = []
+    store = index = None
+    try:
+        # The store is de-duplicated on its own key; an appended file by its own index
+        if db:
+            store = TransactionStore(db)
+        elif incremental:
+            index = open_output_index(output, dedup_index)
+        # Each destination advances its own cursors, so another one never skips rows it lacks
+        sink = store or index
+        sync_state = sink.cursors() if incremental else None
+        # The time spent waiting on the fetch pipeline is recorded as the fetch stage
+        batches = metrics.track_iter(iter_account_transactions(
+            client,
+            concurrency=concurrency,
+            sync_state=sync_state,
+            overlap_days=overlap_days,
+            metadata=metadata,
+            dedup=sink,
+            date_from=date_from,
+            date_to=date_to,
+            bank_ids=bank_ids,
+            ibans=ibans,
+            connected_banks=connected_banks,
+            executor=executor,
+            skip_accounts=set(journal.completed)
+        ), 'stage', stage='fetch')
+        for bank_name, account_id, rows in batches:
+            if rows is None:
+                failed.append(account_id)
                 continue
+            if categorizer:
+                rows = list(categorizer.categorize_rows(rows))
+            with metrics.timer('stage', stage='write'):
+                if store is not None:
+                    store.upsert_transactions(rows)
+                    # Pending rows whose booked version just arrived
+                    store.delete_transactions(store.settled)
+                    store.settled.clear()
+                elif incremental:
+                    # Append new rows to the existing dataset; the dedup index already removed duplicates
+                    write_transactions(rows, output, append=True)
+                    index.set_output_size(file_size(output))
+                elif rows:
+                    write_transactions(rows, partial, append=True)
+                # Only advance the cursor and the index once the rows are safely written; the
+                # index commits them with the file size, so rows appended but never committed
+                # are cut off by the next run
+                if incremental and account_id in sync_state:
+                    sink.save_cursor(account_id, sync_state[account_id])
+                if index is not None:
+                    index.commit()
+                for row in rows:
+                    summary.add(row)
+                journal.checkpoint(
+                    account_id, len(rows), summary=summary.to_dict(), size=file_size(partial) if partial else 0
+                )
 
-        except Exception as e:
-            print(f"Error processing bank {bank_id}: {str(e)}")
-            continue
+        if store is not None:
+            totals = store.summary()
+        if failed:
+            # Keep the checkpoint; a resumed run only fetches the failed accounts
+            if partial:
+                filename = None
+        else:
+            if partial and os.path.exists(partial):
+                with metrics.timer('stage', stage='write'):
+                    if file_format == 'csv':
+                        os.replace(partial, filename)
+                    else:
+                        write_transactions(read_transactions_csv(partial), filename, file_format)
+                        os.remove(partial)
+            journal.finish()
+    finally:
+        if store is not None:
+            store.close()
+        if index is not None:
+            index.close()
+    return {
+        'summary': summary,
+        'filename': filename,
+        'totals': totals,
+        'failed': failed,
+        'resumed': resumed,
+    }
 
-    return transactions
+def run_tenant(tenant, executor, resume=False):
+    """
+    Download one tenant's transactions with a client, token store, rate limiter, metrics
+    and caches of its own, writing only into the tenant's directory. API calls run on the
+    shared `executor`; `resume` continues the tenant's interrupted download.
+    Returns download_transactions' result plus the tenant's 'metrics'.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(tenant.state_file)), exist_ok=True)
+    os.makedirs(tenant.directory, exist_ok=True)
+    state = StateStore(tenant.state_file)
+    metrics = MetricsRegistry()
+    options = {'base_url': tenant.base_url} if tenant.base_url else {}
+    client = create_client(
+        tenant.secret_id, tenant.secret_key,
+        rate_limiter=tenant.rate_limiter(), metrics=metrics, **options
+    )
+    authenticate(client, tenant.token_store(state))
+    
+    result = download_transactions(
+        client,
+        output=tenant.output,
+        file_format=tenant.file_format,
+        concurrency=tenant.concurrency,
+        incremental=tenant.incremental,
+        overlap_days=tenant.overlap_days,
+        state_file=tenant.state_file,
+        db=tenant.db,
+        metadata=MetadataCache(tenant.cache_dir),
+        categorizer=load_rules(tenant.rules) if tenant.rules else None,
+        dedup_index=tenant.dedup_index,
+        bank_ids=tenant.bank_ids,
+        ibans=tenant.ibans,
+        connected_banks=tenant.connected_banks(state),
+        executor=executor,
+        resume=resume
+    )
+    if tenant.report:
+        metrics.write_report(tenant.report)
+    result['metrics'] = metrics
+    return result
+
+# Where --profile saves the raw cProfile stats, and how many functions it prints
+PROFILE_FILE = 'gocardless_profile.pstats'
+PROFILE_TOP = 25
+
+def print_profile(profiler, path=PROFILE_FILE, top=PROFILE_TOP):
+    import pstats
+
+    profiler.dump_stats(path)
+    print(f"\n🔬 Profile saved to {path} (top {top} functions by cumulative time):")
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+
+def instrumented(command):
+    """
+    Give a CLI command --report, --metrics-file and --profile options. Apply it
+    below @cli.command() so the options are registered on the command.
+    """
+    @functools.wraps(command)
+    def wrapper(*args, report_file=None, metrics_file=None, profile=False, **kwargs):
+        REGISTRY.reset()
+        stop_event = threading.Event()
+        writer = None
+        if metrics_file:
+            # Long runs (the sync daemon) keep the file current while they go
+            writer = MetricsWriter(REGISTRY, metrics_file, stop_event)
+            writer.start()
+        profiler = None
+        if profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            return command(*args, **kwargs)
+        finally:
+            stop_event.set()
+            if writer is not None:
+                # Let a periodic write in progress finish before the final one
+                writer.join()
+            if profiler is not None:
+                profiler.disable()
+                print_profile(profiler)
+            if report_file:
+                REGISTRY.write_report(report_file)
+                print(f"📊 Run report saved to {report_file}")
+            if metrics_file:
+                REGISTRY.write_prometheus(metrics_file)
+                print(f"📊 Metrics saved to {metrics_file}")
+
+    # click lists decorator options in reverse; prepending them puts these after the command's own
+    wrapper.__click_params__ = [
+        click.Option(['--profile'], is_flag=True, help=f'Profile the run with cProfile and save the stats to {PROFILE_FILE}'),
+        click.Option(['--metrics-file'], default=None, help='Write API and stage timings to this file in the Prometheus text format'),
+        click.Option(['--report', 'report_file'], default=None, help='Write a JSON run report with API and stage timings to this file'),
+    ] + list(getattr(command, '__click_params__', []))
+    return wrapper
+
+def validate_date(ctx, param, value):
+    """
+    Click callback checking a YYYY-MM-DD option value.
+    """
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise click.BadParameter(f"'{value}' is not a date in YYYY-MM-DD format")
+
+def validate_month(ctx, param, value):
+    """
+    Click callback checking a YYYY-MM option value.
+    """
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+    except ValueError:
+        raise click.BadParameter(f"'{value}' is not a month in YYYY-MM format")
+
+def check_date_range(start_date, end_date):
+    if start_date and end_date and start_date > end_date:
+        raise click.UsageError(f"--from {start_date} is after --to {end_date}")
 
 @click.group()
 def cli():
@@ -572,19 +1329,21 @@ def cli():
 
 @cli.command()
 @click.option('--country', default='IT', help='Country code for bank institutions')
-def browse_banks(country):
+@click.option('--cache-ttl', default=DEFAULT_INSTITUTIONS_TTL, type=click.IntRange(min=0), help='Seconds to reuse the cached bank list (0 to always refresh)')
+def browse_banks(country, cache_ttl):
     """Browse and connect to banks."""
     print("\n🌐 Ready to interact with Nordigen API")
     
     # Validate tokens before proceeding
     validate_tokens()
+    catalog = InstitutionCatalog(client, ttl=cache_ttl)
 
     while True:
         try:
-            banks = client.institution.get_institutions(country)
-            print(f"\n🏦 Retrieved {len(banks)} {country} banks")
+            index = catalog.index(country)
+            print(f"\n🏦 Retrieved {len(index.institutions)} {country} banks")
             
-            selected_bank = select_institution(banks)
+            selected_bank = select_institution(index)
             
             if selected_bank:
                 get_bank_accounts(client, selected_bank)
@@ -608,7 +1367,7 @@ def check_balances(bank_id):
     try:
         # First, verify if this bank ID exists
         try:
-            institution = client.institution.get_institution_by_id(bank_id)
+            institution = InstitutionCatalog(client).get_by_id(bank_id)
         except Exception as e:
             print(f"\n❌ Bank ID '{bank_id}' not found.")
             print("\nTo find the correct bank ID:")
@@ -622,11 +1381,12 @@ def check_balances(bank_id):
             return
         
         print(f"\n✅ Found bank: {institution.get('name', 'Unknown Bank')}")
-        accounts_info = get_bank_accounts(client, institution)
+        accounts_info = get_bank_accounts(client, institution, interactive=False)
         
         if accounts_info:
             for account in accounts_info:
-                handle_bank_account_options(account['account_api'])
+                print(f"\n🏦 {account['name']} - {account['iban']}")
+                print_balances(account['account_api'])
         else:
             print("❌ No accounts found for this bank.")
             
@@ -639,92 +1399,304 @@ def check_balances(bank_id):
 
 @cli.command()
 @click.option('--bank-id', required=True, help='ID of the bank to check transactions for')
-def check_transactions(bank_id):
+@click.option('--from', 'start_date', default=None, callback=validate_date, help='First booking date to fetch (YYYY-MM-DD)')
+@click.option('--to', 'end_date', default=None, callback=validate_date, help='Last booking date to fetch (YYYY-MM-DD)')
+def check_transactions(bank_id, start_date, end_date):
     """Check transactions for accounts at specified bank."""
+    check_date_range(start_date, end_date)
     # Validate tokens before proceeding
     validate_tokens()
 
     try:
-        institution = client.institution.get_institution_by_id(bank_id)
+        institution = InstitutionCatalog(client).get_by_id(bank_id)
         if not institution:
             print("❌ Bank not found.")
             return
         
-        accounts_info = get_bank_accounts(client, institution)
+        accounts_info = get_bank_accounts(client, institution, interactive=False)
         if accounts_info:
             for account in accounts_info:
-                get_bank_transactions(account['account_api'])
+                print(f"\n🏦 {account['name']} - {account['iban']}")
+                get_bank_transactions(account['account_api'], start_date, end_date)
         else:
             print("❌ No accounts found for this bank.")
     except Exception as e:
         print(f"❌ Error retrieving transactions: {e}")
 
+@cli.command()
+@click.option('--all', 'all_banks', is_flag=True, help='Include every connected bank')
+@click.option('--bank-id', 'bank_ids', multiple=True, help='Only this connected bank (repeatable)')
+@click.option('--concurrency', default=8, type=click.IntRange(min=1), help='Number of parallel API requests')
+@click.option('--format', 'output_format', type=click.Choice(['ndjson', 'json']), default='ndjson', help='Output format')
+def balances(all_banks, bank_ids, concurrency, output_format):
+    """Print balances of connected accounts as JSON, without prompts."""
+    run_headless('balances', all_banks, bank_ids, concurrency, output_format)
+
+@cli.command()
+@click.option('--all', 'all_banks', is_flag=True, help='Include every connected bank')
+@click.option('--bank-id', 'bank_ids', multiple=True, help='Only this connected bank (repeatable)')
+@click.option('--concurrency', default=8, type=click.IntRange(min=1), help='Number of parallel API requests')
+@click.option('--format', 'output_format', type=click.Choice(['ndjson', 'json']), default='ndjson', help='Output format')
+def transactions(all_banks, bank_ids, concurrency, output_format):
+    """Print transactions of connected accounts as JSON, without prompts."""
+    run_headless('transactions', all_banks, bank_ids, concurrency, output_format)
+
 @cli.command()
 def list_banks():
     """List bank IDs of banks to which the user has connected already."""
     list_connected_banks()
 
+@cli.command('check-requisitions')
+@click.option('--warning-days', default=DEFAULT_EXPIRY_WARNING_DAYS, type=click.IntRange(min=0), help='Report access expiring within this many days')
+@click.option('--concurrency', default=8, type=click.IntRange(min=1), help='Number of parallel API requests')
+@click.option('--refresh', is_flag=True, help='Ignore cached requisitions and agreements')
+@click.option('--format', 'output_format', type=click.Choice(['table', 'json']), default='table', help='Output format')
+def check_requisitions_command(warning_days, concurrency, refresh, output_format):
+    """Check that every connected bank's authorization is linked and see when it expires."""
+    stdout = sys.stdout
+    with redirect_stdout(sys.stderr if output_format == 'json' else sys.stdout):
+        try:
+            client = validate_tokens()
+            metadata = MetadataCache()
+            if refresh:
+                metadata.invalidate('requisition')
+                metadata.invalidate('agreement')
+            connected_banks = get_connected_banks()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = check_requisitions(client, executor, connected_banks, metadata)
+        except Exception as e:
+            print(f"❌ Error checking requisitions: {e}")
+            return
+    
+    if output_format == 'json':
+        emit_records((result.to_dict() for result in results), 'json', stdout)
+        return
+    if not results:
+        print("❌ No connected banks found.")
+        return
+    print(f"\n{'Bank ID':30s} {'Status':8s} {'Accounts':>8s} {'Expires':>10s} {'Days':>5s}")
+    for result in results:
+        info = result.to_dict()
+        expires = result.expires_at.strftime('%Y-%m-%d') if result.expires_at else '-'
+        days = '-' if result.expires_at is None else str(max(0, int(result.days_left())))
+        print(f"{result.bank_id:30s} {result.status or '-':8s} {info['accounts']:8d} {expires:>10s} {days:>5s}")
+    print()
+    report_health(results, warning_days)
+    healthy = sum(result.healthy for result in results)
+    print(f"✅ {healthy} of {len(results)} requisitions healthy")
+
 @cli.command()
-@click.option('--output', default='transactions.csv', help='Output CSV file name')
-def download_all_transactions(output):
-    """Download all transactions from all connected banks into a CSV file."""
+@instrumented
+@click.option('--output', default='transactions.csv', help='Output file name')
+@click.option('--format', 'file_format', type=click.Choice(EXPORT_FORMATS), default='csv', help='Output file format')
+@click.option('--concurrency', default=4, type=click.IntRange(min=1), help='Number of parallel API requests')
+@click.option('--incremental', is_flag=True, help='Only fetch new transactions and merge them into the output file')
+@click.option('--overlap-days', default=DEFAULT_OVERLAP_DAYS, type=click.IntRange(min=0), help='Days re-fetched before each cursor to catch late bookings')
+@click.option('--state-file', default=DEFAULT_STATE_FILE, help='State file holding the progress of interrupted downloads')
+@click.option('--db', default=None, help='Upsert into this SQLite transaction store instead of writing a CSV')
+@click.option('--refresh-metadata', is_flag=True, help='Ignore cached requisitions and account details')
+@click.option('--rules', type=click.Path(exists=True), default=None, help='JSON rules file used to categorize the transactions')
+@click.option('--dedup-index', default=None, help='Index of the transactions already appended with --incremental (default: <output>.dedup.db)')
+@click.option('--from', 'start_date', default=None, callback=validate_date, help='First booking date to fetch (YYYY-MM-DD)')
+@click.option('--to', 'end_date', default=None, callback=validate_date, help='Last booking date to fetch (YYYY-MM-DD)')
+@click.option('--bank-id', 'bank_ids', multiple=True, help='Only this connected bank (repeatable)')
+@click.option('--iban', 'ibans', multiple=True, help='Only the account with this IBAN (repeatable)')
+@click.option('--resume', is_flag=True, help='Continue an interrupted download, skipping the accounts it already completed')
+def download_all_transactions(output, file_format, concurrency, incremental, overlap_days, state_file, db,
+                              refresh_metadata, rules, dedup_index, start_date, end_date, bank_ids, ibans, resume):
+    """Download all transactions from all connected banks into a CSV/Parquet/Feather file or SQLite store."""
+    if incremental and not db and file_format != 'csv':
+        raise click.UsageError("--incremental can only append to CSV files; use --db for other setups")
+    if incremental and (start_date or end_date):
+        # A bounded fetch would move the cursors past dates it never requested
+        raise click.UsageError("--from/--to can't be combined with --incremental")
+    check_date_range(start_date, end_date)
+    
     try:
+        categorizer = load_rules(rules) if rules else None
+        
         # Get updated client with valid token
         global client
         client = validate_tokens()
         
         print("\n📥 Fetching transactions from all connected banks...")
-        transactions = get_all_bank_transactions()
+        metadata = MetadataCache()
+        if refresh_metadata:
+            metadata.invalidate('requisition')
+            metadata.invalidate('account_details')
+        result = download_transactions(
+            client,
+            output=output,
+            file_format=file_format,
+            concurrency=concurrency,
+            incremental=incremental,
+            overlap_days=overlap_days,
+            state_file=state_file,
+            db=db,
+            metadata=metadata,
+            categorizer=categorizer,
+            dedup_index=dedup_index,
+            date_from=start_date,
+            date_to=end_date,
+            bank_ids=bank_ids,
+            ibans=ibans,
+            resume=resume
+        )
+        summary = result['summary']
+        
+        if result['failed']:
+            print(f"\n⚠️ {len(result['failed'])} accounts could not be fetched. "
+                  f"Run again with --resume to fetch only those.")
+            if not db and not incremental:
+                print(f"💡 {summary.count} transactions are kept until the output file can be completed.")
+                return
         
-        if not transactions:
-            print("❌ No transactions found.")
+        if not summary.count:
+            if incremental:
+                print("✅ No new transactions since the last sync.")
+            else:
+                print("❌ No transactions found.")
             return
         
-        # Create DataFrame and save to CSV
-        df = pd.DataFrame(transactions)
+        if db:
+            totals = result['totals']
+            print(f"\n✅ Successfully stored {summary.count} transactions in {db}")
+            print("💡 Store summary:")
+            print(f"Total transactions: {totals['transactions']}")
+            print(f"Total banks: {totals['banks']}")
+            print(f"Total accounts: {totals['accounts']}")
+            print(f"Date range: {totals['first_date']} to {totals['last_date']}")
+            return
         
-        # Add timestamp to filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{output.rsplit('.', 1)[0]}_{timestamp}.csv"
+        print(f"\n✅ Successfully saved {summary.count} transactions to {result['filename']}")
+        print("💡 Transaction summary:")
+        print(f"Total banks: {len(summary.banks)}")
+        print(f"Total accounts: {len(summary.accounts)}")
+        print(f"Date range: {summary.first_date} to {summary.last_date}")
         
-        df.to_csv(filename, index=False, encoding='utf-8')
+    except Exception as e:
+        print(f"❌ Error downloading transactions: {e}")
+        print("💡 Completed accounts are saved; run again with --resume to continue where this run stopped.")
+
+@cli.command()
+@instrumented
+@click.option('--daemon', is_flag=True, help='Keep running and refresh each account on its own schedule')
+@click.option('--db', default=DEFAULT_DB_FILE, help='SQLite transaction store to sync into')
+@click.option('--concurrency', default=4, type=click.IntRange(min=1), help='Number of parallel API requests')
+@click.option('--daily-calls', default=DEFAULT_DAILY_CALLS, type=click.IntRange(min=1), help='Transaction refreshes allowed per account per day')
+@click.option('--accounts-refresh', default=DEFAULT_ACCOUNTS_REFRESH, type=click.IntRange(min=60), help='Seconds between re-reading the connected banks in daemon mode')
+@click.option('--overlap-days', default=DEFAULT_OVERLAP_DAYS, type=click.IntRange(min=0), help='Days re-fetched before each cursor to catch late bookings')
+@click.option('--rules', type=click.Path(exists=True), default=None, help='JSON rules file used to categorize the transactions')
+def sync(daemon, db, concurrency, daily_calls, accounts_refresh, overlap_days, rules):
+    """Incrementally sync all connected accounts into the SQLite store, once or continuously (--daemon)."""
+    stop_event = threading.Event()
+    try:
+        categorizer = load_rules(rules) if rules else None
+        
+        global client
+        token_store = TokenStore()
+        client = validate_tokens(token_store)
+        
+        if daemon:
+            # The client is reused for the whole run, so keep its token fresh in the background
+            TokenRefresher(lambda: renew_client_token(client, token_store), stop_event).start()
+            signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+            print(f"🕒 Sync daemon started: {daily_calls} refreshes per account per day (Ctrl+C to stop)")
+        else:
+            print("\n📥 Syncing transactions from all connected banks...")
         
-        print(f"\n✅ Successfully saved {len(transactions)} transactions to {filename}")
-        print(f"💡 Transaction summary:")
-        print(f"Total banks: {df['bank_name'].nunique()}")
-        print(f"Total accounts: {df['account_iban'].nunique()}")
-        print(f"Date range: {df['booking_date'].min()} to {df['booking_date'].max()}")
+        with TransactionStore(db) as store:
+            total = run_sync(
+                client, store, AccountScheduler(daily_calls),
+                concurrency=concurrency, overlap_days=overlap_days,
+                categorizer=categorizer, daemon=daemon, accounts_refresh=accounts_refresh,
+                stop_event=stop_event
+            )
+            totals = store.summary()
         
+        print(f"\n✅ Stored {total} new transactions in {db}")
+        print(f"Total transactions: {totals['transactions']}")
+        print(f"Date range: {totals['first_date']} to {totals['last_date']}")
+        
+    except KeyboardInterrupt:
+        print("\n👋 Sync stopped.")
     except Exception as e:
-        print(f"❌ Error downloading transactions: {e}")
+        print(f"❌ Error syncing transactions: {e}")
+    finally:
+        stop_event.set()
+
+@cli.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', default=DEFAULT_BATCH_WORKERS, type=click.IntRange(min=1), help='Size of the API worker pool shared by all tenants')
+@click.option('--parallel-tenants', default=DEFAULT_PARALLEL_TENANTS, type=click.IntRange(min=1), help='Number of tenants processed at the same time')
+@click.option('--tenant', 'names', multiple=True, help='Only this tenant (repeatable)')
+@click.option('--resume', is_flag=True, help="Continue each tenant's interrupted download, skipping completed accounts")
+def batch(manifest, workers, parallel_tenants, names, resume):
+    """Download transactions for every tenant in a JSON manifest, each with its own credentials, state and outputs."""
+    try:
+        tenants = load_manifest(manifest)
+    except (OSError, ValueError) as e:
+        print(f"❌ Invalid tenant manifest: {e}")
+        return
+    if names:
+        unknown = set(names) - {tenant.name for tenant in tenants}
+        if unknown:
+            raise click.UsageError(f"Unknown tenant(s): {', '.join(sorted(unknown))}")
+        tenants = [tenant for tenant in tenants if tenant.name in names]
+    
+    print(f"\n📥 Fetching transactions for {len(tenants)} tenants...")
+    failed = []
+    # Tenants run on their own threads and hand every API call to the shared pool, so
+    # a tenant waiting on its results never holds one of the pool's workers
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            ThreadPoolExecutor(max_workers=parallel_tenants) as runner:
+        futures = {runner.submit(run_tenant, tenant, executor, resume): tenant for tenant in tenants}
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append(tenant.name)
+                print(f"❌ {tenant.name}: {e}")
+                continue
+            count = result['summary'].count
+            target = tenant.db or result['filename']
+            if result['failed']:
+                failed.append(tenant.name)
+                print(f"⚠️ {tenant.name}: {len(result['failed'])} accounts could not be fetched "
+                      f"({count} transactions saved so far); run again with --resume")
+            elif count:
+                print(f"✅ {tenant.name}: {count} transactions saved to {target}")
+            else:
+                print(f"✅ {tenant.name}: no new transactions")
+    
+    if failed:
+        print(f"\n❌ {len(failed)} of {len(tenants)} tenants failed: {', '.join(sorted(failed))}")
+    else:
+        print(f"\n✅ All {len(tenants)} tenants processed")
 
 @cli.command()
 @click.option('--search', help='Search term to filter banks')
 @click.option('--country', help='Country code for bank institutions')
-def find_bank_id(search, country):
+@click.option('--cache-ttl', default=DEFAULT_INSTITUTIONS_TTL, type=click.IntRange(min=0), help='Seconds to reuse the cached bank list (0 to always refresh)')
+def find_bank_id(search, country, cache_ttl):
     """Find bank ID by name or partial name."""
     validate_tokens()
     
     if not country:
         country = input("\nEnter country code (press Enter for IT): ").upper() or 'IT'
+    country = country.upper()
     
     try:
-        banks = client.institution.get_institutions(country)
+        index = InstitutionCatalog(client, ttl=cache_ttl).index(country)
         
         if not search:
             search = input("\nEnter bank name or partial name to search: ").strip()
         
         if search:
-            matching_banks = [
-                bank for bank in banks 
-                if search.lower() in bank['name'].lower() 
-                and country in bank.get('countries', [])  # Add country filter
-            ]
+            matching_banks = index.search(search, country=country)
         else:
-            matching_banks = [
-                bank for bank in banks 
-                if country in bank.get('countries', [])  # Add country filter
-            ]
+            matching_banks = index.in_country(country)
 
         if not matching_banks:
             print(f"❌ No banks found matching '{search}' in {country}")
@@ -742,55 +1714,175 @@ def find_bank_id(search, country):
         print(f"❌ Error: {e}")
 
 @cli.command()
-@click.argument('input_file', type=click.Path(exists=True))
+@click.argument('input_file', type=click.Path(exists=True), required=False)
 @click.option('--output', default=None, help='Output CSV file name')
-def convert_transactions(input_file, output):
-    """Convert transactions CSV to Italian format."""
+@click.option('--db', type=click.Path(exists=True), default=None, help='Read transactions from this SQLite store instead of a CSV')
+@click.option('--from', 'start_date', default=None, callback=validate_date, help='First booking date to include when reading from --db (YYYY-MM-DD)')
+@click.option('--to', 'end_date', default=None, callback=validate_date, help='Last booking date to include when reading from --db (YYYY-MM-DD)')
+@click.option('--chunksize', default=DEFAULT_CHUNKSIZE, type=click.IntRange(min=1), help='Rows converted per chunk')
+@click.option('--rules', type=click.Path(exists=True), default=None, help='JSON rules file used to fill the categoria column')
+def convert_transactions(input_file, output, db, start_date, end_date, chunksize, rules):
+    """Convert transactions CSV/Parquet/Feather (or SQLite store) to Italian format."""
+    if not input_file and not db:
+        raise click.UsageError("Provide an INPUT_FILE or --db")
+    
     try:
-        # Read the input CSV
-        df = pd.read_csv(input_file)
-        
-        # Create new DataFrame with required schema
-        converted_df = pd.DataFrame(columns=[
-            'data', 'mese', 'descrizione', 'importo entrata', 
-            'importo uscita', 'categoria', 'conto'
-        ])
-        
-        # Convert and populate the new DataFrame
-        converted_df['data'] = pd.to_datetime(df['booking_date']).dt.date
-        converted_df['mese'] = pd.to_datetime(df['booking_date']).dt.strftime('%B')
-        converted_df['descrizione'] = df['description']
-        converted_df['conto'] = df['account_iban']
-        
-        # Initialize categoria as empty
-        converted_df['categoria'] = ''
-        
-        # Convert amount to float and split into inflow/outflow
-        amounts = pd.to_numeric(df['amount'], errors='coerce')
-        converted_df['importo entrata'] = amounts.where(amounts > 0, '')
-        converted_df['importo uscita'] = amounts.where(amounts < 0, '').abs()
+        categorizer = load_rules(rules) if rules else None
         
         # Generate output filename if not provided
         if output is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            base_name = os.path.splitext(input_file)[0]
+            base_name = os.path.splitext(input_file or db)[0]
             output = f"{base_name}_converted_{timestamp}.csv"
         
-        # Save to CSV
-        converted_df.to_csv(output, index=False, encoding='utf-8')
+        # Convert chunk by chunk so memory stays bounded by --chunksize
+        if db:
+            with TransactionStore(db) as store:
+                summary = convert_frames(iter_input_frames(
+                    store=store, start_date=start_date, end_date=end_date, chunksize=chunksize
+                ), output, categorizer)
+        else:
+            summary = convert_frames(iter_input_frames(input_file, chunksize=chunksize), output, categorizer)
         
         print(f"\n✅ Successfully converted transactions to: {output}")
-        print(f"💡 Conversion summary:")
-        print(f"Total transactions: {len(converted_df)}")
-        print(f"Date range: {converted_df['data'].min()} to {converted_df['data'].max()}")
-        print(f"Total accounts: {converted_df['conto'].nunique()}")
+        print("💡 Conversion summary:")
+        print(f"Total transactions: {summary.count}")
+        print(f"Date range: {summary.first_date} to {summary.last_date}")
+        print(f"Total accounts: {len(summary.accounts)}")
         
     except Exception as e:
         print(f"❌ Error converting transactions: {e}")
         print("\nTroubleshooting steps:")
-        print("1. Ensure the input file is a valid CSV")
+        print("1. Ensure the input file is a valid CSV, Parquet or Feather file")
         print("2. Check if the input file has the expected columns")
         print("3. Verify the file path is correct")
 
+@cli.command()
+@click.option('--db', type=click.Path(exists=True), default=DEFAULT_DB_FILE, help='SQLite transaction store to summarize')
+@click.option('--refresh-balances', is_flag=True, help='Fetch the current balance of every connected account first')
+@click.option('--bank-id', 'bank_ids', multiple=True, help='Only refresh the balances of this connected bank (repeatable)')
+@click.option('--concurrency', default=8, type=click.IntRange(min=1), help='Number of parallel API requests when refreshing balances')
+@click.option('--iban', default=None, help='Only this account')
+@click.option('--from', 'start_month', default=None, callback=validate_month, help='First month to show (YYYY-MM)')
+@click.option('--to', 'end_month', default=None, callback=validate_month, help='Last month to show (YYYY-MM)')
+@click.option('--format', 'output_format', type=click.Choice(['table', 'json', 'csv']), default='table', help='Output format')
+@click.option('--rebuild', is_flag=True, help='Recompute the monthly rollups from every stored transaction')
+def summary(db, refresh_balances, bank_ids, concurrency, iban, start_month, end_month, output_format, rebuild):
+    """Monthly inflow/outflow per account with the running balance, reconciled against the bank's reported balance."""
+    if start_month and end_month and start_month > end_month:
+        raise click.UsageError(f"--from {start_month} is after --to {end_month}")
+    
+    try:
+        with TransactionStore(db) as store:
+            if rebuild:
+                store.rebuild_rollups()
+            if refresh_balances:
+                # Keep stdout for the summary itself when it is machine-readable
+                with redirect_stdout(sys.stderr if output_format != 'table' else sys.stdout):
+                    with BalanceHistory(db) as history:
+                        recorded, _, failed = record_balances(
+                            validate_tokens(), store, history, bank_ids=set(bank_ids), concurrency=concurrency
+                        )
+                    print(f"💰 Balances refreshed for {recorded} accounts" + (f", {failed} failed" if failed else ""))
+            account_iban = normalize_iban(iban) if iban else None
+            months = store.monthly_summary(account_iban, start_month, end_month)
+            balances = {balance['account_iban']: balance for balance in store.balances(account_iban)}
+    except Exception as e:
+        print(f"❌ Error summarizing transactions: {e}")
+        return
+    
+    if output_format == 'json':
+        json.dump({'months': months, 'balances': list(balances.values())}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    if output_format == 'csv':
+        if months:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(months[0]))
+            writer.writeheader()
+            writer.writerows(months)
+        return
+    
+    if not months:
+        print("❌ No booked transactions found.")
+        return
+    current = None
+    for row in months:
+        if (row['account_iban'], row['currency']) != current:
+            current = (row['account_iban'], row['currency'])
+            print(f"\n🏦 {row['bank_name']} - {row['account_iban']} ({row['currency']})")
+            balance = balances.get(row['account_iban'])
+            if balance:
+                if balance['reconciled'] is None:
+                    status = "not yet reconciled"
+                elif balance['reconciled']:
+                    status = "✅ reconciled"
+                else:
+                    status = f"⚠️ off by {balance['difference']:.2f} since {balance['previous_reference_date']}"
+                print(f"Reported {balance['balance_type']}: {balance['amount']:.2f} {balance['currency']} "
+                      f"on {balance['reference_date']} ({status})")
+            else:
+                print("No reported balance yet: run with --refresh-balances for running balances")
+            print(f"{'Month':8s} {'Inflow':>12s} {'Outflow':>12s} {'Net':>12s} {'Count':>6s} {'Balance':>12s}")
+        closing = '' if row['closing_balance'] is None else f"{row['closing_balance']:.2f}"
+        print(f"{row['month']:8s} {row['inflow']:12.2f} {row['outflow']:12.2f} {row['net']:12.2f} "
+              f"{row['transactions']:6d} {closing:>12s}")
+
+@cli.command()
+@click.option('--db', default=DEFAULT_DB_FILE, help='SQLite store keeping the balance history')
+@click.option('--bank-id', 'bank_ids', multiple=True, help='Only this connected bank (repeatable)')
+@click.option('--concurrency', default=8, type=click.IntRange(min=1), help='Number of parallel API requests')
+def snapshot_balances(db, bank_ids, concurrency):
+    """Record every balance type of all connected accounts, skipping balances that have not changed."""
+    try:
+        client = validate_tokens()
+        print("\n💰 Fetching balances of all connected accounts...")
+        with TransactionStore(db) as store, BalanceHistory(db) as history:
+            recorded, written, failed = record_balances(
+                client, store, history, bank_ids=set(bank_ids), concurrency=concurrency
+            )
+        print(f"\n✅ {written} new balance snapshots for {recorded} accounts saved to {db}"
+              + (f" ({failed} accounts failed)" if failed else ""))
+    except Exception as e:
+        print(f"❌ Error recording balances: {e}")
+
+@cli.command()
+@click.option('--db', type=click.Path(exists=True), default=DEFAULT_DB_FILE, help='SQLite store keeping the balance history')
+@click.option('--iban', default=None, help='Only this account')
+@click.option('--type', 'balance_type', default=None, help='Only this balance type, e.g. closingBooked')
+@click.option('--from', 'start_date', default=None, callback=validate_date, help='First day to include (YYYY-MM-DD)')
+@click.option('--to', 'end_date', default=None, callback=validate_date, help='Last day to include (YYYY-MM-DD)')
+@click.option('--daily', is_flag=True, help='Only the last snapshot of each day')
+@click.option('--format', 'output_format', type=click.Choice(['table', 'json', 'csv']), default='table', help='Output format')
+def balance_history(db, iban, balance_type, start_date, end_date, daily, output_format):
+    """Show recorded balance snapshots over time."""
+    check_date_range(start_date, end_date)
+    try:
+        with BalanceHistory(db) as history:
+            snapshots = history.history(
+                normalize_iban(iban) if iban else None, balance_type, start_date, end_date, daily=daily
+            )
+    except Exception as e:
+        print(f"❌ Error reading balance history: {e}")
+        return
+    
+    if output_format == 'json':
+        json.dump(snapshots, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+    if output_format == 'csv':
+        if snapshots:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(snapshots[0]))
+            writer.writeheader()
+            writer.writerows(snapshots)
+        return
+    
+    if not snapshots:
+        print("❌ No balance snapshots found.")
+        return
+    print(f"{'Taken at (UTC)':25s} {'Account':28s} {'Type':18s} {'Amount':>12s} Currency")
+    for snapshot in snapshots:
+        print(f"{snapshot['taken_at']:25s} {snapshot['account_iban']:28s} {snapshot['balance_type']:18s} "
+              f"{snapshot['amount']:12.2f} {snapshot['currency']}")
+
 if __name__ == "__main__":
     cli()
\ No newline at end of file
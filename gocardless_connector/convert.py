@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from .export import iter_transaction_frames
+
+OUTPUT_COLUMNS = [
+    'data', 'mese', 'descrizione', 'importo entrata',
+    'importo uscita', 'categoria', 'conto'
+]
+INPUT_COLUMNS = ['booking_date', 'amount', 'description', 'account_iban', 'category', 'counterparty']
+DEFAULT_CHUNKSIZE = 100000
+
+def month_names():
+    """
+    Month names in the current locale, computed once instead of per row.
+    """
+    return [datetime(2000, month, 1).strftime('%B') for month in range(1, 13)]
+
+def convert_frame(df, months, categorizer=None):
+    """
+    Convert one chunk of exported transactions to the Italian layout.
+    Dates are parsed once and amounts stay numeric; empty cells are only
+    produced when the chunk is written. With a categorizer the rules decide
+    'categoria', otherwise any category already in the export is kept.
+    """
+    import pandas as pd
+
+    dates = pd.to_datetime(df['booking_date'], errors='coerce')
+    amounts = pd.to_numeric(df['amount'], errors='coerce')
+    month_codes = dates.dt.month.fillna(0).astype('int8') - 1
+    if categorizer is not None:
+        categories = categorizer.categorize(df)
+    elif 'category' in df:
+        categories = df['category'].fillna('')
+    else:
+        categories = ''
+
+    return pd.DataFrame({
+        'data': dates,
+        'mese': pd.Categorical.from_codes(month_codes, categories=months),
+        'descrizione': df['description'],
+        'importo entrata': amounts.where(amounts > 0),
+        'importo uscita': (-amounts).where(amounts < 0),
+        'categoria': categories,
+        'conto': df['account_iban'],
+    }, columns=OUTPUT_COLUMNS)
+
+class ConversionSummary:
+    """
+    Row count, date range and distinct accounts accumulated across chunks.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.first_date = None
+        self.last_date = None
+        self.accounts = set()
+
+    def add(self, converted):
+        self.count += len(converted)
+        dates = converted['data'].dropna()
+        if not dates.empty:
+            first, last = dates.min().date(), dates.max().date()
+            self.first_date = first if self.first_date is None else min(self.first_date, first)
+            self.last_date = last if self.last_date is None else max(self.last_date, last)
+        self.accounts.update(converted['conto'].dropna().unique())
+
+def iter_input_frames(input_file=None, store=None, start_date=None, end_date=None,
+                      chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield the transactions to convert in chunks, from a file or a TransactionStore.
+    """
+    if store is not None:
+        yield from store.read_transactions(start_date=start_date, end_date=end_date, chunksize=chunksize)
+    else:
+        yield from iter_transaction_frames(input_file, chunksize, columns=INPUT_COLUMNS)
+
+def convert_frames(frames, output, categorizer=None):
+    """
+    Convert chunks of transactions and stream them into the `output` CSV,
+    categorizing them with `categorizer` if given. Returns a ConversionSummary.
+    """
+    months = month_names()
+    summary = ConversionSummary()
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        header = True
+        for df in frames:
+            converted = convert_frame(df, months, categorizer)
+            converted.to_csv(f, index=False, header=header, date_format='%Y-%m-%d')
+            summary.add(converted)
+            header = False
+        if header:
+            # No input rows: still write the header so the file has the expected layout
+            f.write(','.join(OUTPUT_COLUMNS) + '\n')
+    return summary
@@ -0,0 +1,164 @@
+import heapq
+import random
+import threading
+import time
+
+# GoCardless allows a handful of transaction fetches per account per day
+DEFAULT_DAILY_CALLS = 4
+# Seconds between re-reading the connected banks while running as a daemon
+DEFAULT_ACCOUNTS_REFRESH = 3600
+# First retry delay after a failed refresh; doubles with each consecutive failure
+DEFAULT_ERROR_BACKOFF = 60
+# Longest the sync loop waits before re-checking for due accounts or a stop request
+POLL_INTERVAL = 5
+# Bounds on how long the token refresher sleeps between checks
+TOKEN_CHECK_MIN = 60
+TOKEN_CHECK_MAX = 3600
+
+class AccountScheduler:
+    """
+    Decides when each account is refreshed next.
+
+    Every account gets one refresh per `interval` (a day divided by the daily per-account
+    quota), at its own phase within the interval, so calls are spread evenly instead of
+    bunching up. A refresh is never due sooner than one interval after the previous one
+    was; failures are retried with exponential backoff, capped at one interval.
+    """
+
+    def __init__(self, daily_calls=DEFAULT_DAILY_CALLS, error_backoff=DEFAULT_ERROR_BACKOFF):
+        self.interval = 86400 / daily_calls
+        self.error_backoff = error_backoff
+        self.accounts = {}
+        self.phases = {}
+        self.due_at = {}
+        self.failures = {}
+        # Accounts being refreshed, with the time their refresh was due
+        self.in_flight = {}
+        self._heap = []
+
+    def _push(self, account_id, due):
+        self.due_at[account_id] = due
+        heapq.heappush(self._heap, (due, account_id))
+
+    def _next_slot(self, account_id, earliest):
+        # First time at or after `earliest` that falls on the account's phase
+        phase = self.phases[account_id]
+        slots = max(0, -(-(earliest - phase) // self.interval))
+        return phase + slots * self.interval
+
+    def set_accounts(self, items, last_synced=None, now=None):
+        """
+        Schedule (bank_id, bank_name, account_id) items, keeping existing accounts on
+        their schedule and dropping accounts that are no longer connected. Accounts last
+        synced more than an interval ago (or never) are due immediately.
+        """
+        now = time.time() if now is None else now
+        last_synced = last_synced or {}
+        items = list(items)
+        self.accounts = {item[2]: item for item in items}
+
+        # Phases are spaced evenly across the interval in connected-bank order
+        for position, item in enumerate(items):
+            self.phases[item[2]] = now + position * self.interval / len(items)
+
+        for account_id in list(self.due_at):
+            if account_id not in self.accounts:
+                del self.due_at[account_id]
+                self.failures.pop(account_id, None)
+        for account_id in self.accounts:
+            if account_id in self.due_at or account_id in self.in_flight:
+                continue
+            synced_at = last_synced.get(account_id)
+            if synced_at is None or synced_at + self.interval <= now:
+                self._push(account_id, now)
+            else:
+                self._push(account_id, self._next_slot(account_id, synced_at + self.interval))
+
+    def next_due(self):
+        """
+        Timestamp of the earliest scheduled refresh, or None if nothing is scheduled.
+        """
+        while self._heap:
+            due, account_id = self._heap[0]
+            if self.due_at.get(account_id) == due:
+                return due
+            heapq.heappop(self._heap)  # superseded or removed entry
+        return None
+
+    def pop_due(self, now=None, limit=None):
+        """
+        Take the items of accounts due by `now` (at most `limit`), earliest first.
+        They stay unscheduled until succeeded() or failed() is called.
+        """
+        now = time.time() if now is None else now
+        items = []
+        while limit is None or len(items) < limit:
+            due = self.next_due()
+            if due is None or due > now:
+                break
+            _, account_id = heapq.heappop(self._heap)
+            del self.due_at[account_id]
+            self.in_flight[account_id] = due
+            items.append(self.accounts[account_id])
+        return items
+
+    def succeeded(self, account_id, now=None):
+        """
+        Schedule the account's next refresh after a successful one. Returns its due time.
+        The next slot is counted from when this refresh was due rather than when it
+        finished, so a refresh that takes a moment doesn't push the account a whole
+        interval further.
+        """
+        now = time.time() if now is None else now
+        started = self.in_flight.pop(account_id, now)
+        self.failures.pop(account_id, None)
+        if account_id not in self.accounts:
+            return None
+        due = self._next_slot(account_id, started + self.interval)
+        self._push(account_id, due)
+        return due
+
+    def failed(self, account_id, now=None, blocked_until=None):
+        """
+        Schedule a retry after a failed refresh, with jittered exponential backoff, or
+        when the API said the account's rate limit resets if that is later. Returns its due time.
+        """
+        now = time.time() if now is None else now
+        self.in_flight.pop(account_id, None)
+        failures = self.failures[account_id] = self.failures.get(account_id, 0) + 1
+        if account_id not in self.accounts:
+            return None
+        delay = min(self.interval, self.error_backoff * 2 ** (failures - 1))
+        due = max(now + random.uniform(delay / 2, delay), blocked_until or 0)
+        self._push(account_id, due)
+        return due
+
+    def remove(self, account_id):
+        self.accounts.pop(account_id, None)
+        self.due_at.pop(account_id, None)
+        self.failures.pop(account_id, None)
+        self.in_flight.pop(account_id, None)
+
+    def __len__(self):
+        return len(self.due_at)
+
+class TokenRefresher(threading.Thread):
+    """
+    Background thread keeping the API token valid. `renew()` must make sure the
+    client holds a fresh access token and return the seconds until the next check.
+    """
+
+    def __init__(self, renew, stop_event, delay=0):
+        super().__init__(name='token-refresher', daemon=True)
+        self.renew = renew
+        self.stop_event = stop_event
+        self.delay = delay
+
+    def run(self):
+        while not self.stop_event.wait(self.delay):
+            try:
+                delay = self.renew()
+            except Exception as e:
+                print(f"❌ Token refresh failed, retrying in {TOKEN_CHECK_MIN}s: {e}")
+                delay = TOKEN_CHECK_MIN
+            self.delay = min(max(delay, TOKEN_CHECK_MIN), TOKEN_CHECK_MAX)
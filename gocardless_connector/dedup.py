@@ -0,0 +1,237 @@
+import hashlib
+import os
+import sqlite3
+from datetime import date, timedelta
+
+from .export import chunked, read_transactions_csv
+from .sync import CURSOR_SCHEMA, load_cursors, number_occurrences, save_cursor, transaction_key
+
+# Pending items not booked within this many days are assumed cancelled and forgotten
+DEFAULT_PENDING_TTL_DAYS = 30
+# Keys per IN (...) query, below SQLite's bound-parameter limit
+QUERY_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    key     INTEGER PRIMARY KEY,
+    pending INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pending (
+    key            INTEGER PRIMARY KEY,
+    match_key      INTEGER NOT NULL,
+    account_iban   TEXT NOT NULL,
+    transaction_id TEXT NOT NULL,
+    first_seen     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_match ON pending (match_key);
+CREATE TABLE IF NOT EXISTS output (
+    id   INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+"""
+
+def hash64(*parts):
+    """
+    Signed 64-bit hash of the joined parts, small enough to be an SQLite integer key.
+    """
+    digest = hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+def row_key(row):
+    """
+    Index key of a row: its account IBAN plus transaction ID, or plus a hash of
+    booking date, amount, currency and description when the bank sends no ID.
+    """
+    return hash64(row.get('account_iban', ''), transaction_key(row))
+
+def match_key(row):
+    """
+    Key pairing a pending item with its booked version, whose ID, date and
+    description may all differ: same account, amount and currency.
+    """
+    return hash64(row.get('account_iban', ''), str(row.get('amount', '')), row.get('currency', ''))
+
+def _chunks(values, size=QUERY_BATCH):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class DedupIndex:
+    """
+    Persistent index of every transaction already delivered, stored as 64-bit key
+    hashes in SQLite, so checking a batch costs one indexed lookup per row however
+    much history there is. Pending items are remembered until their booked version
+    arrives; the rows they should be replaced by are reported in `settled`. The sync
+    cursors of the destination it indexes are kept alongside.
+
+    Changes, cursors included, are only committed by commit(), once the new rows have
+    been written.
+    """
+
+    def __init__(self, path, include_pending=True,
+                 pending_ttl_days=DEFAULT_PENDING_TTL_DAYS):
+        self.path = path
+        self.include_pending = include_pending
+        self.pending_ttl_days = pending_ttl_days
+        # (account_iban, transaction_id) of delivered pending rows that have since been booked
+        self.settled = []
+        self.conn = sqlite3.connect(path)
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(CURSOR_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Anything not committed is rolled back, so the rows are offered again next run
+        self.conn.close()
+
+    def _seen(self, keys):
+        found = {}
+        for chunk in _chunks(keys):
+            placeholders = ','.join('?' * len(chunk))
+            found.update(self.conn.execute(
+                f"SELECT key, pending FROM seen WHERE key IN ({placeholders})", chunk
+            ))
+        return found
+
+    def _pending_candidates(self, match_keys):
+        candidates = {}
+        for chunk in _chunks(match_keys):
+            placeholders = ','.join('?' * len(chunk))
+            for key, match, account_iban, transaction_id in self.conn.execute(
+                f"SELECT key, match_key, account_iban, transaction_id FROM pending "
+                f"WHERE match_key IN ({placeholders}) ORDER BY first_seen, key", chunk
+            ):
+                candidates.setdefault(match, []).append((key, account_iban, transaction_id))
+        return candidates
+
+    def filter(self, rows):
+        """
+        Return the rows of a batch that were not delivered before, recording them in the index.
+
+        Booked rows replacing a delivered pending item are returned as new and the
+        pending row's (account_iban, transaction_id) is added to `settled`. Pending rows
+        are skipped entirely when the index was created with include_pending=False.
+        """
+        keyed = {}
+        for row in rows:
+            key = row_key(row)
+            if key not in keyed:
+                keyed[key] = row
+        if not keyed:
+            return []
+
+        seen = self._seen(keyed)
+        booked_matches = {
+            match_key(row) for key, row in keyed.items()
+            if row.get('status') != 'pending' and key not in seen
+        }
+        candidates = self._pending_candidates(booked_matches) if booked_matches else {}
+
+        today = date.today().isoformat()
+        new_rows, seen_rows, pending_rows = [], [], []
+        for key, row in keyed.items():
+            is_pending = row.get('status') == 'pending'
+            if key in seen:
+                if is_pending or not seen[key]:
+                    continue
+                # Booked under the same ID it had while pending
+                self._settle(key)
+                new_rows.append(row)
+                continue
+
+            if is_pending:
+                if not self.include_pending:
+                    continue
+                seen_rows.append((key, 1))
+                pending_rows.append((key, match_key(row), row.get('account_iban', ''), transaction_key(row), today))
+                new_rows.append(row)
+                continue
+
+            matches = candidates.get(match_key(row))
+            if matches:
+                pending_key, account_iban, transaction_id = matches.pop(0)
+                self._settle(pending_key)
+                self.settled.append((account_iban, transaction_id))
+            seen_rows.append((key, 0))
+            new_rows.append(row)
+
+        self.conn.executemany("INSERT INTO seen (key, pending) VALUES (?, ?)", seen_rows)
+        self.conn.executemany(
+            "INSERT INTO pending (key, match_key, account_iban, transaction_id, first_seen) "
+            "VALUES (?, ?, ?, ?, ?)", pending_rows
+        )
+        return new_rows
+
+    def _settle(self, key):
+        self.conn.execute("UPDATE seen SET pending = 0 WHERE key = ?", (key,))
+        self.conn.execute("DELETE FROM pending WHERE key = ?", (key,))
+
+    def cursors(self):
+        return load_cursors(self.conn)
+
+    def save_cursor(self, account_id, cursor):
+        # Committed together with the rows it covers
+        save_cursor(self.conn, account_id, cursor)
+
+    def output_size(self):
+        """
+        Size in bytes of the indexed file as of the last commit, or None if never recorded.
+        """
+        row = self.conn.execute("SELECT size FROM output").fetchone()
+        return row[0] if row else None
+
+    def set_output_size(self, size):
+        # Committed together with the keys of the rows appended up to `size`
+        self.conn.execute("INSERT OR REPLACE INTO output (id, size) VALUES (0, ?)", (size,))
+
+    def commit(self):
+        """
+        Persist the rows recorded since the last commit and forget stale pending items.
+        """
+        cutoff = (date.today() - timedelta(days=self.pending_ttl_days)).isoformat()
+        self.conn.execute("DELETE FROM pending WHERE first_seen < ?", (cutoff,))
+        self.conn.commit()
+
+def dedup_index_path(output):
+    """
+    Where the dedup index of an output file is kept by default: next to it, so each
+    output is de-duplicated against what was delivered to it and nothing else.
+    """
+    return f"{output}.dedup.db"
+
+def open_output_index(output, path=None):
+    """
+    Open the dedup index of the appended CSV `output` (by default dedup_index_path()).
+    An index created for a file that already exists is first filled from its rows.
+
+    The index records how large the file was at its last commit. Rows appended after
+    that, by a run that stopped before committing their keys, are cut off again, so
+    they are fetched and appended once more instead of ending up in the file twice.
+    """
+    path = path or dedup_index_path(output)
+    created = not os.path.exists(path)
+    # Appended CSV rows can't be replaced later, so pending items wait until booked
+    index = DedupIndex(path, include_pending=False)
+    size = os.path.getsize(output) if os.path.exists(output) else 0
+    if created and size:
+        counts = {}
+        for chunk in chunked(read_transactions_csv(output)):
+            index.filter(number_occurrences(chunk, counts))
+    committed = index.output_size()
+    if committed is not None and size > committed:
+        print(f"⚠️ Removing {size - committed} bytes appended to {output} after its last checkpoint.")
+        with open(output, 'r+b') as f:
+            f.truncate(committed)
+    elif committed is None or size < committed:
+        # New index, or a file edited since: its current contents are what was delivered
+        index.set_output_size(size)
+        index.commit()
+    return index
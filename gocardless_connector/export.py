@@ -0,0 +1,298 @@
+import csv
+import os
+
+from .models import FIELDS, Transaction, transaction_columns
+
+EXPORT_COLUMNS = list(FIELDS)
+DEFAULT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = ['csv', 'parquet', 'feather']
+FORMAT_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+class TransactionSummary:
+    """
+    Running bank/account counts and booking date range, computed in a single pass.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.banks = set()
+        self.accounts = set()
+        self.first_date = None
+        self.last_date = None
+
+    def add(self, row):
+        self.count += 1
+        self.banks.add(row['bank_name'])
+        self.accounts.add(row['account_iban'])
+        booking_date = row['booking_date']
+        if booking_date:
+            if self.first_date is None or booking_date < self.first_date:
+                self.first_date = booking_date
+            if self.last_date is None or booking_date > self.last_date:
+                self.last_date = booking_date
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'banks': sorted(self.banks),
+            'accounts': sorted(self.accounts),
+            'first_date': self.first_date,
+            'last_date': self.last_date,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Restore a summary saved with to_dict(), e.g. to continue counting after a resume.
+        """
+        summary = cls()
+        summary.count = data.get('count', 0)
+        summary.banks = set(data.get('banks', ()))
+        summary.accounts = set(data.get('accounts', ()))
+        summary.first_date = data.get('first_date')
+        summary.last_date = data.get('last_date')
+        return summary
+
+def chunked(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Group an iterable of rows into lists of at most `chunk_size`.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def read_csv_header(filename):
+    """
+    Return the column names of an existing CSV file, or None if it is missing or empty.
+    """
+    try:
+        with open(filename, newline='', encoding='utf-8') as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+def read_transactions_csv(filename):
+    """
+    Stream the rows of an exported CSV file back as Transactions, with typed values.
+    """
+    with open(filename, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield Transaction.from_row(row)
+
+def write_transactions_csv(rows, filename, append=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream transaction rows into a CSV file, writing one chunk at a time.
+    The file is only created once the first row arrives. When appending, the existing
+    file's columns are kept, so files exported by older versions stay consistent.
+    Returns the number of rows written.
+    """
+    written = 0
+    f = None
+    try:
+        for chunk in chunked(rows, chunk_size):
+            if f is None:
+                header = read_csv_header(filename) if append else None
+                f = open(filename, 'a' if append else 'w', newline='', encoding='utf-8')
+                writer = csv.DictWriter(
+                    f, fieldnames=header or EXPORT_COLUMNS, restval='', extrasaction='ignore'
+                )
+                if not header:
+                    writer.writeheader()
+            writer.writerows(chunk)
+            written += len(chunk)
+    finally:
+        if f is not None:
+            f.close()
+    return written
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Parquet/Feather support requires pyarrow. "
+            "Install it with: pip install 'gocardless-fintools[parquet]'"
+        )
+    return pyarrow
+
+def arrow_schema():
+    """
+    Typed Arrow schema for exported transactions.
+    """
+    pa = _require_pyarrow()
+    return pa.schema([
+        ('bank_name', pa.dictionary(pa.int32(), pa.string())),
+        ('account_iban', pa.dictionary(pa.int32(), pa.string())),
+        ('transaction_id', pa.string()),
+        ('booking_date', pa.date32()),
+        ('amount', pa.float64()),
+        ('currency', pa.dictionary(pa.int8(), pa.string())),
+        ('description', pa.string()),
+        ('category', pa.dictionary(pa.int32(), pa.string())),
+        ('status', pa.dictionary(pa.int8(), pa.string())),
+        ('value_date', pa.date32()),
+        ('counterparty', pa.string()),
+        ('internal_transaction_id', pa.string()),
+    ])
+
+class _DictionaryBuilder:
+    """
+    Dictionary-encodes one column across many batches, only ever appending new values,
+    so each batch's dictionary extends the previous one (as Arrow IPC files require).
+    """
+
+    def __init__(self):
+        self.indices = {}
+        self.dictionary = None
+
+    def encode(self, values, dictionary_type):
+        pa = _require_pyarrow()
+        codes = []
+        added = []
+        for value in values:
+            code = self.indices.get(value)
+            if code is None:
+                code = self.indices[value] = len(self.indices)
+                added.append(value)
+            codes.append(code)
+        # Only the values first seen in this batch are converted; otherwise the
+        # previous batch's dictionary array is reused as is
+        if self.dictionary is None or added:
+            added = pa.array(added, type=dictionary_type.value_type)
+            self.dictionary = added if self.dictionary is None else pa.concat_arrays([self.dictionary, added])
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, type=dictionary_type.index_type), self.dictionary
+        )
+
+def rows_to_record_batch(rows, schema, dictionaries):
+    """
+    Convert a chunk of transactions (or flat export rows) into a typed Arrow record batch,
+    reading the typed values straight from each Transaction.
+    `dictionaries` maps each dictionary-encoded column to its _DictionaryBuilder.
+    """
+    pa = _require_pyarrow()
+    columns = transaction_columns(rows, schema.names)
+    arrays = [
+        dictionaries[field.name].encode(columns[field.name], field.type)
+        if pa.types.is_dictionary(field.type)
+        else pa.array(columns[field.name], type=field.type)
+        for field in schema
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def transactions_to_arrow(rows):
+    """
+    Build an Arrow table with the export schema straight from transactions.
+    """
+    pa = _require_pyarrow()
+    schema = arrow_schema()
+    columns = transaction_columns(rows, schema.names)
+    return pa.Table.from_arrays(
+        [pa.array(columns[field.name], type=field.type) for field in schema], schema=schema
+    )
+
+def write_transactions_arrow(rows, filename, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream transaction rows into a Parquet or Feather (Arrow IPC) file with typed columns,
+    writing one record batch per chunk. Returns the number of rows written.
+    """
+    pa = _require_pyarrow()
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    schema = arrow_schema()
+    dictionaries = {
+        field.name: _DictionaryBuilder()
+        for field in schema if pa.types.is_dictionary(field.type)
+    }
+    written = 0
+    writer = None
+    try:
+        for chunk in chunked(rows, chunk_size):
+            if writer is None:
+                if file_format == 'parquet':
+                    writer = pyarrow.parquet.ParquetWriter(filename, schema)
+                else:
+                    writer = pyarrow.ipc.new_file(
+                        filename, schema,
+                        options=pyarrow.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                    )
+            writer.write_batch(rows_to_record_batch(chunk, schema, dictionaries))
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+def write_transactions(rows, filename, file_format='csv', append=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream transaction rows into `filename` in the requested export format.
+    """
+    if file_format == 'csv':
+        return write_transactions_csv(rows, filename, append=append, chunk_size=chunk_size)
+    if append:
+        raise ValueError(f"Appending is only supported for CSV output, not {file_format}")
+    return write_transactions_arrow(rows, filename, file_format, chunk_size=chunk_size)
+
+def detect_format(filename):
+    """
+    Guess the export format of a file from its extension.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.feather', '.arrow', '.ipc'):
+        return 'feather'
+    return 'csv'
+
+def iter_transaction_frames(filename, chunksize, columns=None):
+    """
+    Yield an exported transactions file as DataFrames of at most `chunksize` rows.
+    Parquet and Feather files are read batch by batch through a memory map.
+    Requested columns the file does not have (e.g. 'category' in older exports) are skipped.
+    """
+    import pandas as pd
+
+    file_format = detect_format(filename)
+    if file_format == 'csv':
+        dtype = {column: str for column in (
+            'account_iban', 'transaction_id', 'description', 'category', 'counterparty', 'internal_transaction_id'
+        )}
+        usecols = (lambda column: column in columns) if columns else None
+        yield from pd.read_csv(filename, chunksize=chunksize, usecols=usecols, dtype=dtype)
+        return
+
+    pa = _require_pyarrow()
+    if file_format == 'parquet':
+        import pyarrow.parquet
+        parquet_file = pyarrow.parquet.ParquetFile(filename, memory_map=True)
+        if columns:
+            columns = [column for column in columns if column in parquet_file.schema_arrow.names]
+        batches = parquet_file.iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        import pyarrow.ipc
+        reader = pyarrow.ipc.open_file(pa.memory_map(filename))
+        if columns:
+            columns = [column for column in columns if column in reader.schema.names]
+        batches = (
+            reader.get_batch(i).select(columns) if columns else reader.get_batch(i)
+            for i in range(reader.num_record_batches)
+        )
+
+    # Regroup the file's record batches into chunks of `chunksize` rows
+    pending, pending_rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunksize:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunksize).to_pandas(date_as_object=False)
+            rest = table.slice(chunksize)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending).to_pandas(date_as_object=False)
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+
+# Requisitions whose access ends within this many days are reported as expiring
+DEFAULT_EXPIRY_WARNING_DAYS = 14
+# What each requisition status means; only LN (linked) requisitions give account access
+REQUISITION_STATUSES = {
+    'CR': 'created, not linked yet',
+    'GC': 'giving consent',
+    'UA': 'undergoing authentication',
+    'RJ': 'rejected',
+    'SA': 'selecting accounts',
+    'GA': 'granting access',
+    'LN': 'linked',
+    'EX': 'expired',
+    'SU': 'suspended',
+}
+
+def _parse_datetime(value):
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def agreement_expiry(agreement):
+    """
+    When the access granted by an end user agreement ends: `access_valid_for_days`
+    after it was accepted (or created, if it has no acceptance date). None if unknown.
+    """
+    start = _parse_datetime(agreement.get('accepted')) or _parse_datetime(agreement.get('created'))
+    days = agreement.get('access_valid_for_days')
+    if start is None or days is None:
+        return None
+    try:
+        return start + timedelta(days=int(days))
+    except (TypeError, ValueError):
+        return None
+
+class RequisitionHealth:
+    """
+    Result of checking one stored requisition: its status, linked accounts and when its
+    agreement's access expires. Only healthy requisitions are worth fetching from.
+    """
+
+    def __init__(self, bank_id, requisition_id, status=None, accounts=(), expires_at=None, error=None):
+        self.bank_id = bank_id
+        self.requisition_id = requisition_id
+        self.status = status
+        self.accounts = list(accounts)
+        self.expires_at = expires_at
+        self.error = error
+
+    def days_left(self, now=None):
+        if self.expires_at is None:
+            return None
+        now = now or datetime.now(timezone.utc)
+        return (self.expires_at - now).total_seconds() / 86400
+
+    @property
+    def problem(self):
+        """
+        Why the requisition can't be used, or None if it is healthy.
+        """
+        if self.error:
+            return f"check failed: {self.error}"
+        if self.status != 'LN':
+            return f"requisition {REQUISITION_STATUSES.get(self.status, 'status unknown')} ({self.status})"
+        if self.expires_at is not None and self.days_left() <= 0:
+            return f"access expired on {self.expires_at:%Y-%m-%d}"
+        if not self.accounts:
+            return "no linked accounts"
+        return None
+
+    @property
+    def healthy(self):
+        return self.problem is None
+
+    def expiring(self, warning_days=DEFAULT_EXPIRY_WARNING_DAYS):
+        """
+        Whether a healthy requisition's access ends within `warning_days`.
+        """
+        days_left = self.days_left()
+        return self.healthy and days_left is not None and days_left <= warning_days
+
+    def to_dict(self):
+        days_left = self.days_left()
+        return {
+            'bank_id': self.bank_id,
+            'requisition_id': self.requisition_id,
+            'status': self.status,
+            'accounts': len(self.accounts),
+            'expires_at': self.expires_at.isoformat(timespec='seconds') if self.expires_at else None,
+            'days_left': None if days_left is None else round(days_left, 1),
+            'healthy': self.healthy,
+            'problem': self.problem,
+        }
+
+def check_requisition(client, bank_id, requisition_id, metadata):
+    """
+    Check one requisition through the MetadataCache `metadata`: its status and accounts,
+    and for linked ones the expiry of their agreement. Errors are captured in the result.
+    """
+    try:
+        requisition = metadata.get_requisition(client, requisition_id)
+        expires_at = None
+        if requisition.get('status') == 'LN' and requisition.get('agreement'):
+            expires_at = agreement_expiry(metadata.get_agreement(client, requisition['agreement']))
+        return RequisitionHealth(
+            bank_id, requisition_id, requisition.get('status'), requisition.get('accounts', []), expires_at
+        )
+    except Exception as e:
+        return RequisitionHealth(bank_id, requisition_id, error=str(e))
+
+def check_requisitions(client, executor, connected_banks, metadata):
+    """
+    Check every connected bank's requisition in parallel on `executor`.
+    Returns RequisitionHealth results in connected-bank order.
+    """
+    return list(executor.map(
+        lambda item: check_requisition(client, *item, metadata), connected_banks.items()
+    ))
+
+def report_health(results, warning_days=DEFAULT_EXPIRY_WARNING_DAYS):
+    """
+    Print the requisitions that can't be used and those about to expire.
+    """
+    for result in results:
+        if not result.healthy:
+            print(f"❌ {result.bank_id}: {result.problem}, skipped (reconnect with browse-banks)")
+        elif result.expiring(warning_days):
+            print(f"⚠️ {result.bank_id}: access expires on {result.expires_at:%Y-%m-%d} "
+                  f"({max(0, int(result.days_left()))} days left), reconnect with browse-banks")
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_DIR = '.gocardless_cache'
+DEFAULT_INSTITUTIONS_TTL = 24 * 3600
+
+def _tokens(text):
+    return re.findall(r'\w+', text.lower())
+
+class InstitutionIndex:
+    """
+    In-memory indexes over a list of institutions: by ID, by country and by name token prefix.
+    Institutions are kept sorted by name so list order matches what display_institutions shows.
+    """
+
+    def __init__(self, institutions):
+        self.institutions = sorted(institutions, key=lambda bank: bank.get('name', ''))
+        self.by_id = {}
+        self.by_country = {}
+        self.by_prefix = {}
+        for position, bank in enumerate(self.institutions):
+            self.by_id[bank['id']] = bank
+            for country in bank.get('countries', []):
+                self.by_country.setdefault(country.upper(), []).append(bank)
+            for token in set(_tokens(bank.get('name', ''))):
+                for end in range(1, len(token) + 1):
+                    self.by_prefix.setdefault(token[:end], set()).add(position)
+
+    def get(self, bank_id):
+        return self.by_id.get(bank_id)
+
+    def in_country(self, country):
+        return self.by_country.get(country.upper(), [])
+
+    def search(self, term, country=None):
+        """
+        Return institutions with a name word starting with every word of `term`,
+        e.g. "inte san" matches "Intesa Sanpaolo".
+        """
+        query = _tokens(term)
+        if not query:
+            matches = range(len(self.institutions))
+        else:
+            # Intersect from the rarest prefix so the work depends on the result size
+            candidates = sorted((self.by_prefix.get(token, set()) for token in query), key=len)
+            matches = sorted(set.intersection(*candidates))
+        results = [self.institutions[position] for position in matches]
+        if country:
+            country = country.upper()
+            results = [bank for bank in results if country in bank.get('countries', [])]
+        return results
+
+class InstitutionCatalog:
+    """
+    Institution lookups backed by an on-disk cache per country with a TTL.
+    Fresh cache entries are served without any API call.
+    """
+
+    def __init__(self, client, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_INSTITUTIONS_TTL):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._indexes = {}
+        self._by_id = None
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read(self, name):
+        path = self._path(name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(name)
+        # A temporary file of its own for each write, so concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{name}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _is_fresh(self, fetched_at):
+        return fetched_at is not None and time.time() - fetched_at < self.ttl
+
+    def index(self, country):
+        """
+        Return the InstitutionIndex for a country, refreshing the cache file if it is stale.
+        """
+        country = country.upper()
+        with self._lock:
+            if country in self._indexes:
+                return self._indexes[country]
+
+            cached = self._read(f"institutions_{country}")
+            if cached and self._is_fresh(cached.get('fetched_at')):
+                institutions = cached['institutions']
+            else:
+                institutions = self.client.institution.get_institutions(country)
+                self._write(f"institutions_{country}", {
+                    'fetched_at': time.time(),
+                    'institutions': institutions
+                })
+
+            index = InstitutionIndex(institutions)
+            self._indexes[country] = index
+            return index
+
+    def get_institutions(self, country):
+        return self.index(country).institutions
+
+    def get_by_id(self, bank_id):
+        """
+        Look up one institution, from loaded country indexes, the ID cache or the API.
+        """
+        with self._lock:
+            for index in self._indexes.values():
+                bank = index.get(bank_id)
+                if bank:
+                    return bank
+
+            if self._by_id is None:
+                self._by_id = self._read('institutions_by_id') or {}
+            entry = self._by_id.get(bank_id)
+            if entry and self._is_fresh(entry.get('fetched_at')):
+                return entry['institution']
+
+        institution = self.client.institution.get_institution_by_id(bank_id)
+        if institution:
+            with self._lock:
+                self._by_id[bank_id] = {'fetched_at': time.time(), 'institution': institution}
+                self._write('institutions_by_id', self._by_id)
+        return institution
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import time
+
+# State file section holding the progress of unfinished downloads
+JOURNAL_SECTION = 'downloads'
+# Unfinished downloads older than this are started over rather than resumed: the
+# account quotas have reset by then and the data already fetched is getting stale
+DEFAULT_RESUME_WINDOW = 24 * 3600
+
+def download_key(**options):
+    """
+    Identify a download by what it writes and fetches (destination, format, date range,
+    filters), so only a run with the same options can resume it.
+    """
+    text = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+class DownloadJournal:
+    """
+    Progress of one bulk download, kept in the StateStore `state` under `key`: when the
+    run started, the accounts completed so far and whatever the writer needs to pick up
+    where it stopped. Each account is recorded only after its rows were persisted, and
+    the entry is removed once the run completes.
+    """
+
+    def __init__(self, state, key, window=DEFAULT_RESUME_WINDOW):
+        self.state = state
+        self.key = key
+        self.window = window
+        self.entry = None
+
+    def previous(self):
+        """
+        The journal entry left by an unfinished run with this key, however old, or None.
+        """
+        return self.state.get(JOURNAL_SECTION, self.key)
+
+    def resume(self, now=None):
+        """
+        Continue the unfinished run with this key if it started within the resume window.
+        Returns its entry, or None if there is nothing to resume.
+        """
+        entry = self.previous()
+        now = now or time.time()
+        if not entry or now - entry.get('started_at', 0) > self.window:
+            return None
+        self.entry = entry
+        return entry
+
+    def start(self, now=None, **info):
+        """
+        Begin a new run, replacing any unfinished one with this key.
+        """
+        self.entry = dict(info, started_at=int(now or time.time()), completed={})
+        self.state.set(JOURNAL_SECTION, self.key, self.entry)
+        return self.entry
+
+    @property
+    def completed(self):
+        return self.entry['completed'] if self.entry else {}
+
+    def checkpoint(self, account_id, rows, **info):
+        """
+        Record that `account_id` is done, with the number of rows it delivered.
+        """
+        self.entry['completed'][account_id] = rows
+        self.entry.update(info)
+        self.state.set(JOURNAL_SECTION, self.key, self.entry)
+
+    def finish(self):
+        self.state.delete(JOURNAL_SECTION, self.key)
+        self.entry = None
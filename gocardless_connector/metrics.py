@@ -0,0 +1,223 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = 'gocardless'
+# Seconds between rewrites of the Prometheus metrics file during a run
+DEFAULT_FLUSH_INTERVAL = 15
+
+class Timing:
+    """
+    Count, total, extremes and histogram of the durations observed for one series.
+    """
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bucket_counts = [0] * len(buckets)
+
+    def add(self, seconds, buckets):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        for position, bound in enumerate(buckets):
+            if seconds <= bound:
+                self.bucket_counts[position] += 1
+                break
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # A temporary file of its own for each write, so concurrent writers never share one
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of timings and counters, each a named series with labels
+    (e.g. endpoint, bank, account). Exported as a JSON run report or in the
+    Prometheus text format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.timings = {}
+            self.counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        """
+        Record one duration for the series `name` with the given labels.
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = Timing(self.buckets)
+            timing.add(seconds, self.buckets)
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add `value` to the counter `name` with the given labels.
+        """
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Time the enclosed block into the series `name`, even when it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def track_iter(self, iterable, name, **labels):
+        """
+        Yield from `iterable`, recording the total time spent waiting on it as one
+        observation of `name`. Lets a consumer tell its own time from its producer's.
+        """
+        waited = 0.0
+        iterator = iter(iterable)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    waited += time.perf_counter() - start
+                yield item
+        finally:
+            self.observe(name, waited, **labels)
+
+    def report(self):
+        """
+        JSON-serialisable summary of the run so far.
+        """
+        with self.lock:
+            timings = [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': timing.count,
+                    'total_seconds': round(timing.total, 6),
+                    'mean_seconds': round(timing.total / timing.count, 6) if timing.count else None,
+                    'min_seconds': round(timing.min, 6) if timing.min is not None else None,
+                    'max_seconds': round(timing.max, 6) if timing.max is not None else None,
+                }
+                for (name, labels), timing in sorted(self.timings.items())
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            started_at = self.started_at
+        # Slowest series first, so the bottleneck is at the top of the report
+        timings.sort(key=lambda timing: timing['total_seconds'], reverse=True)
+        return {
+            'started_at': started_at,
+            'finished_at': time.time(),
+            'duration_seconds': round(time.time() - started_at, 3),
+            'timings': timings,
+            'counters': counters,
+        }
+
+    def prometheus_text(self, prefix=METRIC_PREFIX):
+        """
+        Render every series in the Prometheus text exposition format:
+        timings as histograms in seconds, counters as `_total` counters.
+        """
+        lines = []
+        with self.lock:
+            timing_names = sorted({name for name, _ in self.timings})
+            for name in timing_names:
+                metric = f'{prefix}_{name}_seconds'
+                lines.append(f'# TYPE {metric} histogram')
+                for (series, labels), timing in sorted(self.timings.items()):
+                    if series != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, timing.bucket_counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{_label_text(labels, [("le", bound)])} {cumulative}')
+                    lines.append(f'{metric}_bucket{_label_text(labels, [("le", "+Inf")])} {timing.count}')
+                    lines.append(f'{metric}_sum{_label_text(labels)} {timing.total:.6f}')
+                    lines.append(f'{metric}_count{_label_text(labels)} {timing.count}')
+
+            counter_names = sorted({name for name, _ in self.counters})
+            for name in counter_names:
+                metric = f'{prefix}_{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                for (series, labels), value in sorted(self.counters.items()):
+                    if series == name:
+                        lines.append(f'{metric}{_label_text(labels)} {value}')
+
+        lines.append(f'# TYPE {prefix}_run_started_timestamp_seconds gauge')
+        lines.append(f'{prefix}_run_started_timestamp_seconds {self.started_at:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path):
+        _write_atomic(path, json.dumps(self.report(), indent=2))
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.prometheus_text())
+
+class MetricsWriter(threading.Thread):
+    """
+    Background thread rewriting a Prometheus metrics file every `interval` seconds,
+    so a long-running sync can be scraped (e.g. by node_exporter's textfile collector).
+    """
+
+    def __init__(self, registry, path, stop_event, interval=DEFAULT_FLUSH_INTERVAL):
+        super().__init__(name='metrics-writer', daemon=True)
+        self.registry = registry
+        self.path = path
+        self.stop_event = stop_event
+        self.interval = interval
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.registry.write_prometheus(self.path)
+            except OSError as e:
+                print(f"❌ Could not write metrics to {self.path}: {e}")
+
+# Registry shared by the CLI commands and API clients unless they are given their own
+REGISTRY = MetricsRegistry()
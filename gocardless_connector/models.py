@@ -0,0 +1,214 @@
+import sys
+from collections.abc import Mapping
+from functools import lru_cache
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+# Transaction fields, in export column order
+FIELDS = (
+    'bank_name', 'account_iban', 'transaction_id', 'booking_date', 'amount', 'currency',
+    'description', 'category', 'status', 'value_date', 'counterparty', 'internal_transaction_id'
+)
+DATE_FIELDS = {'booking_date', 'value_date'}
+# Low-cardinality values shared by many transactions; one string object each
+INTERNED_FIELDS = {'bank_name', 'account_iban', 'currency', 'status'}
+_FIELD_SET = set(FIELDS)
+# Distinct date and amount strings whose parsed (immutable) values are shared
+PARSE_CACHE_SIZE = 65536
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _date_from_text(text):
+    if not text:
+        return None
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _amount_from_text(text):
+    if not text:
+        return None
+    try:
+        return Decimal(text)
+    except InvalidOperation:
+        return None
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    return _date_from_text(value) if isinstance(value, str) else None
+
+def parse_amount(value):
+    if isinstance(value, Decimal) or value is None:
+        return value
+    # str() first so floats keep their short form instead of their binary expansion
+    return _amount_from_text(value if isinstance(value, str) else str(value))
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else ''
+
+class Transaction:
+    """
+    One transaction, stored in slots with typed values: `booking_date` and `value_date`
+    are dates and `amount` a Decimal (None when missing or invalid); bank, IBAN, currency
+    and status strings are interned.
+
+    Item access (row['amount'], row.get(...)) returns the values as exported, i.e. dates
+    and amounts as strings ('' when missing), so code written for the flat export rows
+    keeps working unchanged.
+    """
+
+    # `occurrence` numbers repeats of an ID-less transaction within its account (see
+    # sync.number_occurrences); it only feeds the transaction's key, never the export
+    __slots__ = FIELDS + ('occurrence',)
+
+    def __init__(self, bank_name='', account_iban='', transaction_id='', booking_date=None, amount=None,
+                 currency='', description='', category='', status='booked', value_date=None,
+                 counterparty='', internal_transaction_id=''):
+        self.bank_name = _intern(bank_name)
+        self.account_iban = _intern(account_iban)
+        self.transaction_id = transaction_id or ''
+        self.booking_date = parse_date(booking_date)
+        self.amount = parse_amount(amount)
+        self.currency = _intern(currency)
+        self.description = description or ''
+        self.category = category or ''
+        self.status = _intern(status)
+        self.value_date = parse_date(value_date)
+        self.counterparty = counterparty or ''
+        self.internal_transaction_id = internal_transaction_id or ''
+        self.occurrence = 0
+
+    @classmethod
+    def from_api(cls, transaction, bank_name, account_iban, status='booked'):
+        """
+        Build a transaction from one entry of the API's booked/pending transaction lists.
+        """
+        get = transaction.get
+        amount = get('transactionAmount') or {}
+        raw_amount = amount.get('amount')
+        booking_date = get('bookingDate')
+        value_date = get('valueDate')
+        # Slots are filled directly, with the common string cases parsed inline:
+        # this runs once per fetched transaction
+        self = cls.__new__(cls)
+        self.bank_name = _intern(bank_name)
+        self.account_iban = _intern(account_iban)
+        self.transaction_id = get('transactionId') or ''
+        self.booking_date = _date_from_text(booking_date) if booking_date.__class__ is str else parse_date(booking_date)
+        self.amount = _amount_from_text(raw_amount) if raw_amount.__class__ is str else parse_amount(raw_amount)
+        self.currency = _intern(amount.get('currency') or '')
+        self.description = get('remittanceInformationUnstructured') or ''
+        self.category = ''
+        self.status = _intern(status)
+        self.value_date = _date_from_text(value_date) if value_date.__class__ is str else parse_date(value_date)
+        # The other party: who was paid on debits, who paid on credits
+        if self.amount is not None and self.amount < 0:
+            self.counterparty = get('creditorName') or get('debtorName') or ''
+        else:
+            self.counterparty = get('debtorName') or get('creditorName') or ''
+        self.internal_transaction_id = get('internalTransactionId') or ''
+        self.occurrence = 0
+        return self
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Build a transaction from a flat export row (a dict, or a Transaction returned as is).
+        """
+        if isinstance(row, cls):
+            return row
+        return cls(**{field: row[field] for field in FIELDS if field in row})
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            return ''
+        if key == 'amount' or key in DATE_FIELDS:
+            return str(value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in _FIELD_SET else default
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        if key in DATE_FIELDS:
+            value = parse_date(value)
+        elif key == 'amount':
+            value = parse_amount(value)
+        elif key in INTERNED_FIELDS:
+            value = _intern(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def keys(self):
+        return list(FIELDS)
+
+    def values(self):
+        return [self[field] for field in FIELDS]
+
+    def items(self):
+        return [(field, self[field]) for field in FIELDS]
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return self.to_dict() == dict(other.items())
+
+    __hash__ = None
+
+    def to_dict(self):
+        """
+        The transaction as a flat export row.
+        """
+        return {field: self[field] for field in FIELDS}
+
+    def __repr__(self):
+        return f"Transaction({', '.join(f'{field}={getattr(self, field)!r}' for field in FIELDS)})"
+
+# Registered rather than inherited: an ABC base makes every instantiation noticeably slower
+Mapping.register(Transaction)
+
+def transaction_columns(rows, columns=FIELDS):
+    """
+    Typed column lists for `rows` (Transactions or flat export rows): dates as date,
+    amounts as float, missing values as None, everything else as strings.
+    """
+    rows = [Transaction.from_row(row) for row in rows]
+    data = {}
+    for column in columns:
+        if column == 'amount':
+            data[column] = [None if row.amount is None else float(row.amount) for row in rows]
+        else:
+            data[column] = [getattr(row, column) for row in rows]
+    return data
+
+def transactions_to_frame(rows, columns=FIELDS):
+    """
+    Build a DataFrame straight from the transaction slots: dates as datetime64, amounts
+    as float64, and bank, IBAN, currency, status and category as categoricals.
+    """
+    import pandas as pd
+
+    data = transaction_columns(rows, columns)
+    for column, values in data.items():
+        if column in DATE_FIELDS:
+            data[column] = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce')
+        elif column == 'amount':
+            data[column] = pd.Series(values, dtype='float64')
+        elif column in INTERNED_FIELDS or column == 'category':
+            data[column] = pd.Categorical(values)
+    return pd.DataFrame(data, columns=list(columns))
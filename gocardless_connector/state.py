@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+DEFAULT_STATE_FILE = os.getenv('GOCARDLESS_STATE_FILE', 'gocardless_state.json')
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on `path` (created if missing) for the duration of the block.
+    """
+    with open(path, 'a') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+class StateStore:
+    """
+    JSON file holding tokens, requisitions and download progress, organised as sections of
+    key/value pairs. Reads are served from memory and only re-parse the file when it
+    changed on disk; writes are read-modify-write under an exclusive file lock and
+    replace the file atomically, so concurrent processes never corrupt or lose keys.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self._data = {}
+        self._signature = None
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file_lock = None
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive access to the state across threads and processes. Re-entrant, so a
+        check-then-update sequence can hold the lock around several writes.
+        """
+        with self._lock:
+            if self._depth == 0:
+                self._file_lock = file_lock(f"{self.path}.lock")
+                self._file_lock.__enter__()
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._file_lock.__exit__(None, None, None)
+                    self._file_lock = None
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._data, self._signature = {}, None
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with open(self.path, encoding='utf-8') as f:
+                self._data = json.load(f)
+            self._signature = signature
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._signature = None
+
+    def section(self, name):
+        """
+        Return a copy of one section as a dict.
+        """
+        with self._lock:
+            self._refresh()
+            return dict(self._data.get(name, {}))
+
+    def get(self, section, key, default=None):
+        with self._lock:
+            self._refresh()
+            return self._data.get(section, {}).get(key, default)
+
+    def update(self, section, values):
+        """
+        Set several keys of a section in one atomic write.
+        """
+        with self.locked():
+            self._refresh()
+            self._data.setdefault(section, {}).update(values)
+            self._write()
+
+    def set(self, section, key, value):
+        self.update(section, {key: value})
+
+    def delete(self, section, key):
+        with self.locked():
+            self._refresh()
+            values = self._data.get(section, {})
+            if key in values:
+                del values[key]
+                self._write()
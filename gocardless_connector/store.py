@@ -0,0 +1,495 @@
+import sqlite3
+from datetime import date
+
+from .export import EXPORT_COLUMNS
+from .sync import CURSOR_SCHEMA, load_cursors, save_cursor, transaction_key
+
+DEFAULT_DB_FILE = 'transactions.db'
+DEFAULT_BATCH_SIZE = 5000
+# Keys per IN (...) query, below SQLite's bound-parameter limit
+QUERY_BATCH = 500
+# Oldest SQLite library with UPSERT (3.24) and window functions (3.25, for balance history)
+MIN_SQLITE_VERSION = (3, 25, 0)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    account_iban   TEXT NOT NULL,
+    transaction_id TEXT NOT NULL,
+    bank_name      TEXT,
+    booking_date   TEXT,
+    amount         REAL,
+    currency       TEXT,
+    description    TEXT,
+    category       TEXT NOT NULL DEFAULT '',
+    status         TEXT NOT NULL DEFAULT 'booked',
+    value_date     TEXT NOT NULL DEFAULT '',
+    counterparty   TEXT NOT NULL DEFAULT '',
+    internal_transaction_id TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (account_iban, transaction_id)
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_booking_date ON transactions (booking_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions (account_iban, booking_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions (amount);
+"""
+
+# Columns added after the first release, with their definitions, for older stores
+ADDED_COLUMNS = {
+    'category': "TEXT NOT NULL DEFAULT ''",
+    'status': "TEXT NOT NULL DEFAULT 'booked'",
+    'value_date': "TEXT NOT NULL DEFAULT ''",
+    'counterparty': "TEXT NOT NULL DEFAULT ''",
+    'internal_transaction_id': "TEXT NOT NULL DEFAULT ''",
+}
+
+UPSERT = """
+INSERT INTO transactions (
+    account_iban, transaction_id, bank_name, booking_date, amount, currency, description, category,
+    status, value_date, counterparty, internal_transaction_id
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account_iban, transaction_id) DO UPDATE SET
+    bank_name = excluded.bank_name,
+    booking_date = excluded.booking_date,
+    amount = excluded.amount,
+    currency = excluded.currency,
+    description = excluded.description,
+    category = COALESCE(NULLIF(excluded.category, ''), transactions.category),
+    status = excluded.status,
+    value_date = excluded.value_date,
+    counterparty = excluded.counterparty,
+    internal_transaction_id = excluded.internal_transaction_id
+"""
+
+# Per-account, per-month totals of booked transactions, kept current by triggers on every
+# insert, update and delete, plus the latest reported balance of each account
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    account_iban TEXT NOT NULL,
+    month        TEXT NOT NULL,
+    currency     TEXT NOT NULL,
+    bank_name    TEXT NOT NULL DEFAULT '',
+    inflow       REAL NOT NULL DEFAULT 0,
+    outflow      REAL NOT NULL DEFAULT 0,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_iban, month, currency)
+);
+CREATE TABLE IF NOT EXISTS account_balances (
+    account_iban   TEXT PRIMARY KEY,
+    balance_type   TEXT NOT NULL,
+    amount         REAL NOT NULL,
+    currency       TEXT NOT NULL,
+    reference_date TEXT NOT NULL,
+    fetched_at     TEXT NOT NULL,
+    previous_amount         REAL,
+    previous_reference_date TEXT
+);
+CREATE TRIGGER IF NOT EXISTS rollup_insert AFTER INSERT ON transactions
+WHEN NEW.status = 'booked' AND NEW.amount IS NOT NULL AND NEW.booking_date != ''
+BEGIN
+    {add}
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_update_add AFTER UPDATE ON transactions
+WHEN NEW.status = 'booked' AND NEW.amount IS NOT NULL AND NEW.booking_date != ''
+BEGIN
+    {add}
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_update_remove AFTER UPDATE ON transactions
+WHEN OLD.status = 'booked' AND OLD.amount IS NOT NULL AND OLD.booking_date != ''
+BEGIN
+    {remove}
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_delete AFTER DELETE ON transactions
+WHEN OLD.status = 'booked' AND OLD.amount IS NOT NULL AND OLD.booking_date != ''
+BEGIN
+    {remove}
+END;
+""".format(
+    add="""
+    INSERT INTO monthly_rollups (account_iban, month, currency, bank_name, inflow, outflow, transactions)
+    VALUES (NEW.account_iban, substr(NEW.booking_date, 1, 7), COALESCE(NEW.currency, ''),
+            COALESCE(NEW.bank_name, ''), max(NEW.amount, 0), max(-NEW.amount, 0), 1)
+    ON CONFLICT (account_iban, month, currency) DO UPDATE SET
+        bank_name = excluded.bank_name,
+        inflow = inflow + excluded.inflow,
+        outflow = outflow + excluded.outflow,
+        transactions = transactions + 1;""",
+    remove="""
+    UPDATE monthly_rollups SET
+        inflow = inflow - max(OLD.amount, 0),
+        outflow = outflow - max(-OLD.amount, 0),
+        transactions = transactions - 1
+    WHERE account_iban = OLD.account_iban AND month = substr(OLD.booking_date, 1, 7)
+        AND currency = COALESCE(OLD.currency, '');
+    DELETE FROM monthly_rollups
+    WHERE account_iban = OLD.account_iban AND month = substr(OLD.booking_date, 1, 7)
+        AND currency = COALESCE(OLD.currency, '') AND transactions <= 0;"""
+)
+
+REBUILD_ROLLUPS = """
+INSERT INTO monthly_rollups (account_iban, month, currency, bank_name, inflow, outflow, transactions)
+SELECT account_iban, substr(booking_date, 1, 7), COALESCE(currency, ''), COALESCE(MAX(bank_name), ''),
+       SUM(max(amount, 0)), SUM(max(-amount, 0)), COUNT(*)
+FROM transactions
+WHERE status = 'booked' AND amount IS NOT NULL AND booking_date != ''
+GROUP BY 1, 2, 3
+"""
+
+# A reported balance only replaces the previous one as the reconciliation baseline when
+# it is of the same type and for a later date
+SET_BALANCE = """
+INSERT INTO account_balances (account_iban, balance_type, amount, currency, reference_date, fetched_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (account_iban) DO UPDATE SET
+    previous_amount = CASE
+        WHEN balance_type != excluded.balance_type THEN NULL
+        WHEN reference_date < excluded.reference_date THEN amount
+        ELSE previous_amount END,
+    previous_reference_date = CASE
+        WHEN balance_type != excluded.balance_type THEN NULL
+        WHEN reference_date < excluded.reference_date THEN reference_date
+        ELSE previous_reference_date END,
+    balance_type = excluded.balance_type,
+    amount = excluded.amount,
+    currency = excluded.currency,
+    reference_date = excluded.reference_date,
+    fetched_at = excluded.fetched_at
+"""
+
+# Balance types usable as the running balance's anchor, best first: booked balances match
+# the booked transactions the rollups are built from
+ANCHOR_BALANCE_TYPES = ['closingBooked', 'interimBooked', 'expected', 'interimAvailable', 'closingAvailable']
+# Differences below this are rounding, not missing transactions
+RECONCILE_TOLERANCE = 0.005
+
+def check_sqlite_version():
+    """
+    Fail early, with a clear message, when Python's SQLite library is too old for the store.
+    """
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        required = '.'.join(map(str, MIN_SQLITE_VERSION[:2]))
+        raise RuntimeError(
+            f"The SQLite store needs SQLite {required} or later, but this Python uses "
+            f"SQLite {sqlite3.sqlite_version}. Upgrade Python or its SQLite library."
+        )
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class TransactionStore:
+    """
+    Local SQLite store of transactions keyed by (account IBAN, transaction ID).
+    """
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        check_sqlite_version()
+        self.path = path
+        # (account_iban, transaction_id) of stored pending rows that have since been booked
+        self.settled = []
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(CURSOR_SCHEMA)
+        self._migrate()
+        has_rollups = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'monthly_rollups'"
+        ).fetchone()
+        self.conn.executescript(ROLLUP_SCHEMA)
+        if not has_rollups:
+            # Stores created before rollups existed start from their full history once
+            self.rebuild_rollups()
+
+    def _migrate(self):
+        # Stores created by older versions lack the columns added since
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")}
+        missing = [column for column in ADDED_COLUMNS if column not in columns]
+        if missing:
+            with self.conn:
+                for column in missing:
+                    self.conn.execute(f"ALTER TABLE transactions ADD COLUMN {column} {ADDED_COLUMNS[column]}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert_transactions(self, rows, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Insert or update transaction rows, committing one transaction per batch.
+        Rows without a transaction ID are keyed by a hash of their content, and rows
+        without a category keep the one already stored.
+        Returns the number of rows written.
+        """
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append((
+                row['account_iban'],
+                transaction_key(row),
+                row.get('bank_name', ''),
+                row.get('booking_date', ''),
+                _to_float(row.get('amount')),
+                row.get('currency', ''),
+                row.get('description', ''),
+                row.get('category') or '',
+                row.get('status') or 'booked',
+                row.get('value_date') or '',
+                row.get('counterparty') or '',
+                row.get('internal_transaction_id') or ''
+            ))
+            if len(batch) >= batch_size:
+                written += self._write_batch(batch)
+                batch = []
+        if batch:
+            written += self._write_batch(batch)
+        return written
+
+    def _write_batch(self, batch):
+        with self.conn:
+            self.conn.executemany(UPSERT, batch)
+        return len(batch)
+
+    def delete_transactions(self, keys):
+        """
+        Delete rows by (account_iban, transaction_id). Returns the number of rows deleted.
+        """
+        keys = list(keys)
+        if not keys:
+            return 0
+        with self.conn:
+            cursor = self.conn.executemany(
+                "DELETE FROM transactions WHERE account_iban = ? AND transaction_id = ?", keys
+            )
+        return cursor.rowcount
+
+    def _stored_status(self, keys):
+        # Status of the stored rows among (account_iban, transaction_id) keys
+        by_account = {}
+        for account_iban, transaction_id in keys:
+            by_account.setdefault(account_iban, []).append(transaction_id)
+        found = {}
+        for account_iban, transaction_ids in by_account.items():
+            for start in range(0, len(transaction_ids), QUERY_BATCH):
+                chunk = transaction_ids[start:start + QUERY_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                for transaction_id, status in self.conn.execute(
+                    f"SELECT transaction_id, status FROM transactions "
+                    f"WHERE account_iban = ? AND transaction_id IN ({placeholders})",
+                    [account_iban] + chunk
+                ):
+                    found[account_iban, transaction_id] = status
+        return found
+
+    def _pending_candidates(self, account_ibans):
+        # Stored pending rows of these accounts by (account_iban, amount, currency), oldest first
+        candidates = {}
+        for account_iban in account_ibans:
+            for transaction_id, amount, currency in self.conn.execute(
+                "SELECT transaction_id, amount, currency FROM transactions "
+                "WHERE account_iban = ? AND status = 'pending' ORDER BY booking_date, transaction_id",
+                (account_iban,)
+            ):
+                candidates.setdefault((account_iban, amount, currency or ''), []).append(transaction_id)
+        return candidates
+
+    def filter(self, rows):
+        """
+        Return the rows of a batch that are new to this store: not stored yet, or stored
+        as pending and now booked. The store's own key decides, so every store is
+        de-duplicated on its contents alone. Booked rows taking the place of a stored
+        pending item (same account, amount and currency, different ID) add that item's
+        (account_iban, transaction_id) to `settled`, to be deleted once they are written.
+        Same interface as DedupIndex.filter.
+        """
+        keyed = {}
+        for row in rows:
+            keyed.setdefault((row.get('account_iban', ''), transaction_key(row)), row)
+        if not keyed:
+            return []
+
+        stored = self._stored_status(keyed)
+        booked_accounts = {
+            key[0] for key, row in keyed.items() if key not in stored and row.get('status') != 'pending'
+        }
+        candidates = self._pending_candidates(booked_accounts) if booked_accounts else {}
+
+        new_rows = []
+        for key, row in keyed.items():
+            is_pending = row.get('status') == 'pending'
+            if key in stored:
+                # Booked under the same ID it had while pending: the upsert updates it
+                if not is_pending and stored[key] == 'pending':
+                    new_rows.append(row)
+                continue
+            if not is_pending:
+                matches = candidates.get((key[0], _to_float(row.get('amount')), row.get('currency') or ''))
+                if matches:
+                    self.settled.append((key[0], matches.pop(0)))
+            new_rows.append(row)
+        return new_rows
+
+    def cursors(self):
+        """
+        Sync cursors of the accounts synced into this store, keyed by account ID.
+        """
+        return load_cursors(self.conn)
+
+    def save_cursor(self, account_id, cursor):
+        with self.conn:
+            save_cursor(self.conn, account_id, cursor)
+
+    def read_transactions(self, start_date=None, end_date=None, account_iban=None, chunksize=None):
+        """
+        Load stored transactions as a DataFrame with the export column layout,
+        or as an iterator of DataFrames of `chunksize` rows.
+        """
+        import pandas as pd
+
+        query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM transactions WHERE 1=1"
+        params = []
+        if start_date:
+            query += " AND booking_date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND booking_date <= ?"
+            params.append(end_date)
+        if account_iban:
+            query += " AND account_iban = ?"
+            params.append(account_iban)
+        query += " ORDER BY booking_date, account_iban, transaction_id"
+        return pd.read_sql_query(query, self.conn, params=params, chunksize=chunksize)
+
+    def summary(self):
+        """
+        Return transaction, bank and account counts and the booking date range.
+        """
+        row = self.conn.execute("""
+            SELECT COUNT(*), COUNT(DISTINCT bank_name), COUNT(DISTINCT account_iban),
+                   MIN(NULLIF(booking_date, '')), MAX(NULLIF(booking_date, ''))
+            FROM transactions
+        """).fetchone()
+        return dict(zip(['transactions', 'banks', 'accounts', 'first_date', 'last_date'], row))
+
+    def rebuild_rollups(self):
+        """
+        Recompute the monthly rollups from every stored transaction. Only needed once for
+        older stores: afterwards the triggers keep them current.
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM monthly_rollups")
+            self.conn.execute(REBUILD_ROLLUPS)
+
+    def set_balance(self, account_iban, balance_type, amount, currency, reference_date, fetched_at):
+        """
+        Record the balance the bank reports for an account, anchoring its running balance.
+        """
+        with self.conn:
+            self.conn.execute(SET_BALANCE, (
+                account_iban, balance_type, amount, currency, reference_date, fetched_at
+            ))
+
+    def _net_between(self, account_iban, currency, after, until=None):
+        # Booked net amount in (after, until], read from the (account, booking_date) index
+        query = """
+            SELECT COALESCE(SUM(amount), 0) FROM transactions
+            WHERE account_iban = ? AND COALESCE(currency, '') = ? AND status = 'booked'
+                AND amount IS NOT NULL AND booking_date > ?
+        """
+        params = [account_iban, currency, after]
+        if until:
+            query += " AND booking_date <= ?"
+            params.append(until)
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def balances(self, account_iban=None):
+        """
+        Return the reported balance of each account with its reconciliation: `difference`
+        is the reported balance minus the previous report plus the booked transactions in
+        between (None until two reports exist), and `reconciled` whether it is zero.
+        """
+        query = "SELECT * FROM account_balances"
+        params = []
+        if account_iban:
+            query += " WHERE account_iban = ?"
+            params.append(account_iban)
+        cursor = self.conn.execute(query + " ORDER BY account_iban", params)
+        columns = [column[0] for column in cursor.description]
+        balances = []
+        for row in cursor.fetchall():
+            balance = dict(zip(columns, row))
+            difference = None
+            if balance['previous_amount'] is not None:
+                expected = balance['previous_amount'] + self._net_between(
+                    balance['account_iban'], balance['currency'],
+                    balance['previous_reference_date'], balance['reference_date']
+                )
+                difference = round(balance['amount'] - expected, 2)
+            balance['difference'] = difference
+            balance['reconciled'] = None if difference is None else abs(difference) < RECONCILE_TOLERANCE
+            balances.append(balance)
+        return balances
+
+    def monthly_summary(self, account_iban=None, start_month=None, end_month=None):
+        """
+        Return per-account, per-month inflow, outflow, net and transaction counts from the
+        rollups, with the month-end running balance. The running balance is anchored on the
+        account's reported balance (see set_balance), so it is None for accounts without one
+        and for months in another currency. Months are YYYY-MM.
+        """
+        query = "SELECT * FROM monthly_rollups"
+        params = []
+        if account_iban:
+            query += " WHERE account_iban = ?"
+            params.append(account_iban)
+        cursor = self.conn.execute(query + " ORDER BY account_iban, currency, month", params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        anchors = {balance['account_iban']: balance for balance in self.balances(account_iban)}
+
+        # Balance before the first known transaction: the reported balance minus every
+        # booked transaction up to its reference date
+        openings = {}
+        for iban, anchor in anchors.items():
+            total = sum(
+                row['inflow'] - row['outflow'] for row in rows
+                if row['account_iban'] == iban and row['currency'] == anchor['currency']
+            )
+            after = self._net_between(iban, anchor['currency'], anchor['reference_date'])
+            openings[iban, anchor['currency']] = anchor['amount'] - (total - after)
+
+        summary = []
+        running = dict(openings)
+        for row in rows:
+            key = (row['account_iban'], row['currency'])
+            row['inflow'] = round(row['inflow'], 2)
+            row['outflow'] = round(row['outflow'], 2)
+            row['net'] = round(row['inflow'] - row['outflow'], 2)
+            row['closing_balance'] = None
+            if key in running:
+                running[key] += row['net']
+                row['closing_balance'] = round(running[key], 2)
+            if (start_month and row['month'] < start_month) or (end_month and row['month'] > end_month):
+                continue
+            summary.append(row)
+        return summary
+
+def anchor_balance(balances):
+    """
+    Pick the balance to anchor an account's running balance on from an API balances list,
+    as (balance_type, amount, currency, reference_date), or None if none is usable.
+    """
+    by_type = {balance.get('balanceType'): balance for balance in balances}
+    for balance_type in ANCHOR_BALANCE_TYPES:
+        balance = by_type.get(balance_type)
+        amount = _to_float((balance or {}).get('balanceAmount', {}).get('amount'))
+        if amount is None:
+            continue
+        reference_date = balance.get('referenceDate') or date.today().isoformat()
+        return balance_type, amount, balance['balanceAmount'].get('currency', ''), reference_date
+    return None
@@ -0,0 +1,102 @@
+import hashlib
+import json
+from datetime import date, timedelta
+
+from .models import Transaction
+
+DEFAULT_OVERLAP_DAYS = 3
+# Sync cursors are kept with what they describe: in the transaction store, or in the
+# dedup index of an appended file, so each destination advances on its own
+CURSOR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    account_id TEXT PRIMARY KEY,
+    cursor     TEXT NOT NULL
+);
+"""
+
+def _content_key(row):
+    content = '|'.join(
+        str(row.get(field, ''))
+        for field in ('booking_date', 'amount', 'currency', 'description')
+    )
+    return 'sha1:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def _occurrence(row):
+    return row.occurrence if isinstance(row, Transaction) else row.get('occurrence', 0)
+
+def transaction_key(row):
+    """
+    Identify a transaction row by its transaction ID, or by its content when the bank omits one.
+    Repeats of the same content are told apart by their occurrence (see number_occurrences):
+    the second one is keyed '<hash>#2', and so on.
+    """
+    if row.get('transaction_id'):
+        return row['transaction_id']
+    occurrence = _occurrence(row)
+    return f"{_content_key(row)}#{occurrence + 1}" if occurrence else _content_key(row)
+
+def number_occurrences(rows, counts=None):
+    """
+    Number the rows without a transaction ID that repeat the content of an earlier row
+    of the same account and status, e.g. two equal purchases on the same day, so each
+    keeps a key of its own. Call it on one account's complete batch as fetched, so the
+    numbering is the same on every run; pass the same `counts` dict to continue
+    numbering across chunks of one stream. Returns the rows.
+    """
+    counts = {} if counts is None else counts
+    for row in rows:
+        if row.get('transaction_id'):
+            continue
+        content = (row.get('account_iban', ''), row.get('status'), _content_key(row))
+        occurrence = counts.get(content, 0)
+        counts[content] = occurrence + 1
+        if isinstance(row, Transaction):
+            row.occurrence = occurrence
+        else:
+            row['occurrence'] = occurrence
+    return rows
+
+def load_cursors(conn):
+    """
+    The per-account sync cursors kept in the SQLite database `conn`, keyed by account ID.
+    """
+    return {
+        account_id: json.loads(cursor)
+        for account_id, cursor in conn.execute("SELECT account_id, cursor FROM sync_cursors")
+    }
+
+def save_cursor(conn, account_id, cursor):
+    """
+    Replace an account's sync cursor in `conn`, within the caller's transaction.
+    """
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_cursors (account_id, cursor) VALUES (?, ?)",
+        (account_id, json.dumps(cursor, sort_keys=True))
+    )
+
+def cursor_date_from(cursor, overlap_days=DEFAULT_OVERLAP_DAYS):
+    """
+    Return the `date_from` to request for an account, or None for a full download.
+    """
+    if not cursor or not cursor.get('last_booking_date'):
+        return None
+    last_date = date.fromisoformat(cursor['last_booking_date'])
+    return (last_date - timedelta(days=overlap_days)).isoformat()
+
+def apply_cursor(rows, cursor, index):
+    """
+    Drop rows already delivered by a previous sync and return (new_rows, new_cursor).
+
+    Delivered transactions are tracked by `index`, the DedupIndex or TransactionStore the
+    rows go to; the cursor only keeps the last booking date, from which the next sync
+    starts (minus the overlap).
+    """
+    cursor = cursor or {}
+    new_rows = index.filter(rows)
+
+    booking_dates = [row['booking_date'] for row in rows if row.get('booking_date')]
+    if cursor.get('last_booking_date'):
+        booking_dates.append(cursor['last_booking_date'])
+    if not booking_dates:
+        return new_rows, cursor
+    return new_rows, {'last_booking_date': max(booking_dates)}
@@ -0,0 +1,181 @@
+import json
+import os
+
+from dotenv import dotenv_values
+
+from .export import EXPORT_FORMATS, detect_format
+from .state import StateStore
+from .sync import DEFAULT_OVERLAP_DAYS
+from .tokens import TokenStore
+
+# Files kept in each tenant's directory unless the manifest says otherwise
+TENANT_STATE_FILE = 'gocardless_state.json'
+TENANT_CACHE_DIR = '.gocardless_cache'
+TENANT_OUTPUT = 'transactions.csv'
+# Accounts of one tenant fetched at once on the shared worker pool
+DEFAULT_TENANT_CONCURRENCY = 4
+# Size of the API worker pool shared by all tenants, and tenants run side by side
+DEFAULT_BATCH_WORKERS = 16
+DEFAULT_PARALLEL_TENANTS = 4
+
+TENANT_FIELDS = {
+    'name', 'secret_id', 'secret_key', 'env_file', 'directory', 'state_file', 'dedup_index',
+    'cache_dir', 'output', 'format', 'db', 'incremental', 'overlap_days', 'rules', 'report',
+    'bank_ids', 'ibans', 'requisitions', 'concurrency', 'endpoint_rate', 'account_rate', 'base_url'
+}
+# Numeric settings: their type, and whether zero is allowed
+NUMBER_FIELDS = {
+    'concurrency': (int, False),
+    'overlap_days': (int, True),
+    'endpoint_rate': (float, False),
+    'account_rate': (float, False),
+}
+
+class Tenant:
+    """
+    One set of GoCardless credentials in a batch run, with its own state file (tokens,
+    requisitions, download progress), dedup index, metadata cache, outputs and rate limits.
+    """
+
+    def __init__(self, name, secret_id, secret_key, directory, env_file=None, state_file=None,
+                 dedup_index=None, cache_dir=None, output=None, file_format=None, db=None,
+                 incremental=False, overlap_days=DEFAULT_OVERLAP_DAYS, rules=None, report=None,
+                 bank_ids=(), ibans=(), requisitions=None, concurrency=DEFAULT_TENANT_CONCURRENCY,
+                 endpoint_rate=None, account_rate=None, base_url=None):
+        self.name = name
+        self.secret_id = secret_id
+        self.secret_key = secret_key
+        self.directory = directory
+        # Legacy tokens are only ever read from the tenant's own .env, never the process's
+        self.env_file = self.path(env_file or '.env')
+        self.state_file = self.path(state_file or TENANT_STATE_FILE)
+        self.dedup_index = self.path(dedup_index) if dedup_index else None
+        self.cache_dir = self.path(cache_dir or TENANT_CACHE_DIR)
+        self.output = self.path(output or TENANT_OUTPUT)
+        self.file_format = file_format or detect_format(self.output)
+        self.db = self.path(db) if db else None
+        self.incremental = incremental
+        self.overlap_days = overlap_days
+        self.rules = self.path(rules) if rules else None
+        self.report = self.path(report) if report else None
+        self.bank_ids = tuple(bank_ids)
+        self.ibans = tuple(ibans)
+        self.requisitions = dict(requisitions or {})
+        self.concurrency = concurrency
+        self.endpoint_rate = endpoint_rate
+        self.account_rate = account_rate
+        self.base_url = base_url
+
+    def path(self, value):
+        """
+        Resolve a manifest path against the tenant's directory.
+        """
+        return os.path.join(self.directory, value)
+
+    @classmethod
+    def from_dict(cls, raw, number, base_dir='.'):
+        """
+        Build a tenant from one manifest entry. `directory` (default: the tenant's name)
+        is relative to `base_dir`; every other path is relative to that directory.
+        """
+        if not isinstance(raw, dict):
+            raise ValueError(f"Tenant {number}: expected an object, got {type(raw).__name__}")
+        unknown = set(raw) - TENANT_FIELDS
+        if unknown:
+            raise ValueError(f"Tenant {number}: unknown field(s) {', '.join(sorted(unknown))}")
+        name = raw.get('name')
+        if not name or not isinstance(name, str):
+            raise ValueError(f"Tenant {number}: 'name' is required")
+
+        options = {key: value for key, value in raw.items() if key not in ('name', 'format', 'directory')}
+        directory = os.path.join(base_dir, raw.get('directory') or name)
+        secret_id, secret_key = raw.get('secret_id'), raw.get('secret_key')
+        if raw.get('env_file') and not (secret_id and secret_key):
+            # Credentials kept in the tenant's own .env; read without touching os.environ
+            values = dotenv_values(os.path.join(directory, raw['env_file']))
+            secret_id = secret_id or values.get('GOCARDLESS_SECRET_ID')
+            secret_key = secret_key or values.get('GOCARDLESS_SECRET_KEY')
+        if not secret_id or not secret_key:
+            raise ValueError(f"Tenant {name}: needs 'secret_id' and 'secret_key', or an 'env_file' containing them")
+        options.update(secret_id=secret_id, secret_key=secret_key)
+
+        file_format = raw.get('format')
+        if file_format is not None and file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Tenant {name}: 'format' must be one of {', '.join(EXPORT_FORMATS)}")
+        for field, (kind, zero_allowed) in NUMBER_FIELDS.items():
+            if field not in raw:
+                continue
+            value = raw[field]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not (
+                value > 0 or (zero_allowed and value == 0)
+            ):
+                qualifier = 'non-negative' if zero_allowed else 'positive'
+                raise ValueError(f"Tenant {name}: '{field}' must be a {qualifier} number")
+            options[field] = kind(value)
+        for field in ('bank_ids', 'ibans'):
+            if not isinstance(raw.get(field, []), list):
+                raise ValueError(f"Tenant {name}: '{field}' must be a list")
+        if not isinstance(raw.get('requisitions', {}), dict):
+            raise ValueError(f"Tenant {name}: 'requisitions' must map bank IDs to requisition IDs")
+
+        tenant = cls(name, directory=directory, file_format=file_format, **options)
+        if tenant.incremental and not tenant.db and tenant.file_format != 'csv':
+            raise ValueError(f"Tenant {name}: 'incremental' can only append to CSV files; use 'db' for other formats")
+        return tenant
+
+    def token_store(self, state=None):
+        return TokenStore(self.env_file, state or StateStore(self.state_file))
+
+    def connected_banks(self, state=None):
+        """
+        The tenant's requisition IDs keyed by bank ID: those stored in its state file,
+        plus any listed in the manifest. The process environment is never consulted.
+        """
+        state = state or StateStore(self.state_file)
+        requisitions = dict(state.section('requisitions'))
+        requisitions.update(self.requisitions)
+        return {
+            bank_id: requisition_id
+            for bank_id, requisition_id in sorted(requisitions.items())
+            if requisition_id
+        }
+
+    def rate_limiter(self):
+        """
+        A rate limiter of the tenant's own, so one tenant's quotas never delay another.
+        """
+        from .transport import RateLimiter
+
+        limits = {'endpoint_rate': self.endpoint_rate, 'account_rate': self.account_rate}
+        return RateLimiter(**{key: value for key, value in limits.items() if value is not None})
+
+def load_manifest(path):
+    """
+    Load a JSON tenant manifest (a list of tenants, or an object with a "tenants" list
+    and optional "defaults" applied to every tenant) into Tenant objects.
+    Tenant directories are resolved relative to the manifest file.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get('defaults', {})
+        data = data.get('tenants', [])
+    if not isinstance(data, list) or not isinstance(defaults, dict):
+        raise ValueError(f"{path}: expected a list of tenants")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    tenants = []
+    for number, raw in enumerate(data, 1):
+        if isinstance(raw, dict):
+            raw = dict(defaults, **raw)
+        tenants.append(Tenant.from_dict(raw, number, base_dir))
+
+    names = [tenant.name for tenant in tenants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"{path}: duplicate tenant name(s) {', '.join(duplicates)}")
+    directories = [os.path.abspath(tenant.directory) for tenant in tenants]
+    if len(set(directories)) < len(directories):
+        raise ValueError(f"{path}: tenants must not share a directory")
+    return tenants
@@ -0,0 +1,113 @@
+import os
+import time
+
+from dotenv import dotenv_values
+
+from .state import StateStore
+
+# Legacy .env keys, still read when the state store has no tokens yet
+ACCESS_TOKEN_KEY = 'GOCARDLESS_ACCESS_TOKEN'
+REFRESH_TOKEN_KEY = 'GOCARDLESS_REFRESH_TOKEN'
+ACCESS_EXPIRES_KEY = 'GOCARDLESS_ACCESS_EXPIRES_AT'
+REFRESH_EXPIRES_KEY = 'GOCARDLESS_REFRESH_EXPIRES_AT'
+
+# Refresh tokens this many seconds before they actually expire
+DEFAULT_EXPIRY_MARGIN = 300
+
+def find_env_file():
+    """
+    Return the .env file holding the GoCardless credentials: the current directory's
+    if present, else the package directory's.
+    """
+    env_locations = [
+        os.path.join(os.getcwd(), '.env'),  # Current working directory
+        os.path.join(os.path.dirname(__file__), '.env'),  # Package directory
+    ]
+    for env_path in env_locations:
+        if os.path.exists(env_path):
+            return env_path
+    return env_locations[-1]
+
+class TokenStore:
+    """
+    Persists access/refresh tokens and their expiry timestamps in the state store.
+    Credentials themselves stay in the user-managed .env file.
+    """
+
+    def __init__(self, env_path=None, state=None, margin=DEFAULT_EXPIRY_MARGIN):
+        self.env_path = env_path or find_env_file()
+        self.state = state or StateStore()
+        self.margin = margin
+
+    def locked(self):
+        """
+        Serialise token checks and refreshes across concurrent processes.
+        """
+        return self.state.locked()
+
+    def load(self):
+        """
+        Return the stored tokens: access, access_expires_at, refresh, refresh_expires_at.
+        """
+        tokens = self.state.section('tokens')
+        if tokens or not os.path.exists(self.env_path):
+            return tokens
+
+        # Tokens written to .env by older versions
+        values = dotenv_values(self.env_path)
+        legacy = {
+            'access': values.get(ACCESS_TOKEN_KEY),
+            'access_expires_at': values.get(ACCESS_EXPIRES_KEY),
+            'refresh': values.get(REFRESH_TOKEN_KEY),
+            'refresh_expires_at': values.get(REFRESH_EXPIRES_KEY),
+        }
+        return {key: value for key, value in legacy.items() if value}
+
+    def save(self, token_data):
+        """
+        Store tokens returned by generate_token/exchange_token along with their absolute expiry,
+        in a single atomic write.
+        """
+        now = int(time.time())
+        tokens = {'access': token_data['access']}
+        if 'access_expires' in token_data:
+            tokens['access_expires_at'] = now + int(token_data['access_expires'])
+        # Only update refresh token if a new one was provided
+        if 'refresh' in token_data:
+            tokens['refresh'] = token_data['refresh']
+            if 'refresh_expires' in token_data:
+                tokens['refresh_expires_at'] = now + int(token_data['refresh_expires'])
+        with self.locked():
+            if not self.state.section('tokens'):
+                # Carry over a legacy refresh token when only the access token changes
+                tokens = dict(self.load(), **tokens)
+            self.state.update('tokens', tokens)
+
+    def is_fresh(self, expires_at):
+        """
+        True if the expiry timestamp is known and not within the safety margin.
+        """
+        try:
+            expires_at = int(expires_at or 0)
+        except ValueError:
+            return False
+        return expires_at - self.margin > time.time()
+
+    def valid_access_token(self, tokens):
+        """
+        Return the stored access token if it can still be used, else None.
+        """
+        if tokens.get('access') and self.is_fresh(tokens.get('access_expires_at')):
+            return tokens['access']
+        return None
+
+    def valid_refresh_token(self, tokens):
+        """
+        Return the stored refresh token unless it is known to have expired.
+        Tokens saved before expiry tracking existed are still tried.
+        """
+        if not tokens.get('refresh'):
+            return None
+        if tokens.get('refresh_expires_at') and not self.is_fresh(tokens['refresh_expires_at']):
+            return None
+        return tokens['refresh']
@@ -0,0 +1,263 @@
+import json
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, HTTPError, Timeout
+from urllib3.exceptions import ConnectTimeoutError
+
+from nordigen import NordigenClient
+from nordigen.types.http_enums import HTTPMethod
+
+from .metrics import REGISTRY
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods safe to repeat after a failure the server may already have acted on; POST and
+# PUT are only retried when they were rejected (429) or never sent (see never_sent)
+IDEMPOTENT_METHODS = {HTTPMethod.GET, HTTPMethod.DELETE}
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 30.0
+# Longest a request will wait for a rate limit to reset before giving up
+DEFAULT_MAX_WAIT = 60.0
+DEFAULT_POOL_SIZE = 32
+# Requests per second (and burst size) allowed per endpoint and per account
+DEFAULT_ENDPOINT_RATE = 20.0
+DEFAULT_ACCOUNT_RATE = 2.0
+
+ACCOUNT_PATH = re.compile(r'^accounts/(?:premium/)?([^/]+)/?([^/]*)')
+
+class RateLimitError(HTTPError):
+    """
+    Raised when a rate limit will not reset within the allowed wait.
+    """
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, up to `capacity` at once.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _header(headers, name):
+    # GoCardless documents its rate-limit headers with an HTTP_ prefix
+    return headers.get(name) or headers.get(f'HTTP_{name}')
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def retry_after_seconds(headers):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+    """
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    seconds = _number(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """
+    Throttles requests per endpoint and per account, and pauses a scope once the API
+    reports that its quota is exhausted until the advertised reset.
+    """
+
+    def __init__(self, endpoint_rate=DEFAULT_ENDPOINT_RATE, account_rate=DEFAULT_ACCOUNT_RATE,
+                 max_wait=DEFAULT_MAX_WAIT):
+        self.endpoint_rate = endpoint_rate
+        self.account_rate = account_rate
+        self.max_wait = max_wait
+        self.buckets = {}
+        self.blocked_until = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, scope):
+        with self.lock:
+            bucket = self.buckets.get(scope)
+            if bucket is None:
+                rate = self.account_rate if scope.startswith('account:') else self.endpoint_rate
+                bucket = self.buckets[scope] = TokenBucket(rate)
+            return bucket
+
+    def acquire(self, scopes):
+        for scope in scopes:
+            wait = self.blocked_until.get(scope, 0) - time.time()
+            if wait > self.max_wait:
+                raise RateLimitError(f"Rate limit for {scope} exhausted, resets in {int(wait)}s")
+            if wait > 0:
+                time.sleep(wait)
+            self._bucket(scope).acquire()
+
+    def block(self, scope, seconds):
+        with self.lock:
+            until = time.time() + seconds
+            self.blocked_until[scope] = max(self.blocked_until.get(scope, 0), until)
+
+    def update(self, scopes, headers):
+        """
+        Record the remaining quota advertised by the API response headers.
+        """
+        endpoint_scope, account_scope = scopes[0], scopes[1] if len(scopes) > 1 else None
+
+        remaining = _number(_header(headers, 'X_RATELIMIT_REMAINING'))
+        reset = _number(_header(headers, 'X_RATELIMIT_RESET'))
+        if remaining is not None and remaining <= 0 and reset:
+            self.block(endpoint_scope, reset)
+
+        if account_scope:
+            remaining = _number(_header(headers, 'X_RATELIMIT_ACCOUNT_SUCCESS_REMAINING'))
+            reset = _number(_header(headers, 'X_RATELIMIT_ACCOUNT_SUCCESS_RESET'))
+            if remaining is not None and remaining <= 0 and reset:
+                self.block(account_scope, reset)
+
+def never_sent(error):
+    """
+    Whether a requests exception was raised while connecting, so the server never saw the request.
+    """
+    if isinstance(error, ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError; connection refused, DNS failures and connect
+    # timeouts are all ConnectTimeoutErrors (NewConnectionError subclasses it)
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+def request_scopes(endpoint):
+    """
+    Map an API path to its throttling scopes: the endpoint, plus the account if any.
+    e.g. 'accounts/<id>/transactions/' -> ['endpoint:accounts/transactions', 'account:<id>/transactions']
+    """
+    match = ACCOUNT_PATH.match(endpoint)
+    if match:
+        account_id, resource = match.groups()
+        resource = resource or 'metadata'
+        return [f'endpoint:accounts/{resource}', f'account:{account_id}/{resource}']
+    return [f"endpoint:{endpoint.split('/')[0].split('?')[0]}"]
+
+class PooledNordigenClient(NordigenClient):
+    """
+    NordigenClient that sends every request through one pooled keep-alive session,
+    throttles per endpoint and per account, and retries throttled or failed calls
+    with jittered exponential backoff (honouring Retry-After). GET and DELETE are retried
+    on connection errors, timeouts and 5xx responses; POST and PUT, which create tokens
+    and requisitions, only on 429 or when the connection could not be made, so nothing
+    the server may have processed is sent twice. Every attempt's latency, status,
+    retries, throttling delay and payload size are recorded in `metrics`.
+    """
+
+    def __init__(self, secret_key, secret_id, timeout=10,
+                 base_url="https://bankaccountdata.gocardless.com/api/v2",
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_cap=DEFAULT_BACKOFF_CAP, pool_size=DEFAULT_POOL_SIZE, rate_limiter=None,
+                 metrics=None):
+        super().__init__(secret_key=secret_key, secret_id=secret_id, timeout=timeout, base_url=base_url)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.metrics = metrics or REGISTRY
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff(self, attempt):
+        """
+        Full-jitter exponential backoff delay for the given retry attempt.
+        """
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, endpoint, data=None, headers=None):
+        """
+        Request wrapper with pooling, throttling and retries; same contract as NordigenClient.request.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        headers = headers if headers else self._headers
+        data = self.data_filter.filter_payload(data)
+        scopes = request_scopes(endpoint)
+        # Endpoint label without IDs, e.g. 'accounts/transactions'
+        label = scopes[0].split(':', 1)[1]
+
+        if method in (HTTPMethod.GET, HTTPMethod.DELETE):
+            kwargs = {'params': data}
+        elif method in (HTTPMethod.POST, HTTPMethod.PUT):
+            kwargs = {'data': json.dumps(data)}
+        else:
+            raise Exception(f'Method "{method}" is not supported')
+
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            with self.metrics.timer('api_throttle', endpoint=label):
+                self.rate_limiter.acquire(scopes)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method.value, url, headers=headers, timeout=self._timeout, **kwargs
+                )
+            except (ConnectionError, Timeout) as e:
+                self.metrics.observe('api_request', time.perf_counter() - start,
+                                     endpoint=label, method=method.value, status='error')
+                if attempt >= self.max_retries or not (idempotent or never_sent(e)):
+                    raise
+                self.metrics.inc('api_retries', endpoint=label, reason=type(e).__name__)
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+
+            self.metrics.observe('api_request', time.perf_counter() - start,
+                                 endpoint=label, method=method.value, status=response.status_code)
+            self.metrics.inc('api_response_bytes', len(response.content), endpoint=label)
+            self.rate_limiter.update(scopes, response.headers)
+
+            if response.ok:
+                return response.json()
+
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if retryable and attempt < self.max_retries:
+                delay = retry_after_seconds(response.headers)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                if delay <= self.rate_limiter.max_wait:
+                    self.metrics.inc('api_retries', endpoint=label, reason=response.status_code)
+                    if response.status_code == 429:
+                        self.rate_limiter.block(scopes[-1], delay)
+                    else:
+                        time.sleep(delay)
+                    attempt += 1
+                    continue
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            error_class = RateLimitError if response.status_code == 429 else HTTPError
+            raise error_class({"response": body, "status": response.status_code}, response=response)
@@ -15,6 +15,9 @@ setup(
         "click",
         "pandas"
     ],
+    extras_require={
+        "parquet": ["pyarrow"],
+    },
     entry_points={
         "console_scripts": [
             "gocardless-fintools=gocardless_connector.connector:cli",
@@ -40,5 +43,5 @@ setup(
         "Intended Audience :: Financial and Insurance Industry",
         "Topic :: Office/Business :: Financial",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
 )
@@ -0,0 +1,45 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from gocardless_connector import connector
+from gocardless_connector.state import StateStore
+
+from .stub_api import StubServer, requisitions
+
+STUB_BANKS = 3
+STUB_ACCOUNTS = 2
+STUB_TRANSACTIONS = 30
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Run in an empty directory, so the state file and caches start out empty.
+    """
+    monkeypatch.chdir(tmp_path)
+    for key in [key for key in os.environ if key.startswith('REQUISITION_ID_')]:
+        monkeypatch.delenv(key)
+    return tmp_path
+
+@pytest.fixture
+def stub(workdir):
+    """
+    The stub API on a free local port, with all its banks connected in the state file.
+    """
+    with StubServer(
+        banks=STUB_BANKS, accounts=STUB_ACCOUNTS, transactions=STUB_TRANSACTIONS, latency=0.005
+    ) as server:
+        StateStore().update('requisitions', requisitions(STUB_BANKS))
+        yield server
+
+@pytest.fixture
+def cli(stub, monkeypatch):
+    """
+    Run CLI commands against the stub API: cli('command', '--option', ...) -> click Result.
+    """
+    monkeypatch.setattr(connector, 'API_URL', stub.base_url)
+    monkeypatch.setenv('GOCARDLESS_SECRET_ID', 'stub')
+    monkeypatch.setenv('GOCARDLESS_SECRET_KEY', 'stub')
+    runner = CliRunner()
+    return lambda *args: runner.invoke(connector.cli, list(args))
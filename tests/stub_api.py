@@ -0,0 +1,380 @@
+"""
+Local stand-in for the GoCardless Bank Account Data API, serving the endpoints the
+connector uses (tokens, institutions, requisitions, agreements, accounts, details,
+balances, transactions) from deterministic synthetic data.
+
+Banks are BANK00..BANKnn with requisitions `req-<bank>`; their accounts are
+`<bank>-acc<i>`. Latency, throttling (429) and failure (503) injection, per-account
+daily quotas and data volume are all configurable. GET /_stats returns request counts
+and POST /_reset starts the quotas afresh.
+
+Run standalone:  python tests/stub_api.py --banks 10 --accounts 3 --transactions 500
+or in-process:   with StubServer(banks=2) as server: ... server.base_url ...
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DESCRIPTIONS = [
+    'ESSELUNGA MILANO', 'COOP LOMBARDIA', 'AMAZON EU SARL', 'NETFLIX.COM', 'ENEL ENERGIA',
+    'STIPENDIO', 'BONIFICO A MARIO ROSSI', 'PRELIEVO BANCOMAT', 'TRENITALIA', 'FARMACIA CENTRALE',
+    'SPOTIFY AB', 'TELEPASS', 'IKEA ITALIA', 'RISTORANTE DA LUIGI', 'AFFITTO',
+]
+OPENING_BALANCE_CENTS = 100000
+ACCESS_EXPIRES = 86400
+REFRESH_EXPIRES = 2592000
+
+
+def bank_ids(banks):
+    return [f'BANK{i:02d}' for i in range(banks)]
+
+
+def requisitions(banks):
+    """
+    {bank_id: requisition_id} for every stub bank, as stored by the connector.
+    """
+    return {bank: f'req-{bank}' for bank in bank_ids(banks)}
+
+
+class StubApi:
+    """
+    Request routing and synthetic data, independent of the HTTP server.
+    """
+
+    def __init__(self, banks=10, accounts=3, transactions=500, days=365, pending_ratio=0.02,
+                 latency=0.0, throttle_every=0, fail_every=0, retry_after=1,
+                 account_quota=0, quota_reset=86400, expired=0, expiring=0):
+        self.banks = bank_ids(banks)
+        # The last `expired` banks' requisitions have expired; the `expiring` banks
+        # before them have 5 days of access left
+        self.expired = set(self.banks[len(self.banks) - expired:]) if expired else set()
+        self.expiring = set(self.banks[max(0, len(self.banks) - expired - expiring):len(self.banks) - expired])
+        self.accounts_per_bank = accounts
+        self.transactions = transactions
+        self.days = days
+        self.pending_ratio = pending_ratio
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.account_quota = account_quota
+        self.quota_reset = quota_reset
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.stats = {}
+        self.quota_used = {}
+        self.tokens_issued = 0
+        self._data = {}
+
+    # Synthetic data
+
+    def account_ids(self, bank):
+        return [f'{bank}-acc{i}' for i in range(self.accounts_per_bank)]
+
+    def iban(self, account_id):
+        return f'IT00STUB{zlib.crc32(account_id.encode()):015d}'
+
+    def account_data(self, account_id):
+        """
+        (booked, pending, closing balance in cents) for an account, generated once.
+        """
+        with self.lock:
+            data = self._data.get(account_id)
+        if data is not None:
+            return data
+
+        rng = random.Random(account_id)
+        today = date.today()
+        pending_count = int(self.transactions * self.pending_ratio)
+        booked, pending = [], []
+        balance = OPENING_BALANCE_CENTS
+        for i in range(self.transactions):
+            day = (today - timedelta(days=i * self.days // max(1, self.transactions))).isoformat()
+            cents = rng.randint(-20000, 8000)
+            description = rng.choice(DESCRIPTIONS)
+            transaction = {
+                'transactionId': f'{account_id}-{i}',
+                'internalTransactionId': f'int-{account_id}-{i}',
+                'valueDate': day,
+                'transactionAmount': {'amount': f'{cents / 100:.2f}', 'currency': 'EUR'},
+                'remittanceInformationUnstructured': f'{description} {i % 97}',
+                ('creditorName' if cents < 0 else 'debtorName'): description.title(),
+            }
+            if i < pending_count:
+                pending.append(transaction)
+            else:
+                transaction['bookingDate'] = day
+                booked.append(transaction)
+                balance += cents
+        data = booked, pending, balance
+        with self.lock:
+            self._data[account_id] = data
+        return data
+
+    # Request handling
+
+    def _note(self, key):
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _count(self, endpoint):
+        with self.lock:
+            self.requests += 1
+            self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+            return self.requests
+
+    def handle(self, method, url):
+        """
+        Route one request. Returns (status, headers, body).
+        """
+        parts = urlsplit(url)
+        segments = [s for s in parts.path.split('/') if s][2:]  # drop api/v2
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if segments == ['_stats']:
+            with self.lock:
+                return 200, {}, {'requests': self.requests, 'by_endpoint': dict(self.stats)}
+        if segments == ['_reset']:
+            with self.lock:
+                self.quota_used.clear()
+            return 200, {}, {}
+
+        endpoint = segments[0] if segments else ''
+        if endpoint == 'accounts' and len(segments) > 2:
+            endpoint = f'accounts/{segments[2]}'
+        number = self._count(endpoint)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.throttle_every and number % self.throttle_every == 0:
+            self._note('throttled')
+            return 429, {'Retry-After': str(self.retry_after)}, {'summary': 'Rate limit exceeded', 'status_code': 429}
+        if self.fail_every and number % self.fail_every == 0:
+            self._note('failed')
+            return 503, {}, {'summary': 'Service unavailable', 'status_code': 503}
+
+        try:
+            return self.route(method, segments, query)
+        except (KeyError, IndexError, ValueError):
+            return 404, {}, {'summary': 'Not found', 'status_code': 404}
+
+    def route(self, method, segments, query):
+        if segments[0] == 'token':
+            with self.lock:
+                self.tokens_issued += 1
+                number = self.tokens_issued
+            body = {'access': f'stub-access-{number}', 'access_expires': ACCESS_EXPIRES}
+            if segments[1] == 'new':
+                body.update(refresh=f'stub-refresh-{number}', refresh_expires=REFRESH_EXPIRES)
+            return 200, {}, body
+
+        if segments[0] == 'institutions':
+            if len(segments) > 1:
+                return 200, {}, self.institution(self._bank(segments[1]))
+            return 200, {}, [self.institution(bank) for bank in self.banks]
+
+        if segments[0] == 'requisitions':
+            bank = self._bank(segments[1].replace('req-', '', 1))
+            return 200, {}, {
+                'id': segments[1],
+                'status': 'EX' if bank in self.expired else 'LN',
+                'institution_id': bank,
+                'agreement': f'agr-{bank}',
+                'accounts': self.account_ids(bank),
+                'created': (date.today() - timedelta(days=10)).isoformat() + 'T00:00:00Z',
+            }
+
+        if segments[0] == 'agreements':
+            bank = self._bank(segments[2].replace('agr-', '', 1))
+            age = 85 if bank in self.expiring else 10
+            return 200, {}, {
+                'id': segments[2],
+                'institution_id': bank,
+                'max_historical_days': 730,
+                'access_valid_for_days': 90,
+                'created': (date.today() - timedelta(days=age)).isoformat() + 'T00:00:00Z',
+                'accepted': (date.today() - timedelta(days=age)).isoformat() + 'T00:05:00Z',
+            }
+
+        if segments[0] == 'accounts':
+            return self.account(segments[1], segments[2] if len(segments) > 2 else '', query)
+        raise KeyError(segments[0])
+
+    def _bank(self, bank):
+        if bank not in self.banks:
+            raise KeyError(bank)
+        return bank
+
+    def institution(self, bank):
+        return {
+            'id': bank, 'name': f'Stub Bank {bank}', 'bic': f'STUB{bank}',
+            'transaction_total_days': str(self.days), 'countries': ['IT'], 'logo': '',
+        }
+
+    def account(self, account_id, resource, query):
+        bank = self._bank(account_id.split('-acc', 1)[0])
+        if account_id not in self.account_ids(bank):
+            raise KeyError(account_id)
+
+        headers = {}
+        if resource in ('transactions', 'balances', 'details') and self.account_quota:
+            key = (account_id, resource)
+            now = time.time()
+            with self.lock:
+                window_start, used = self.quota_used.get(key, (now, 0))
+                if now - window_start >= self.quota_reset:
+                    window_start, used = now, 0
+                reset = int(window_start + self.quota_reset - now)
+                if used >= self.account_quota:
+                    self.stats['quota_exceeded'] = self.stats.get('quota_exceeded', 0) + 1
+                    return 429, {
+                        'HTTP_X_RATELIMIT_ACCOUNT_SUCCESS_REMAINING': '0',
+                        'HTTP_X_RATELIMIT_ACCOUNT_SUCCESS_RESET': str(reset),
+                        'Retry-After': str(reset),
+                    }, {'summary': 'Rate limit exceeded', 'status_code': 429}
+                self.quota_used[key] = (window_start, used + 1)
+            headers = {
+                'HTTP_X_RATELIMIT_ACCOUNT_SUCCESS_REMAINING': str(self.account_quota - used - 1),
+                'HTTP_X_RATELIMIT_ACCOUNT_SUCCESS_RESET': str(reset),
+            }
+
+        iban = self.iban(account_id)
+        if resource == '':
+            return 200, headers, {
+                'id': account_id, 'iban': iban, 'status': 'READY', 'institution_id': bank,
+                'created': '2024-01-01T00:00:00Z', 'last_accessed': date.today().isoformat() + 'T00:00:00Z',
+            }
+        if resource == 'details':
+            return 200, headers, {'account': {
+                'iban': iban, 'currency': 'EUR', 'ownerName': 'Stub Owner', 'name': f'Conto {account_id}',
+            }}
+
+        booked, pending, balance = self.account_data(account_id)
+        if resource == 'balances':
+            pending_cents = sum(round(float(t['transactionAmount']['amount']) * 100) for t in pending)
+            return 200, headers, {'balances': [
+                {'balanceAmount': {'amount': f'{balance / 100:.2f}', 'currency': 'EUR'},
+                 'balanceType': 'closingBooked', 'referenceDate': date.today().isoformat()},
+                {'balanceAmount': {'amount': f'{(balance + pending_cents) / 100:.2f}', 'currency': 'EUR'},
+                 'balanceType': 'interimAvailable', 'referenceDate': date.today().isoformat()},
+            ]}
+        if resource == 'transactions':
+            date_from, date_to = query.get('date_from'), query.get('date_to')
+
+            def in_range(transaction):
+                day = transaction.get('bookingDate') or transaction['valueDate']
+                return (not date_from or day >= date_from) and (not date_to or day <= date_to)
+
+            return 200, headers, {'transactions': {
+                'booked': [t for t in booked if in_range(t)],
+                'pending': [t for t in pending if in_range(t)],
+            }}
+        raise KeyError(resource)
+
+
+def make_handler(api):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def respond(self, method):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            status, headers, body = api.handle(method, self.path)
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self.respond('GET')
+
+        def do_POST(self):
+            self.respond('POST')
+
+        def do_DELETE(self):
+            self.respond('DELETE')
+
+    return StubHandler
+
+
+class StubServer(StubApi):
+    """
+    StubApi served over HTTP from a background thread on 127.0.0.1.
+    """
+
+    def __init__(self, port=0, **options):
+        super().__init__(**options)
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/api/v2'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_arguments(parser):
+    parser.add_argument('--banks', type=int, default=10)
+    parser.add_argument('--accounts', type=int, default=3, help='Accounts per bank')
+    parser.add_argument('--transactions', type=int, default=500, help='Transactions per account')
+    parser.add_argument('--days', type=int, default=365, help='Days of history the transactions span')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--throttle-every', type=int, default=0, help='Answer every Nth request with a 429')
+    parser.add_argument('--fail-every', type=int, default=0, help='Answer every Nth request with a 503')
+    parser.add_argument('--account-quota', type=int, default=0, help='Calls per account and resource before 429s')
+    parser.add_argument('--expired', type=int, default=0, help='Banks whose requisition has expired')
+    parser.add_argument('--expiring', type=int, default=0, help='Banks whose access expires in 5 days')
+
+
+def stub_options(args):
+    return {
+        'banks': args.banks, 'accounts': args.accounts, 'transactions': args.transactions,
+        'days': args.days, 'latency': args.latency, 'throttle_every': args.throttle_every,
+        'fail_every': args.fail_every, 'account_quota': args.account_quota,
+        'expired': args.expired, 'expiring': args.expiring,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=0)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(port=args.port, **stub_options(args)).start()
+    print(f'Listening on {server.base_url}', flush=True)
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+from gocardless_connector.balances import BalanceHistory
+
+def balance(amount, balance_type='closingBooked', currency='EUR', reference_date='2024-01-31'):
+    return {
+        'balanceAmount': {'amount': amount, 'currency': currency},
+        'balanceType': balance_type, 'referenceDate': reference_date,
+    }
+
+@pytest.fixture
+def history(tmp_path):
+    with BalanceHistory(str(tmp_path / 'transactions.db')) as history:
+        yield history
+
+def series(history):
+    return [(s['account_iban'], s['balance_type'], s['amount']) for s in history.history()]
+
+def test_only_changed_balances_are_recorded(history):
+    assert history.record('IT1', [balance('10.00'), balance('12.00', 'expected')], taken_at=1000) == 2
+    assert history.record('IT1', [balance('10.00'), balance('15.00', 'expected')], taken_at=2000) == 1
+
+    assert series(history) == [('IT1', 'closingBooked', 10.0), ('IT1', 'expected', 12.0), ('IT1', 'expected', 15.0)]
+
+def test_failed_record_leaves_no_trace(history, tmp_path):
+    with pytest.raises(sqlite3.IntegrityError):
+        history.record('IT1', [balance('10.00'), balance('5.00', 'expected', currency=None)], taken_at=1000)
+
+    assert history.record('IT1', [balance('10.00')], taken_at=2000) == 1
+    assert series(history) == [('IT1', 'closingBooked', 10.0)]
+    with BalanceHistory(str(tmp_path / 'transactions.db')) as reopened:
+        assert series(reopened) == [('IT1', 'closingBooked', 10.0)]
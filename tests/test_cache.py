@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from requests import Response
+from requests.exceptions import HTTPError
+
+from gocardless_connector import connector
+from gocardless_connector.cache import MetadataCache
+
+from .conftest import STUB_ACCOUNTS, STUB_BANKS
+
+class FakeRequisitions:
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def get_requisition_by_id(self, requisition_id):
+        self.calls += 1
+        return {'id': requisition_id, 'status': self.status, 'accounts': ['acc-1', 'acc-2']}
+
+class FakeClient:
+    def __init__(self, status):
+        self.requisition = FakeRequisitions(status)
+
+def http_error(status):
+    response = Response()
+    response.status_code = status
+    return HTTPError(f'{status} error', response=response)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr('gocardless_connector.cache.time.time', lambda: now[0])
+    return now
+
+@pytest.mark.parametrize('status, reused_for', [('LN', 15 * 60), ('EX', 6 * 3600), ('CR', 0)])
+def test_requisitions_are_reused_by_status(tmp_path, clock, status, reused_for):
+    client = FakeClient(status)
+    cache = MetadataCache(str(tmp_path))
+
+    cache.get_requisition(client, 'req-1')
+    clock[0] += reused_for - 1
+    cache.get_requisition(client, 'req-1')
+    calls = client.requisition.calls
+    clock[0] += 2
+    cache.get_requisition(client, 'req-1')
+
+    assert (calls, client.requisition.calls) == ((1, 2) if reused_for else (2, 3))
+
+def test_entries_survive_a_new_instance(tmp_path):
+    MetadataCache(str(tmp_path)).set('account_details', 'acc-1', {'account': {'iban': 'IT1'}})
+
+    assert MetadataCache(str(tmp_path)).get('account_details', 'acc-1') == {'account': {'iban': 'IT1'}}
+
+@pytest.mark.parametrize('error, forgotten', [
+    (http_error(401), True), (http_error(403), True), (http_error(409), True),
+    (http_error(500), False), (RuntimeError('connection reset'), False),
+])
+def test_refused_accounts_forget_their_requisition(tmp_path, error, forgotten):
+    cache = MetadataCache(str(tmp_path))
+    cache.get_requisition(FakeClient('LN'), 'req-1')
+    cache.set('account_details', 'acc-2', {'account': {'iban': 'IT2'}})
+
+    assert cache.invalidate_refused('acc-1', error) is forgotten
+    assert (cache.get('requisition', 'req-1') is None) is forgotten
+    assert (cache.get('account_details', 'acc-2') is None) is forgotten
+
+def test_refused_fetch_invalidates_the_cached_requisition(stub, monkeypatch):
+    account = stub.account
+
+    def refused(account_id, resource, query):
+        if account_id == 'BANK01-acc0' and resource == 'transactions':
+            return 409, {}, {'summary': 'Access has expired', 'status_code': 409}
+        return account(account_id, resource, query)
+
+    monkeypatch.setattr(stub, 'account', refused)
+    client = connector.create_client('stub', 'stub', base_url=stub.base_url)
+    connector.get_all_bank_transactions(client, concurrency=4)
+
+    cache = MetadataCache()
+    assert cache.get('requisition', 'req-BANK01') is None
+    assert cache.get('requisition', 'req-BANK00')['status'] == 'LN'
+
+    requisitions_fetched = stub.stats['requisitions']
+    connector.get_all_bank_transactions(client, concurrency=4)
+    assert stub.stats['requisitions'] - requisitions_fetched == 1
+    assert stub.stats['accounts/transactions'] == 2 * STUB_BANKS * STUB_ACCOUNTS
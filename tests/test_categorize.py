@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from gocardless_connector.categorize import Categorizer, CategoryRule, load_rules
+
+def rule(number=1, **raw):
+    return CategoryRule.from_dict(dict({'category': 'X'}, **raw), number)
+
+def test_leading_inline_flags_only_apply_to_their_rule():
+    categorizer = Categorizer([
+        rule(category='Verbose', regex='(?x)a b'),
+        rule(2, category='Spaced', regex='c d'),
+    ])
+
+    assert categorizer.categorize_row({'description': 'ab'}) == 'Verbose'
+    assert categorizer.categorize_row({'description': 'cd'}) == ''
+    assert categorizer.categorize_row({'description': 'c d'}) == 'Spaced'
+
+def test_verbose_flag_with_trailing_comment():
+    categorizer = Categorizer([rule(category='Coop', regex='(?x) co op  # supermarket')])
+
+    assert categorizer.categorize_row({'description': 'COOP Milano'}) == 'Coop'
+
+@pytest.mark.parametrize('pattern', [r'(a)\1', '(?P<n>a)(?P=n)', '(a)?(?(1)b|c)'])
+def test_group_references_are_rejected(pattern):
+    with pytest.raises(ValueError, match='Rule 3: .*group references'):
+        rule(3, regex=pattern)
+
+def test_escapes_that_look_like_references_are_accepted():
+    assert rule(regex=r'\101|[\1]').regexes == [r'(?i:\101|[\1])']
+
+def test_regexes_ignore_case_unless_the_rule_is_case_sensitive():
+    categorizer = Categorizer([
+        rule(category='Bancomat', regex='^ATM', case_sensitive=True),
+        rule(2, category='Prelievo', regex='^prelievo'),
+    ])
+
+    assert categorizer.categorize_row({'description': 'ATM Milano'}) == 'Bancomat'
+    assert categorizer.categorize_row({'description': 'atm milano'}) == ''
+    assert categorizer.categorize_row({'description': 'PRELIEVO ATM'}) == 'Prelievo'
+
+def test_case_sensitive_must_be_a_boolean():
+    with pytest.raises(ValueError, match="Rule 2: 'case_sensitive' must be true or false"):
+        rule(2, regex='x', case_sensitive='yes')
+
+def test_regexes_only_get_the_flags_they_declare():
+    categorizer = Categorizer([
+        rule(category='Dot', regex='coop.milano'),
+        rule(2, category='DotAll', regex='(?s)esselunga.milano'),
+        rule(3, category='Anywhere', regex='farmacia'),
+    ])
+
+    assert categorizer.categorize_row({'description': 'COOP\nMILANO'}) == ''
+    assert categorizer.categorize_row({'description': 'COOP MILANO'}) == 'Dot'
+    assert categorizer.categorize_row({'description': 'ESSELUNGA\nMILANO'}) == 'DotAll'
+    # Each regex still searches past line breaks
+    assert categorizer.categorize_row({'description': 'Pagamento\nFarmacia'}) == 'Anywhere'
+
+def test_rules_that_cant_be_merged_fail_at_load(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'rules': [
+        {'category': 'A', 'regex': '(?P<word>x)'},
+        {'category': 'B', 'regex': '(?P<word>y)'},
+    ]}))
+
+    with pytest.raises(ValueError, match="can't be combined"):
+        load_rules(str(path))
+
+def test_row_and_frame_paths_agree():
+    pd = pytest.importorskip('pandas')
+    categorizer = Categorizer([
+        rule(category='Spesa', keywords=['esselunga', 'coop']),
+        rule(2, category='Stipendio', regex='stipendio|salary', min_amount=0),
+        rule(3, category='Affitto', counterparty=['mario rossi'], max_amount=-100),
+        rule(4, category='Risparmio', iban=['IT60 X054'], keywords=['giroconto']),
+        rule(5, category='Grande', min_amount=1000),
+    ])
+    rows = [
+        {'description': description, 'amount': amount, 'account_iban': iban, 'counterparty': counterparty}
+        for description in ['COOP Milano', 'Stipendio marzo', 'giroconto', 'bonifico', None]
+        for amount in [-500.0, -20.0, 1500.0, float('nan')]
+        for iban in ['IT60X054', 'IT99']
+        for counterparty in ['Mario Rossi', '', None]
+    ]
+
+    frame = categorizer.categorize(pd.DataFrame(rows))
+
+    assert list(frame) == [categorizer.categorize_row(row) for row in rows]
+    assert set(frame) == {'', 'Spesa', 'Stipendio', 'Affitto', 'Risparmio', 'Grande'}
@@ -0,0 +1,32 @@
+import glob
+
+from gocardless_connector.export import read_transactions_csv
+
+def test_invalid_dates_are_rejected(cli):
+    result = cli('download-all-transactions', '--from', '2024-02-30')
+
+    assert result.exit_code == 2
+    assert "'2024-02-30' is not a date in YYYY-MM-DD format" in result.output
+
+def test_reversed_date_range_is_rejected(cli):
+    result = cli('download-all-transactions', '--from', '2024-03-01', '--to', '2024-02-01')
+
+    assert result.exit_code == 2
+    assert '--from 2024-03-01 is after --to 2024-02-01' in result.output
+
+def test_date_range_cant_be_combined_with_incremental(cli):
+    result = cli('download-all-transactions', '--incremental', '--from', '2024-03-01')
+
+    assert result.exit_code == 2
+    assert "can't be combined with --incremental" in result.output
+
+def test_bank_and_iban_filters_limit_the_fetch(cli, stub):
+    iban = stub.iban('BANK01-acc1')
+    result = cli('download-all-transactions', '--output', 'out.csv', '--bank-id', 'BANK01',
+                 '--iban', iban.lower())
+
+    assert result.exit_code == 0, result.output
+    [output] = glob.glob('out_*.csv')
+    rows = list(read_transactions_csv(output))
+    assert rows and {row['account_iban'] for row in rows} == {iban}
+    assert stub.stats['accounts/transactions'] == 1
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from gocardless_connector.categorize import Categorizer, CategoryRule
+from gocardless_connector.convert import (
+    OUTPUT_COLUMNS, convert_frames, iter_input_frames, month_names
+)
+from gocardless_connector.export import write_transactions
+from gocardless_connector.store import TransactionStore
+
+def row(transaction_id, booking_date, amount, description='Coop', category='', account_iban='IT1'):
+    return {
+        'bank_name': 'Bank', 'account_iban': account_iban, 'transaction_id': transaction_id,
+        'booking_date': booking_date, 'amount': amount, 'currency': 'EUR',
+        'description': description, 'category': category, 'status': 'booked',
+    }
+
+ROWS = [
+    row('a', '2024-01-05', '-12.50', category='Spesa'),
+    row('b', '2024-02-27', '1500.00', 'Stipendio', account_iban='IT2'),
+    row('c', '', '-3.00'),
+    row('d', '2024-03-01', '', 'Rimborso'),
+    row('e', '2024-12-31', '-40.00', 'Coop Milano'),
+]
+
+def converted(path, chunksize, categorizer=None):
+    output = str(path.parent / f'converted_{chunksize}.csv')
+    summary = convert_frames(iter_input_frames(str(path), chunksize=chunksize), output, categorizer)
+    return pd.read_csv(output, dtype=str, keep_default_na=False), summary
+
+def test_transactions_are_converted_to_the_italian_layout(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    write_transactions(ROWS, str(path))
+
+    frame, summary = converted(path, chunksize=100)
+
+    months = month_names()
+    assert list(frame.columns) == OUTPUT_COLUMNS
+    assert list(frame['data']) == ['2024-01-05', '2024-02-27', '', '2024-03-01', '2024-12-31']
+    assert list(frame['mese']) == [months[0], months[1], '', months[2], months[11]]
+    assert list(frame['importo entrata']) == ['', '1500.0', '', '', '']
+    assert list(frame['importo uscita']) == ['12.5', '', '3.0', '', '40.0']
+    assert list(frame['categoria']) == ['Spesa', '', '', '', '']
+    assert (summary.count, str(summary.first_date), str(summary.last_date)) == (5, '2024-01-05', '2024-12-31')
+    assert summary.accounts == {'IT1', 'IT2'}
+
+def test_chunked_conversion_matches_a_single_chunk(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    write_transactions(ROWS, str(path))
+
+    whole, _ = converted(path, chunksize=100)
+    chunked, summary = converted(path, chunksize=2)
+
+    assert chunked.equals(whole)
+    assert summary.count == len(ROWS)
+
+def test_rules_fill_the_category(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    write_transactions(ROWS, str(path))
+    categorizer = Categorizer([CategoryRule.from_dict({'category': 'Supermercato', 'keywords': ['coop']}, 1)])
+
+    frame, _ = converted(path, chunksize=2, categorizer=categorizer)
+
+    assert list(frame['categoria']) == ['Supermercato', '', 'Supermercato', '', 'Supermercato']
+
+def test_empty_input_still_gets_a_header(tmp_path):
+    output = tmp_path / 'converted.csv'
+
+    assert convert_frames(iter([]), str(output)).count == 0
+    assert output.read_text(encoding='utf-8') == ','.join(OUTPUT_COLUMNS) + '\n'
+
+def test_store_is_converted_within_the_date_range(tmp_path):
+    output = str(tmp_path / 'converted.csv')
+    with TransactionStore(str(tmp_path / 'transactions.db')) as store:
+        store.upsert_transactions(ROWS)
+        summary = convert_frames(iter_input_frames(
+            store=store, start_date='2024-02-01', end_date='2024-06-30', chunksize=1
+        ), output)
+
+    assert list(pd.read_csv(output)['descrizione']) == ['Stipendio', 'Rimborso']
+    assert summary.count == 2
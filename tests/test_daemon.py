@@ -0,0 +1,101 @@
+from gocardless_connector.daemon import AccountScheduler
+
+DAY = 86400
+
+def accounts(count):
+    return [('BANK', 'Bank', f'acc-{i}') for i in range(count)]
+
+def run_day(scheduler, start, duration=30):
+    """
+    Simulate a daemon polling every minute for a day, each refresh taking `duration`
+    seconds. Returns the times each account's refresh started.
+    """
+    started = {}
+    now = start
+    while now < start + DAY:
+        for _, _, account_id in scheduler.pop_due(now):
+            started.setdefault(account_id, []).append(now)
+            scheduler.succeeded(account_id, now + duration)
+        now += 60
+    return started
+
+def test_accounts_refresh_daily_calls_times_a_day():
+    scheduler = AccountScheduler(daily_calls=4)
+    scheduler.set_accounts(accounts(3), now=0)
+
+    started = run_day(scheduler, 0)
+
+    assert sorted(started) == ['acc-0', 'acc-1', 'acc-2']
+    for times in started.values():
+        assert len(times) == 4
+
+def test_steady_state_cadence_is_one_interval():
+    scheduler = AccountScheduler(daily_calls=4)
+    scheduler.set_accounts(accounts(1), now=0)
+
+    started = run_day(scheduler, 0, duration=90)
+
+    assert started['acc-0'] == [0, 6 * 3600, 12 * 3600, 18 * 3600]
+
+def test_next_refresh_is_counted_from_when_it_was_due():
+    scheduler = AccountScheduler(daily_calls=4)
+    scheduler.set_accounts(accounts(1), now=0)
+    scheduler.pop_due(now=0)
+
+    assert scheduler.succeeded('acc-0', now=120) == 6 * 3600
+
+def test_accounts_are_staggered_across_the_interval():
+    scheduler = AccountScheduler(daily_calls=4)
+    scheduler.set_accounts(accounts(4), last_synced={f'acc-{i}': 0 for i in range(4)}, now=60)
+
+    assert sorted(scheduler.due_at.values()) == [60 + 6 * 3600 + i * 5400 for i in range(4)]
+
+def test_recently_synced_account_waits_one_interval():
+    scheduler = AccountScheduler(daily_calls=4)
+    scheduler.set_accounts(accounts(2), last_synced={'acc-0': 0}, now=3600)
+
+    assert scheduler.pop_due(now=3600) == [('BANK', 'Bank', 'acc-1')]
+    assert scheduler.due_at['acc-0'] >= 6 * 3600
+
+def fail_repeatedly(scheduler, account_id, count, now=0):
+    # Delays between consecutive retries of an account that keeps failing
+    delays = []
+    for _ in range(count):
+        scheduler.pop_due(now)
+        due = scheduler.failed(account_id, now)
+        delays.append(due - now)
+        now = due
+    return delays
+
+def test_failures_back_off_exponentially_up_to_one_interval(monkeypatch):
+    monkeypatch.setattr('gocardless_connector.daemon.random.uniform', lambda low, high: high)
+    scheduler = AccountScheduler(daily_calls=4, error_backoff=60)
+    scheduler.set_accounts(accounts(1), now=0)
+
+    delays = fail_repeatedly(scheduler, 'acc-0', 12)
+
+    assert delays[:4] == [60, 120, 240, 480]
+    assert delays[-1] == 6 * 3600
+
+def test_backoff_is_jittered_below_the_delay():
+    scheduler = AccountScheduler(daily_calls=4, error_backoff=60)
+    scheduler.set_accounts(accounts(1), now=0)
+
+    assert 30 <= fail_repeatedly(scheduler, 'acc-0', 1)[0] <= 60
+
+def test_retry_waits_for_the_rate_limit_reset():
+    scheduler = AccountScheduler(daily_calls=4, error_backoff=60)
+    scheduler.set_accounts(accounts(1), now=0)
+    scheduler.pop_due(now=0)
+
+    assert scheduler.failed('acc-0', now=0, blocked_until=5000) == 5000
+
+def test_success_resets_the_backoff(monkeypatch):
+    monkeypatch.setattr('gocardless_connector.daemon.random.uniform', lambda low, high: high)
+    scheduler = AccountScheduler(daily_calls=4, error_backoff=60)
+    scheduler.set_accounts(accounts(1), now=0)
+    fail_repeatedly(scheduler, 'acc-0', 3)
+
+    scheduler.pop_due(now=420)
+    due = scheduler.succeeded('acc-0', now=430)
+    assert fail_repeatedly(scheduler, 'acc-0', 1, now=due) == [60]
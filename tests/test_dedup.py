@@ -0,0 +1,79 @@
+from gocardless_connector.dedup import DedupIndex, open_output_index
+from gocardless_connector.export import read_transactions_csv, write_transactions
+from gocardless_connector.sync import number_occurrences
+
+def row(transaction_id, amount=-5.0, status='booked', description='Coop'):
+    return {
+        'bank_name': 'Bank', 'account_iban': 'IT1', 'transaction_id': transaction_id,
+        'booking_date': '2024-01-05', 'amount': amount, 'currency': 'EUR',
+        'description': description, 'status': status,
+    }
+
+def test_committed_rows_are_not_delivered_again(tmp_path):
+    path = str(tmp_path / 'index.db')
+    with DedupIndex(path) as index:
+        assert index.filter([row('a'), row('b'), row('a')]) == [row('a'), row('b')]
+        index.commit()
+
+    with DedupIndex(path) as index:
+        assert index.filter([row('a'), row('c')]) == [row('c')]
+
+def test_uncommitted_rows_are_rolled_back(tmp_path):
+    path = str(tmp_path / 'index.db')
+    with DedupIndex(path) as index:
+        index.filter([row('a')])
+
+    with DedupIndex(path) as index:
+        assert index.filter([row('a')]) == [row('a')]
+
+def test_pending_row_is_delivered_again_once_booked():
+    with DedupIndex(':memory:') as index:
+        assert index.filter([row('p', status='pending')]) == [row('p', status='pending')]
+        assert index.filter([row('p', status='pending')]) == []
+
+        assert index.filter([row('p')]) == [row('p')]
+        assert index.settled == []
+        assert index.filter([row('p')]) == []
+
+def test_pending_row_booked_under_a_new_id_is_settled():
+    with DedupIndex(':memory:') as index:
+        index.filter([row('p', status='pending')])
+
+        assert index.filter([row('b')]) == [row('b')]
+        assert index.settled == [('IT1', 'p')]
+        # The pending item was only replaced once
+        assert index.filter([row('c')]) == [row('c')]
+        assert index.settled == [('IT1', 'p')]
+
+def test_pending_rows_wait_when_not_included():
+    with DedupIndex(':memory:', include_pending=False) as index:
+        assert index.filter([row('p', status='pending')]) == []
+        assert index.filter([row('p')]) == [row('p')]
+
+def test_identical_rows_without_id_are_kept_apart():
+    with DedupIndex(':memory:') as index:
+        assert len(index.filter(number_occurrences([row(''), row('')]))) == 2
+        assert index.filter(number_occurrences([row(''), row('')])) == []
+
+def test_output_index_is_seeded_from_the_existing_file(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    write_transactions([row('a'), row('b')], output)
+
+    with open_output_index(output) as index:
+        assert index.filter([row('a'), row('b'), row('c')]) == [row('c')]
+
+def test_rows_appended_after_the_last_commit_are_cut_off(tmp_path, capsys):
+    output = str(tmp_path / 'out.csv')
+    with open_output_index(output) as index:
+        index.filter([row('a')])
+        write_transactions([row('a')], output, append=True)
+        index.set_output_size(len(open(output, 'rb').read()))
+        index.commit()
+        # Stops after appending, before committing
+        index.filter([row('b')])
+        write_transactions([row('b')], output, append=True)
+
+    with open_output_index(output) as index:
+        assert [r['transaction_id'] for r in read_transactions_csv(output)] == ['a']
+        assert index.filter([row('a'), row('b')]) == [row('b')]
+    assert 'after its last checkpoint' in capsys.readouterr().out
@@ -0,0 +1,101 @@
+import csv
+import itertools
+
+import pandas as pd
+import pytest
+
+from gocardless_connector.export import (
+    EXPORT_COLUMNS, TransactionSummary, chunked, detect_format, iter_transaction_frames, read_csv_header,
+    _DictionaryBuilder, read_transactions_csv, write_transactions
+)
+
+def row(transaction_id, bank_name='Bank', booking_date='2024-01-05', amount='-5.00'):
+    return {
+        'bank_name': bank_name, 'account_iban': 'IT1', 'transaction_id': transaction_id,
+        'booking_date': booking_date, 'amount': amount, 'currency': 'EUR',
+        'description': f'Payment {transaction_id}', 'status': 'booked',
+    }
+
+def test_chunks_are_taken_lazily():
+    chunks = chunked(itertools.count(), 3)
+
+    assert next(chunks) == [0, 1, 2]
+    assert next(chunks) == [3, 4, 5]
+
+def test_rows_are_written_in_chunks(tmp_path):
+    output = str(tmp_path / 'out.csv')
+
+    assert write_transactions((row(str(i)) for i in range(7)), output, chunk_size=3) == 7
+    assert [r['transaction_id'] for r in read_transactions_csv(output)] == [str(i) for i in range(7)]
+
+def test_no_file_is_created_without_rows(tmp_path):
+    output = tmp_path / 'out.csv'
+
+    assert write_transactions(iter([]), str(output)) == 0
+    assert not output.exists()
+
+def test_appending_keeps_the_existing_columns(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    old_columns = EXPORT_COLUMNS[:7]
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=old_columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerow(row('a'))
+
+    write_transactions([row('b')], output, append=True)
+
+    assert read_csv_header(output) == old_columns
+    assert [r['transaction_id'] for r in read_transactions_csv(output)] == ['a', 'b']
+
+def test_summary_survives_a_round_trip():
+    summary = TransactionSummary()
+    for transaction in [row('a', booking_date='2024-03-01'), row('b', 'Other', '2024-01-15'), row('c', booking_date='')]:
+        summary.add(transaction)
+
+    restored = TransactionSummary.from_dict(summary.to_dict())
+    assert (restored.count, restored.banks, restored.accounts) == (3, {'Bank', 'Other'}, {'IT1'})
+    assert (restored.first_date, restored.last_date) == ('2024-01-15', '2024-03-01')
+
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+def test_columnar_files_round_trip_through_frames(tmp_path, file_format):
+    pytest.importorskip('pyarrow')
+    output = str(tmp_path / f'out.{file_format}')
+    # Banks first seen in later chunks extend the column dictionaries
+    rows = [row(str(i), f'Bank {i // 4}', f'2024-01-{i + 1:02d}', f'-{i}.50') for i in range(10)]
+    rows[3]['amount'] = ''
+
+    assert write_transactions(rows, output, file_format, chunk_size=3) == 10
+
+    frames = list(iter_transaction_frames(output, chunksize=4))
+    assert [len(frame) for frame in frames] == [4, 4, 2]
+    frame = pd.concat(frames, ignore_index=True)
+    assert list(frame.columns) == EXPORT_COLUMNS
+    assert list(frame['bank_name'].astype(str)) == [r['bank_name'] for r in rows]
+    assert list(frame['booking_date'].dt.strftime('%Y-%m-%d')) == [r['booking_date'] for r in rows]
+    assert frame['amount'].fillna(0).tolist() == [0 if i == 3 else -i - 0.5 for i in range(10)]
+
+    [selected] = iter_transaction_frames(output, chunksize=100, columns=['amount', 'category', 'missing'])
+    assert list(selected.columns) == ['amount', 'category']
+
+def test_dictionaries_are_only_extended_with_new_values():
+    pa = pytest.importorskip('pyarrow')
+    dictionary_type = pa.dictionary(pa.int32(), pa.string())
+    builder = _DictionaryBuilder()
+
+    first = builder.encode(['a', 'b', 'a'], dictionary_type)
+    dictionary = builder.dictionary
+    same = builder.encode(['b', 'b'], dictionary_type)
+    assert builder.dictionary is dictionary
+
+    extended = builder.encode(['c', 'a'], dictionary_type)
+    assert extended.dictionary.to_pylist() == ['a', 'b', 'c']
+    assert [first.to_pylist(), same.to_pylist(), extended.to_pylist()] == [['a', 'b', 'a'], ['b', 'b'], ['c', 'a']]
+
+def test_columnar_files_cant_be_appended_to(tmp_path):
+    with pytest.raises(ValueError):
+        write_transactions([row('a')], str(tmp_path / 'out.parquet'), 'parquet', append=True)
+
+def test_format_is_detected_from_the_extension():
+    assert [detect_format(name) for name in ['a.csv', 'a.PARQUET', 'a.pq', 'a.feather', 'a.arrow', 'a']] == [
+        'csv', 'parquet', 'parquet', 'feather', 'feather', 'csv'
+    ]
@@ -0,0 +1,56 @@
+from gocardless_connector import connector
+from gocardless_connector.cache import MetadataCache
+from gocardless_connector.store import TransactionStore
+
+from .conftest import STUB_ACCOUNTS, STUB_BANKS, STUB_TRANSACTIONS
+from .stub_api import bank_ids
+
+def stub_client(server):
+    return connector.create_client('stub', 'stub', base_url=server.base_url)
+
+def fetch(server, concurrency, cache_dir):
+    return [
+        (account_id, rows)
+        for _, account_id, rows in connector.iter_account_transactions(
+            stub_client(server), concurrency=concurrency, metadata=MetadataCache(cache_dir)
+        )
+    ]
+
+def test_concurrent_fetch_keeps_the_sequential_order(stub, tmp_path):
+    sequential = fetch(stub, 1, str(tmp_path / 'sequential'))
+    concurrent = fetch(stub, 6, str(tmp_path / 'concurrent'))
+
+    expected = [f'{bank}-acc{i}' for bank in bank_ids(STUB_BANKS) for i in range(STUB_ACCOUNTS)]
+    assert [account_id for account_id, _ in concurrent] == expected
+    assert concurrent == sequential
+    assert all(len(rows) == STUB_TRANSACTIONS for _, rows in concurrent)
+
+def test_date_range_is_sent_to_the_api(stub, tmp_path):
+    rows = connector.get_all_bank_transactions(
+        stub_client(stub), concurrency=4, date_from='2000-01-01', date_to='2000-01-31'
+    )
+
+    assert rows == []
+    assert stub.stats['accounts/transactions'] == STUB_BANKS * STUB_ACCOUNTS
+
+def test_resumed_download_only_fetches_the_failed_accounts(stub, monkeypatch):
+    client = stub_client(stub)
+    load = connector.load_account_transactions
+
+    def failing(client, bank_name, account_id, *args, **kwargs):
+        if account_id == 'BANK01-acc1':
+            raise RuntimeError('connection reset')
+        return load(client, bank_name, account_id, *args, **kwargs)
+
+    monkeypatch.setattr(connector, 'load_account_transactions', failing)
+    first = connector.download_transactions(client, db='transactions.db', concurrency=4)
+    assert first['failed'] == ['BANK01-acc1']
+
+    monkeypatch.setattr(connector, 'load_account_transactions', load)
+    fetched = stub.stats['accounts/transactions']
+    second = connector.download_transactions(client, db='transactions.db', concurrency=4, resume=True)
+    assert (second['failed'], second['resumed']) == ([], STUB_BANKS * STUB_ACCOUNTS - 1)
+    assert stub.stats['accounts/transactions'] - fetched == 1
+
+    with TransactionStore('transactions.db') as store:
+        assert store.summary()['transactions'] == STUB_BANKS * STUB_ACCOUNTS * STUB_TRANSACTIONS
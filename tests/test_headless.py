@@ -0,0 +1,55 @@
+import json
+
+from gocardless_connector import connector
+
+from .conftest import STUB_ACCOUNTS, STUB_BANKS
+
+def records(result):
+    return [json.loads(line) for line in result.stdout.splitlines()]
+
+def test_balances_of_all_banks_are_printed_as_ndjson(cli):
+    result = cli('balances', '--all')
+
+    assert result.exit_code == 0, result.output
+    lines = records(result)
+    assert len(lines) == STUB_BANKS * STUB_ACCOUNTS
+    assert lines[0]['account_id'] == 'BANK00-acc0'
+    assert all(line['balances'] and line['iban'] and 'error' not in line for line in lines)
+    assert set(lines[0]['latency_ms']) == {'details', 'balances'}
+
+def test_selected_banks_are_printed_as_one_json_array(cli):
+    result = cli('transactions', '--bank-id', 'BANK01', '--format', 'json')
+
+    assert result.exit_code == 0, result.output
+    [first, second] = json.loads(result.stdout)
+    assert (first['account_id'], second['account_id']) == ('BANK01-acc0', 'BANK01-acc1')
+    assert first['transactions']['booked']
+
+def test_a_bank_selection_is_required(cli):
+    assert cli('balances').exit_code == 2
+
+def test_failed_accounts_are_reported_and_exit_non_zero(cli, stub, monkeypatch):
+    account = stub.account
+
+    def missing(account_id, resource, query):
+        if account_id == 'BANK01-acc0':
+            raise KeyError(account_id)
+        return account(account_id, resource, query)
+
+    monkeypatch.setattr(stub, 'account', missing)
+    result = cli('balances', '--all')
+
+    assert result.exit_code == 1
+    failed = [line for line in records(result) if 'error' in line]
+    assert [line['account_id'] for line in failed] == ['BANK01-acc0']
+    assert 'BANK01-acc0' in result.stderr
+
+def test_failure_before_any_account_is_one_error_record(cli, monkeypatch):
+    def unauthorized():
+        raise RuntimeError('invalid secret')
+
+    monkeypatch.setattr(connector, 'validate_tokens', unauthorized)
+    result = cli('balances', '--all')
+
+    assert result.exit_code == 1
+    assert records(result) == [{'error': 'invalid secret'}]
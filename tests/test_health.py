@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from gocardless_connector.health import RequisitionHealth, agreement_expiry
+from gocardless_connector.state import StateStore
+
+from .conftest import STUB_ACCOUNTS, STUB_BANKS, STUB_TRANSACTIONS
+from .stub_api import StubServer, requisitions
+
+@pytest.fixture
+def stub(workdir):
+    """
+    The stub API with BANK02's requisition expired and BANK01's access ending in 5 days.
+    """
+    with StubServer(
+        banks=STUB_BANKS, accounts=STUB_ACCOUNTS, transactions=STUB_TRANSACTIONS, expired=1, expiring=1
+    ) as server:
+        StateStore().update('requisitions', requisitions(STUB_BANKS))
+        yield server
+
+def test_agreement_expiry_counts_from_acceptance():
+    agreement = {'created': '2024-01-01T00:00:00Z', 'accepted': '2024-01-03T12:00:00Z', 'access_valid_for_days': 90}
+
+    assert agreement_expiry(agreement) == datetime(2024, 4, 2, 12, tzinfo=timezone.utc)
+    del agreement['accepted']
+    assert agreement_expiry(agreement) == datetime(2024, 3, 31, tzinfo=timezone.utc)
+    assert agreement_expiry({'created': '2024-01-01T00:00:00Z'}) is None
+
+@pytest.mark.parametrize('health, problem', [
+    (RequisitionHealth('B', 'r', 'LN', ['a']), None),
+    (RequisitionHealth('B', 'r', 'EX', ['a']), 'requisition expired (EX)'),
+    (RequisitionHealth('B', 'r', 'XX', ['a']), 'requisition status unknown (XX)'),
+    (RequisitionHealth('B', 'r', 'LN', []), 'no linked accounts'),
+    (RequisitionHealth('B', 'r', 'LN', ['a'], datetime(2024, 1, 1, tzinfo=timezone.utc)),
+     'access expired on 2024-01-01'),
+    (RequisitionHealth('B', 'r', error='timeout'), 'check failed: timeout'),
+])
+def test_requisition_problems(health, problem):
+    assert health.problem == problem
+    assert health.healthy is (problem is None)
+
+def test_access_ending_soon_is_expiring():
+    soon = RequisitionHealth('B', 'r', 'LN', ['a'], datetime.now(timezone.utc) + timedelta(days=5))
+
+    assert soon.expiring(warning_days=14)
+    assert not soon.expiring(warning_days=3)
+
+def test_check_requisitions_reports_every_bank(cli):
+    result = cli('check-requisitions', '--format', 'json')
+
+    assert result.exit_code == 0, result.output
+    health = {entry['bank_id']: entry for entry in json.loads(result.stdout)}
+    assert [health[bank]['healthy'] for bank in ['BANK00', 'BANK01', 'BANK02']] == [True, True, False]
+    assert health['BANK01']['days_left'] == pytest.approx(5, abs=1)
+    assert health['BANK02']['problem'] == 'requisition expired (EX)'
+
+def test_unhealthy_banks_are_skipped_before_fetching(cli, stub):
+    result = cli('download-all-transactions', '--db', 'transactions.db')
+
+    assert result.exit_code == 0, result.output
+    assert 'BANK01: access expires on' in result.output
+    assert 'BANK02: requisition expired (EX), skipped' in result.output
+    assert stub.stats['accounts/transactions'] == 2 * STUB_ACCOUNTS
@@ -0,0 +1,33 @@
+from gocardless_connector.journal import DEFAULT_RESUME_WINDOW, DownloadJournal, download_key
+from gocardless_connector.state import StateStore
+
+def test_unfinished_run_is_resumed_from_its_checkpoint(tmp_path):
+    path = str(tmp_path / 'state.json')
+    journal = DownloadJournal(StateStore(path), 'key')
+    journal.start(now=1000, filename='out.csv')
+    journal.checkpoint('acc-1', 10, size=123)
+
+    resumed = DownloadJournal(StateStore(path), 'key')
+    entry = resumed.resume(now=1000 + 3600)
+    assert (entry['filename'], entry['size']) == ('out.csv', 123)
+    assert resumed.completed == {'acc-1': 10}
+
+def test_stale_run_is_not_resumed(tmp_path):
+    journal = DownloadJournal(StateStore(str(tmp_path / 'state.json')), 'key')
+    journal.start(now=1000)
+
+    assert journal.resume(now=1000 + DEFAULT_RESUME_WINDOW + 1) is None
+    assert journal.previous()['started_at'] == 1000
+
+def test_finished_run_leaves_nothing_to_resume(tmp_path):
+    journal = DownloadJournal(StateStore(str(tmp_path / 'state.json')), 'key')
+    journal.start(now=1000)
+    journal.checkpoint('acc-1', 10)
+    journal.finish()
+
+    assert journal.previous() is None
+    assert journal.resume(now=1000) is None
+
+def test_only_runs_with_the_same_options_share_a_journal():
+    assert download_key(output='a.csv', incremental=True) == download_key(incremental=True, output='a.csv')
+    assert download_key(output='a.csv') != download_key(output='b.csv')
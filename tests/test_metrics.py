@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+
+import pytest
+
+from gocardless_connector import connector
+from gocardless_connector.metrics import REGISTRY, MetricsRegistry
+
+def test_report_lists_the_slowest_series_first():
+    registry = MetricsRegistry()
+    registry.observe('api', 0.2, endpoint='balances')
+    registry.observe('api', 1.5, endpoint='transactions')
+    registry.observe('api', 0.5, endpoint='transactions')
+    registry.inc('rows_fetched', 30, bank='B')
+
+    report = registry.report()
+    assert [(t['labels']['endpoint'], t['count'], t['total_seconds']) for t in report['timings']] == [
+        ('transactions', 2, 2.0), ('balances', 1, 0.2)
+    ]
+    assert report['counters'] == [{'name': 'rows_fetched', 'labels': {'bank': 'B'}, 'value': 30}]
+
+def test_prometheus_histograms_are_cumulative():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 3.0):
+        registry.observe('api', seconds, endpoint='x')
+    registry.inc('retries', endpoint='x')
+
+    lines = registry.prometheus_text().splitlines()
+    assert 'gocardless_api_seconds_bucket{endpoint="x",le="0.1"} 1' in lines
+    assert 'gocardless_api_seconds_bucket{endpoint="x",le="1.0"} 2' in lines
+    assert 'gocardless_api_seconds_bucket{endpoint="x",le="+Inf"} 3' in lines
+    assert 'gocardless_api_seconds_count{endpoint="x"} 3' in lines
+    assert 'gocardless_retries_total{endpoint="x"} 1' in lines
+
+def test_timer_records_blocks_that_raise():
+    registry = MetricsRegistry()
+    with pytest.raises(RuntimeError):
+        with registry.timer('stage', stage='fetch'):
+            raise RuntimeError
+
+    assert registry.report()['timings'][0]['count'] == 1
+
+def test_concurrent_writes_never_share_a_temporary_file(tmp_path):
+    registry = MetricsRegistry()
+    registry.inc('rows_fetched', 5)
+    path = str(tmp_path / 'metrics.prom')
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                registry.write_prometheus(path)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ['metrics.prom']
+    assert 'gocardless_rows_fetched_total 5' in open(path).read()
+
+def test_instrumented_command_writes_its_final_metrics(tmp_path):
+    metrics_file = str(tmp_path / 'metrics.prom')
+    report_file = str(tmp_path / 'report.json')
+
+    @connector.instrumented
+    def command():
+        REGISTRY.inc('rows_fetched', 7)
+
+    command(metrics_file=metrics_file, report_file=report_file)
+
+    assert not [thread for thread in threading.enumerate() if thread.name == 'metrics-writer']
+    assert 'gocardless_rows_fetched_total 7' in open(metrics_file).read()
+    assert json.load(open(report_file))['counters'][0]['value'] == 7
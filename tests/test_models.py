@@ -0,0 +1,86 @@
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from gocardless_connector.models import FIELDS, Transaction, transaction_columns, transactions_to_frame
+
+API_TRANSACTION = {
+    'transactionId': 't1',
+    'internalTransactionId': 'int-t1',
+    'bookingDate': '2024-01-05',
+    'valueDate': '2024-01-04',
+    'transactionAmount': {'amount': '-12.50', 'currency': 'EUR'},
+    'remittanceInformationUnstructured': 'COOP MILANO',
+    'creditorName': 'Coop',
+    'debtorName': 'Mario Rossi',
+}
+
+def test_api_transactions_get_typed_values():
+    transaction = Transaction.from_api(API_TRANSACTION, 'Bank', 'IT1', 'pending')
+
+    assert transaction.booking_date == date(2024, 1, 5)
+    assert transaction.value_date == date(2024, 1, 4)
+    assert transaction.amount == Decimal('-12.50')
+    assert (transaction.status, transaction.currency) == ('pending', 'EUR')
+    # Debits name who was paid, credits who paid
+    assert transaction.counterparty == 'Coop'
+    credit = dict(API_TRANSACTION, transactionAmount={'amount': '3', 'currency': 'EUR'})
+    assert Transaction.from_api(credit, 'Bank', 'IT1').counterparty == 'Mario Rossi'
+
+def test_items_read_as_export_strings():
+    transaction = Transaction.from_api(API_TRANSACTION, 'Bank', 'IT1')
+
+    assert (transaction['booking_date'], transaction['amount']) == ('2024-01-05', '-12.50')
+    assert transaction.get('category') == ''
+    assert transaction.get('unknown', 'x') == 'x'
+    with pytest.raises(KeyError):
+        transaction['unknown']
+    assert list(transaction) == list(FIELDS)
+
+def test_missing_or_invalid_values_are_none():
+    transaction = Transaction(booking_date='2024-02-30', amount='n/a')
+
+    assert (transaction.booking_date, transaction.amount) == (None, None)
+    assert (transaction['booking_date'], transaction['amount']) == ('', '')
+
+def test_flat_rows_round_trip():
+    row = Transaction.from_api(API_TRANSACTION, 'Bank', 'IT1').to_dict()
+    transaction = Transaction.from_row(row)
+
+    assert transaction == row
+    assert Transaction.from_row(transaction) is transaction
+    transaction['amount'] = 4.1
+    assert transaction.amount == Decimal('4.1')
+
+def test_columns_are_typed():
+    rows = [Transaction.from_api(API_TRANSACTION, 'Bank', 'IT1'), {'account_iban': 'IT2', 'amount': ''}]
+
+    columns = transaction_columns(rows, ['account_iban', 'booking_date', 'amount'])
+    assert columns == {
+        'account_iban': ['IT1', 'IT2'], 'booking_date': [date(2024, 1, 5), None], 'amount': [-12.5, None],
+    }
+
+def test_frames_are_built_with_typed_columns():
+    rows = [Transaction.from_api(API_TRANSACTION, 'Bank', 'IT1'), {'bank_name': 'Other', 'amount': '7'}]
+
+    frame = transactions_to_frame(rows)
+    assert list(frame.columns) == list(FIELDS)
+    assert frame['booking_date'].dtype.kind == 'M'
+    assert frame['amount'].dtype == 'float64'
+    assert isinstance(frame['bank_name'].dtype, pd.CategoricalDtype)
+    assert frame['booking_date'].isna().tolist() == [False, True]
+    assert frame['amount'].tolist() == [-12.5, 7.0]
+
+def test_arrow_tables_use_the_export_schema():
+    pytest.importorskip('pyarrow')
+    from gocardless_connector.export import arrow_schema, transactions_to_arrow
+
+    rows = [Transaction.from_api(API_TRANSACTION, 'Bank', 'IT1'), {'bank_name': 'Other', 'amount': ''}]
+
+    table = transactions_to_arrow(rows)
+    assert table.schema == arrow_schema()
+    assert table.column('amount').to_pylist() == [-12.5, None]
+    assert table.column('booking_date').to_pylist() == [date(2024, 1, 5), None]
+    assert table.column('bank_name').to_pylist() == ['Bank', 'Other']
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'nordigen', 'requests']
+
+def imported_after(command):
+    """
+    Heavy modules in sys.modules after running `command` in a fresh interpreter.
+    """
+    script = f"{command}\nimport sys\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+def test_cli_starts_without_heavy_dependencies():
+    assert imported_after('import gocardless_connector.connector') == []
+
+@pytest.mark.parametrize('command', ['list-banks', 'convert-transactions'])
+def test_command_help_needs_no_heavy_dependencies(command):
+    run_cli = (
+        "from click.testing import CliRunner\n"
+        "from gocardless_connector.connector import cli\n"
+        f"assert CliRunner().invoke(cli, ['{command}', '--help']).exit_code == 0"
+    )
+    assert imported_after(run_cli) == []
@@ -0,0 +1,136 @@
+import sqlite3
+
+import pytest
+
+from gocardless_connector.balances import BalanceHistory
+from gocardless_connector.store import TransactionStore
+
+def row(transaction_id, booking_date, amount, status='booked'):
+    return {
+        'bank_name': 'Bank', 'account_iban': 'IT1', 'transaction_id': transaction_id,
+        'booking_date': booking_date, 'amount': amount, 'currency': 'EUR',
+        'description': transaction_id, 'status': status,
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    with TransactionStore(str(tmp_path / 'transactions.db')) as store:
+        yield store
+
+def rollups(store):
+    return {
+        summary['month']: (summary['inflow'], summary['outflow'], summary['transactions'])
+        for summary in store.monthly_summary()
+    }
+
+def test_upsert_updates_rows_and_keeps_their_category(store):
+    store.upsert_transactions([dict(row('a', '2024-01-05', -5.0), category='Spesa')])
+    store.upsert_transactions([row('a', '2024-01-06', -7.0), row('b', '2024-01-07', 3.0)])
+
+    frame = store.read_transactions()
+    assert list(frame['transaction_id']) == ['a', 'b']
+    assert list(frame['amount']) == [-7.0, 3.0]
+    assert list(frame['category']) == ['Spesa', '']
+    assert store.summary() == {
+        'transactions': 2, 'banks': 1, 'accounts': 1, 'first_date': '2024-01-06', 'last_date': '2024-01-07',
+    }
+
+def test_read_transactions_filters_and_chunks(store):
+    store.upsert_transactions([row(str(i), f'2024-01-{i + 1:02d}', float(i)) for i in range(10)])
+    store.upsert_transactions([dict(row('x', '2024-01-05', 1.0), account_iban='IT2')])
+
+    frame = store.read_transactions(start_date='2024-01-03', end_date='2024-01-06', account_iban='IT1')
+    assert list(frame['transaction_id']) == ['2', '3', '4', '5']
+    assert [len(chunk) for chunk in store.read_transactions(chunksize=4)] == [4, 4, 3]
+
+def test_stores_from_older_versions_are_migrated(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE transactions (account_iban TEXT NOT NULL, transaction_id TEXT NOT NULL, "
+        "bank_name TEXT, booking_date TEXT, amount REAL, currency TEXT, description TEXT, "
+        "PRIMARY KEY (account_iban, transaction_id))"
+    )
+    conn.execute("INSERT INTO transactions VALUES ('IT1', 'a', 'Bank', '2024-01-05', 10.0, 'EUR', 'a')")
+    conn.commit()
+    conn.close()
+
+    with TransactionStore(path) as store:
+        store.upsert_transactions([row('b', '2024-01-06', -4.0, status='pending')])
+        frame = store.read_transactions()
+        assert list(frame['status']) == ['booked', 'pending']
+        assert rollups(store) == {'2024-01': (10.0, 0.0, 1)}
+
+def test_rollups_follow_inserts_updates_and_deletes(store):
+    store.upsert_transactions([
+        row('a', '2024-01-05', 100.0),
+        row('b', '2024-01-20', -30.0),
+        row('c', '2024-02-01', -10.0),
+        row('p', '2024-02-02', -5.0, status='pending'),
+    ])
+    assert rollups(store) == {'2024-01': (100.0, 30.0, 2), '2024-02': (0.0, 10.0, 1)}
+
+    store.upsert_transactions([row('b', '2024-01-20', -50.0)])
+    assert rollups(store)['2024-01'] == (100.0, 50.0, 2)
+
+    store.upsert_transactions([row('p', '2024-02-02', -5.0)])
+    assert rollups(store)['2024-02'] == (0.0, 15.0, 2)
+
+    store.delete_transactions([('IT1', 'c'), ('IT1', 'p')])
+    assert rollups(store) == {'2024-01': (100.0, 50.0, 2)}
+
+def test_rollups_match_a_rebuild(store):
+    store.upsert_transactions([row(str(i), f'2024-{i % 12 + 1:02d}-10', i - 20.0) for i in range(40)])
+    store.upsert_transactions([row(str(i), '2024-06-30', 1.0) for i in range(0, 40, 3)])
+    store.delete_transactions([('IT1', str(i)) for i in range(0, 40, 7)])
+    incremental = rollups(store)
+
+    store.rebuild_rollups()
+    assert rollups(store) == incremental
+
+def test_running_balance_is_anchored_on_the_reported_balance(store):
+    store.upsert_transactions([
+        row('a', '2024-01-05', 100.0),
+        row('b', '2024-01-20', -30.0),
+        row('c', '2024-02-10', -10.0),
+        row('d', '2024-03-05', 40.0),
+    ])
+    store.set_balance('IT1', 'closingBooked', 560.0, 'EUR', '2024-02-28', '2024-03-06T00:00:00')
+
+    closing = {summary['month']: summary['closing_balance'] for summary in store.monthly_summary()}
+    assert closing == {'2024-01': 570.0, '2024-02': 560.0, '2024-03': 600.0}
+
+def test_balance_reports_are_reconciled(store):
+    store.set_balance('IT1', 'closingBooked', 500.0, 'EUR', '2024-01-01', '2024-01-01T00:00:00')
+    store.upsert_transactions([row('a', '2024-01-05', 100.0), row('b', '2024-01-20', -30.0)])
+    store.set_balance('IT1', 'closingBooked', 570.0, 'EUR', '2024-01-31', '2024-01-31T00:00:00')
+    assert store.balances()[0]['reconciled'] is True
+
+    store.upsert_transactions([row('c', '2024-02-10', -10.0)])
+    store.set_balance('IT1', 'closingBooked', 600.0, 'EUR', '2024-02-28', '2024-02-28T00:00:00')
+    balance = store.balances()[0]
+    assert (balance['difference'], balance['reconciled']) == (40.0, False)
+
+def test_filter_settles_pending_rows_booked_under_a_new_id(store):
+    store.upsert_transactions([row('p', '2024-01-05', -5.0, status='pending'), row('a', '2024-01-04', 9.0)])
+
+    booked = row('b', '2024-01-06', -5.0)
+    assert store.filter([row('a', '2024-01-04', 9.0), booked]) == [booked]
+    assert store.settled == [('IT1', 'p')]
+
+def test_cursors_are_kept_per_store(tmp_path):
+    with TransactionStore(str(tmp_path / 'a.db')) as store:
+        store.save_cursor('acc-1', {'last_booking_date': '2024-01-05'})
+        assert store.cursors() == {'acc-1': {'last_booking_date': '2024-01-05'}}
+    with TransactionStore(str(tmp_path / 'b.db')) as store:
+        assert store.cursors() == {}
+
+def test_old_sqlite_libraries_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite3, 'sqlite_version_info', (3, 22, 0))
+    monkeypatch.setattr(sqlite3, 'sqlite_version', '3.22.0')
+
+    with pytest.raises(RuntimeError, match='needs SQLite 3.25 or later, but this Python uses SQLite 3.22.0'):
+        TransactionStore(str(tmp_path / 'transactions.db'))
+    with pytest.raises(RuntimeError, match='needs SQLite 3.25'):
+        BalanceHistory(str(tmp_path / 'transactions.db'))
+    assert not (tmp_path / 'transactions.db').exists()
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from gocardless_connector.state import StateStore
+from gocardless_connector.store import TransactionStore
+from gocardless_connector.tenants import load_manifest
+
+from .conftest import STUB_ACCOUNTS, STUB_TRANSACTIONS
+
+def write_manifest(tmp_path, data):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_paths_and_defaults_are_resolved_per_tenant(tmp_path):
+    (tmp_path / 'shop').mkdir()
+    (tmp_path / 'shop' / 'creds.env').write_text('GOCARDLESS_SECRET_ID=id\nGOCARDLESS_SECRET_KEY=key\n')
+    manifest = write_manifest(tmp_path, {
+        'defaults': {'concurrency': 2, 'output': 'out.parquet'},
+        'tenants': [
+            {'name': 'home', 'secret_id': 'a', 'secret_key': 'b', 'concurrency': 6},
+            {'name': 'shop', 'env_file': 'creds.env', 'db': 'shop.db'},
+        ],
+    })
+
+    home, shop = load_manifest(manifest)
+
+    assert (home.concurrency, shop.concurrency) == (6, 2)
+    assert home.output == os.path.join(str(tmp_path), 'home', 'out.parquet')
+    assert home.file_format == 'parquet'
+    assert (shop.secret_id, shop.secret_key) == ('id', 'key')
+    assert shop.db == os.path.join(str(tmp_path), 'shop', 'shop.db')
+    assert shop.state_file != home.state_file
+
+@pytest.mark.parametrize('tenants, message', [
+    ([{'name': 'a', 'secret_id': 'x', 'secret_key': 'y', 'colour': 'red'}], 'unknown field'),
+    ([{'name': 'a'}], "needs 'secret_id' and 'secret_key'"),
+    ([{'name': 'a', 'secret_id': 'x', 'secret_key': 'y', 'concurrency': 0}], "'concurrency' must be a positive"),
+    ([{'name': 'a', 'secret_id': 'x', 'secret_key': 'y', 'format': 'xlsx'}], "'format' must be one of"),
+    ([{'name': 'a', 'secret_id': 'x', 'secret_key': 'y', 'format': 'parquet', 'incremental': True}],
+     "'incremental' can only append to CSV"),
+    ([{'name': 'a', 'secret_id': 'x', 'secret_key': 'y'}, {'name': 'a', 'secret_id': 'x', 'secret_key': 'y'}],
+     'duplicate tenant name'),
+    ([{'name': 'a', 'secret_id': 'x', 'secret_key': 'y'},
+      {'name': 'b', 'secret_id': 'x', 'secret_key': 'y', 'directory': 'a'}], 'must not share a directory'),
+])
+def test_invalid_manifests_are_rejected(tmp_path, tenants, message):
+    with pytest.raises(ValueError, match=message):
+        load_manifest(write_manifest(tmp_path, tenants))
+
+def test_connected_banks_merge_state_and_manifest(tmp_path):
+    [tenant] = load_manifest(write_manifest(tmp_path, [
+        {'name': 'a', 'secret_id': 'x', 'secret_key': 'y', 'requisitions': {'BANK02': 'req-BANK02', 'BANK00': ''}},
+    ]))
+    os.makedirs(tenant.directory)
+    StateStore(tenant.state_file).update('requisitions', {'BANK00': 'req-BANK00', 'BANK01': 'req-BANK01'})
+
+    assert tenant.connected_banks() == {'BANK01': 'req-BANK01', 'BANK02': 'req-BANK02'}
+
+def test_batch_keeps_each_tenant_to_its_own_banks_and_files(cli, stub, workdir):
+    manifest = write_manifest(workdir, [
+        {'name': 'home', 'secret_id': 'a', 'secret_key': 'b', 'db': 'home.db', 'requisitions': {'BANK00': 'req-BANK00'}},
+        {'name': 'shop', 'secret_id': 'c', 'secret_key': 'd', 'db': 'shop.db',
+         'requisitions': {'BANK01': 'req-BANK01', 'BANK02': 'req-BANK02'}},
+    ])
+
+    result = cli('batch', manifest, '--workers', '4')
+
+    assert result.exit_code == 0, result.output
+    assert 'All 2 tenants processed' in result.output
+    for name, banks in [('home', 1), ('shop', 2)]:
+        with TransactionStore(str(workdir / name / f'{name}.db')) as store:
+            assert store.summary()['transactions'] == banks * STUB_ACCOUNTS * STUB_TRANSACTIONS
+        assert StateStore(str(workdir / name / 'gocardless_state.json')).section('tokens')
+    assert stub.tokens_issued == 2
+
+def test_batch_reports_unknown_tenants(cli, workdir):
+    manifest = write_manifest(workdir, [{'name': 'home', 'secret_id': 'a', 'secret_key': 'b'}])
+
+    result = cli('batch', manifest, '--tenant', 'shop')
+
+    assert result.exit_code == 2
+    assert 'Unknown tenant(s): shop' in result.output
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from gocardless_connector.connector import authenticate, create_client
+from gocardless_connector.state import StateStore
+from gocardless_connector.tokens import TokenStore
+
+@pytest.fixture
+def token_store(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text('GOCARDLESS_SECRET_ID=stub\nGOCARDLESS_SECRET_KEY=stub\n')
+    return TokenStore(str(env_file), StateStore(str(tmp_path / 'state.json')), margin=300)
+
+def test_saved_tokens_get_absolute_expiries(token_store):
+    token_store.save({'access': 'a', 'access_expires': 86400, 'refresh': 'r', 'refresh_expires': 2592000})
+
+    tokens = token_store.load()
+    assert tokens['access_expires_at'] == pytest.approx(time.time() + 86400, abs=5)
+    assert token_store.valid_access_token(tokens) == 'a'
+    assert token_store.valid_refresh_token(tokens) == 'r'
+
+def test_tokens_within_the_margin_are_expired(token_store):
+    soon = int(time.time()) + 200
+    tokens = {'access': 'a', 'access_expires_at': soon, 'refresh': 'r', 'refresh_expires_at': soon}
+
+    assert token_store.valid_access_token(tokens) is None
+    assert token_store.valid_refresh_token(tokens) is None
+
+def test_refresh_token_without_expiry_is_still_tried(token_store):
+    assert token_store.valid_refresh_token({'refresh': 'r'}) == 'r'
+    assert token_store.valid_access_token({'access': 'a'}) is None
+
+def test_refreshed_access_token_keeps_the_refresh_token(token_store):
+    token_store.save({'access': 'a', 'access_expires': 86400, 'refresh': 'r', 'refresh_expires': 2592000})
+    token_store.save({'access': 'b', 'access_expires': 86400})
+
+    tokens = token_store.load()
+    assert (tokens['access'], tokens['refresh']) == ('b', 'r')
+
+def test_tokens_written_to_env_by_older_versions_are_read(tmp_path):
+    env_file = tmp_path / '.env'
+    env_file.write_text('GOCARDLESS_ACCESS_TOKEN=a\nGOCARDLESS_REFRESH_TOKEN=r\n')
+    token_store = TokenStore(str(env_file), StateStore(str(tmp_path / 'state.json')))
+
+    assert token_store.load() == {'access': 'a', 'refresh': 'r'}
+
+def test_fresh_access_token_needs_no_request(stub, token_store):
+    token_store.save({'access': 'a', 'access_expires': 86400, 'refresh': 'r', 'refresh_expires': 2592000})
+    client = authenticate(create_client('stub', 'stub', base_url=stub.base_url), token_store)
+
+    assert client.token == 'a'
+    assert stub.tokens_issued == 0
+
+def test_expired_access_token_is_refreshed(stub, token_store):
+    token_store.state.update('tokens', {
+        'access': 'old', 'access_expires_at': 1, 'refresh': 'r', 'refresh_expires_at': int(time.time()) + 86400,
+    })
+    client = authenticate(create_client('stub', 'stub', base_url=stub.base_url), token_store)
+
+    tokens = token_store.load()
+    assert client.token == tokens['access'] == 'stub-access-1'
+    assert tokens['refresh'] == 'r'
+    assert token_store.valid_access_token(tokens) == 'stub-access-1'
+
+def test_expired_refresh_token_generates_new_tokens(stub, token_store):
+    token_store.state.update('tokens', {
+        'access': 'old', 'access_expires_at': 1, 'refresh': 'r', 'refresh_expires_at': 1,
+    })
+    client = authenticate(create_client('stub', 'stub', base_url=stub.base_url), token_store)
+
+    tokens = token_store.load()
+    assert client.token == tokens['access'] == 'stub-access-1'
+    assert tokens['refresh'] == 'stub-refresh-1'
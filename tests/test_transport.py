@@ -0,0 +1,147 @@
+import socket
+import threading
+import time
+
+import pytest
+from nordigen.types.http_enums import HTTPMethod
+from requests.exceptions import ConnectionError, HTTPError
+
+from gocardless_connector.connector import create_client
+from gocardless_connector.metrics import MetricsRegistry
+from gocardless_connector.transport import RateLimiter, RateLimitError, request_scopes, retry_after_seconds
+
+from .stub_api import StubServer
+
+def stub_client(base_url, max_wait=5.0):
+    return create_client(
+        'stub', 'stub', base_url=base_url, max_retries=2, backoff_base=0.001,
+        rate_limiter=RateLimiter(max_wait=max_wait), metrics=MetricsRegistry()
+    )
+
+def retries(client):
+    return {
+        counter['labels']['reason']: counter['value']
+        for counter in client.metrics.report()['counters'] if counter['name'] == 'api_retries'
+    }
+
+@pytest.fixture
+def closed_port():
+    # A port nothing listens on
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        return listener.getsockname()[1]
+
+@pytest.fixture
+def hang_up_url():
+    """
+    A server that reads each request and closes the connection without answering.
+    """
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    received = []
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            with connection:
+                received.append(connection.recv(65536))
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f'http://127.0.0.1:{listener.getsockname()[1]}/api/v2', received
+    listener.close()
+
+def test_request_scopes():
+    assert request_scopes('accounts/acc-1/transactions/') == [
+        'endpoint:accounts/transactions', 'account:acc-1/transactions'
+    ]
+    assert request_scopes('accounts/acc-1/') == ['endpoint:accounts/metadata', 'account:acc-1/metadata']
+    assert request_scopes('requisitions/req-1/') == ['endpoint:requisitions']
+
+def test_retry_after_is_read_as_seconds_or_a_date():
+    assert retry_after_seconds({'Retry-After': '3'}) == 3.0
+    assert retry_after_seconds({'Retry-After': 'Thu, 01 Jan 1970 00:00:00 GMT'}) == 0.0
+    assert retry_after_seconds({'Retry-After': 'soon'}) is None
+    assert retry_after_seconds({}) is None
+
+def test_throttled_requests_wait_for_retry_after():
+    # Every second request is throttled for one second
+    with StubServer(banks=1, throttle_every=2, retry_after=1) as stub:
+        client = stub_client(stub.base_url)
+        client.request(HTTPMethod.GET, 'institutions/')
+
+        start = time.monotonic()
+        client.request(HTTPMethod.GET, 'institutions/BANK00/')
+        elapsed = time.monotonic() - start
+
+    assert elapsed >= 0.9
+    assert client.rate_limiter.blocked_until['endpoint:institutions'] <= time.time()
+    assert retries(client) == {'429': 1}
+    assert stub.stats['throttled'] == 1
+
+def test_throttling_beyond_max_wait_raises_rate_limit_error():
+    with StubServer(banks=1, throttle_every=1, retry_after=30) as stub:
+        client = stub_client(stub.base_url, max_wait=5)
+
+        with pytest.raises(RateLimitError):
+            client.request(HTTPMethod.GET, 'institutions/')
+
+    assert stub.stats['institutions'] == 1
+    assert retries(client) == {}
+
+def test_blocked_scope_beyond_max_wait_fails_without_a_request():
+    with StubServer(banks=1) as stub:
+        client = stub_client(stub.base_url, max_wait=5)
+        client.rate_limiter.block('endpoint:institutions', 30)
+
+        with pytest.raises(RateLimitError, match='resets in'):
+            client.request(HTTPMethod.GET, 'institutions/')
+
+    assert 'institutions' not in stub.stats
+
+def test_server_errors_are_retried_for_get_only():
+    with StubServer(banks=1, fail_every=2) as stub:
+        client = stub_client(stub.base_url)
+        client.request(HTTPMethod.GET, 'institutions/')
+        client.request(HTTPMethod.GET, 'institutions/')
+        assert stub.stats['institutions'] == 3
+
+        client.request(HTTPMethod.GET, 'institutions/')
+        with pytest.raises(HTTPError):
+            client.request(HTTPMethod.POST, 'token/new/', {'secret_id': 'stub', 'secret_key': 'stub'})
+
+    assert stub.stats['token'] == 1
+    assert stub.tokens_issued == 0
+
+def test_throttled_post_is_retried():
+    with StubServer(banks=1, throttle_every=2, retry_after=0) as stub:
+        client = stub_client(stub.base_url)
+        client.request(HTTPMethod.GET, 'institutions/')
+
+        tokens = client.request(HTTPMethod.POST, 'token/new/', {'secret_id': 'stub', 'secret_key': 'stub'})
+
+    assert tokens['access'] == 'stub-access-1'
+    assert stub.stats['token'] == 2
+
+def test_post_is_retried_when_the_connection_fails(closed_port):
+    client = stub_client(f'http://127.0.0.1:{closed_port}/api/v2')
+
+    with pytest.raises(ConnectionError):
+        client.request(HTTPMethod.POST, 'token/new/', {'secret_id': 'stub', 'secret_key': 'stub'})
+
+    assert retries(client) == {'ConnectionError': 2}
+
+def test_post_is_not_retried_once_sent(hang_up_url):
+    base_url, received = hang_up_url
+    client = stub_client(base_url)
+
+    with pytest.raises(ConnectionError):
+        client.request(HTTPMethod.POST, 'token/new/', {'secret_id': 'stub', 'secret_key': 'stub'})
+    assert len(received) == 1
+
+    with pytest.raises(ConnectionError):
+        client.request(HTTPMethod.GET, 'institutions/')
+    assert len(received) == 4